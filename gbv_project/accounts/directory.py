@@ -0,0 +1,83 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+
+from gbv_project import metrics
+
+from .models import User
+
+PROFESSIONAL_ROLES = ['doctor', 'lawyer', 'counselor']
+DIRECTORY_FIELDS = ('id', 'first_name', 'last_name', 'email', 'role')
+
+VERSION_KEY = 'professionals_directory:version'
+SNAPSHOT_KEY = 'professionals_directory:{version}'
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+# Per-process copy of the last snapshot, so repeated reads of the same
+# version skip the cache round trip and the unpickling.
+_local_snapshot = {'version': None, 'etag': None, 'rows': ()}
+
+
+def get_version():
+    """Return the current directory version, initialising it if missing"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate():
+    """Bump the directory version so the next read rebuilds the snapshot"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
+
+
+def _build_snapshot():
+    rows = list(
+        User.objects.filter(role__in=PROFESSIONAL_ROLES)
+        .order_by('id')
+        .values(*DIRECTORY_FIELDS)
+    )
+    payload = json.dumps(rows, sort_keys=True, default=str).encode()
+    etag = '"%s"' % hashlib.sha1(payload).hexdigest()
+    return {'etag': etag, 'rows': rows}
+
+
+def get_snapshot():
+    """Return (etag, rows) for the current version of the directory"""
+    version = get_version()
+    if _local_snapshot['version'] == version:
+        metrics.inc('gbv_cache_lookups_total', cache='directory', result='local')
+        return _local_snapshot['etag'], _local_snapshot['rows']
+
+    key = SNAPSHOT_KEY.format(version=version)
+    snapshot = cache.get(key)
+    metrics.inc('gbv_cache_lookups_total', cache='directory', result='miss' if snapshot is None else 'shared')
+    if snapshot is None:
+        snapshot = _build_snapshot()
+        cache.set(key, snapshot, timeout=SNAPSHOT_TIMEOUT)
+
+    rows = tuple(snapshot['rows'])
+    _local_snapshot.update(version=version, etag=snapshot['etag'], rows=rows)
+    return snapshot['etag'], rows
+
+
+def search(rows, role=None, query=None):
+    """Filter directory rows in memory by role and name/email substring"""
+    if role:
+        roles = {r.strip() for r in role.split(',') if r.strip()}
+        rows = [row for row in rows if row['role'] in roles]
+    if query:
+        needle = query.strip().lower()
+        rows = [
+            row for row in rows
+            if needle in (row['first_name'] or '').lower()
+            or needle in (row['last_name'] or '').lower()
+            or needle in f"{row['first_name'] or ''} {row['last_name'] or ''}".lower()
+            or needle in (row['email'] or '').lower()
+        ]
+    return list(rows)
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from . import directory
+from .models import User
+
+# Saves that cannot change anything shown in the professionals directory
+DIRECTORY_IGNORED_FIELDS = {'last_login', 'password'}
+
+
+@receiver(pre_save, sender=User)
+def remember_stored_role(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Load the stored role of a user leaving a professional role"""
+    instance._stored_role = None
+    if raw or instance._state.adding or instance.role in directory.PROFESSIONAL_ROLES:
+        return
+    if update_fields and set(update_fields) <= DIRECTORY_IGNORED_FIELDS:
+        return
+    instance._stored_role = User.objects.filter(pk=instance.pk).values_list('role', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_professionals_directory(sender, instance, created, update_fields=None, **kwargs):
+    """Drop the cached professionals directory when a staff account changes"""
+    if update_fields and set(update_fields) <= DIRECTORY_IGNORED_FIELDS:
+        return
+    # Also when the role changed away from a professional role
+    if (instance.role in directory.PROFESSIONAL_ROLES
+            or getattr(instance, '_stored_role', None) in directory.PROFESSIONAL_ROLES):
+        directory.invalidate()
+
+
+@receiver(post_delete, sender=User)
+def invalidate_professionals_directory_on_delete(sender, instance, **kwargs):
+    if instance.role in directory.PROFESSIONAL_ROLES:
+        directory.invalidate()
@@ -1,3 +1,115 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from gbv_project import metrics, throttling
+from . import directory
+from .models import User
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for name, value in (('registry', metrics.Registry()), ('METRICS_DIR', None)):
+            patcher = mock.patch.object(metrics, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.admin = User.objects.create_user('admin@example.com', 'pass', role='admin', is_staff=True)
+        self.survivor = User.objects.create_user('survivor@example.com', 'pass', role='survivor')
+
+    def authenticate(self, user):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(user).access_token}'
+
+    def test_rotating_forwarded_for_does_not_get_new_buckets(self):
+        self.authenticate(self.admin)
+        burst = throttling.POLICIES['signup']['burst']
+        statuses = [
+            self.client.post('/api/auth/signup/', {}, HTTP_X_FORWARDED_FOR=f'203.0.113.{i}').status_code
+            for i in range(burst + 2)
+        ]
+        self.assertNotIn(429, statuses[:burst])
+        self.assertEqual(statuses[burst:], [429, 429])
+
+    def test_denied_request_takes_no_token_from_its_other_buckets(self):
+        self.authenticate(self.survivor)
+        burst = throttling.POLICIES['reset_password']['burst']
+
+        def reset(email, ip):
+            return self.client.post('/api/auth/?action=reset_password', {'email': email}, REMOTE_ADDR=ip)
+
+        for _ in range(burst):
+            reset('first@example.com', '198.51.100.1')
+        # Denied by the exhausted IP bucket; the email bucket must stay full
+        self.assertEqual(reset('second@example.com', '198.51.100.1').status_code, 429)
+        statuses = [reset('second@example.com', '198.51.100.2').status_code for _ in range(burst)]
+        self.assertNotIn(429, statuses)
+
+    def test_failed_logins_from_elsewhere_do_not_lock_the_user_out(self):
+        for i in range(throttling.POLICIES['login']['burst'] + 5):
+            response = self.client.post('/api/auth/?action=login',
+                                        {'email': 'survivor@example.com', 'password': 'wrong'},
+                                        REMOTE_ADDR='192.0.2.1')
+        self.assertEqual(response.status_code, 429)
+        response = self.client.post('/api/auth/?action=login',
+                                    {'email': 'survivor@example.com', 'password': 'pass'},
+                                    REMOTE_ADDR='192.0.2.50')
+        self.assertEqual(response.status_code, 200)
+
+    def test_tokens_refill_over_time(self):
+        bucket = throttling.TokenBucket('60/min', 2)
+        self.assertEqual(bucket.take('k', now=1000), 0)
+        self.assertEqual(bucket.take('k', now=1000), 0)
+        self.assertGreater(bucket.take('k', now=1000), 0)
+        self.assertEqual(bucket.take('k', now=1001), 0)
+        self.assertGreater(bucket.take('k', now=1001), 0)
+
+    def test_allowed_request_is_one_increment_per_bucket(self):
+        self.authenticate(self.survivor)
+        bucket = throttling.get_bucket('reset_password')
+        with mock.patch.object(bucket.cache, 'incr', wraps=bucket.cache.incr) as incr, \
+                mock.patch.object(bucket.cache, 'get_many', wraps=bucket.cache.get_many) as get_many:
+            self.client.post('/api/auth/?action=reset_password', {'email': 'first@example.com'})
+            self.client.post('/api/auth/?action=reset_password', {'email': 'first@example.com'})
+        # The first request creates both buckets with add; the second increments each once
+        self.assertEqual(incr.call_count, 4)
+        get_many.assert_not_called()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class DirectoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory._local_snapshot.update(version=None, etag=None, rows=())
+        self.doctor = User.objects.create_user('doctor@example.com', 'pass', role='doctor', first_name='Wanjiru')
+        self.survivor = User.objects.create_user('survivor@example.com', 'pass', role='survivor')
+
+    def listed(self):
+        _, rows = directory.get_snapshot()
+        return {row['id']: row['first_name'] for row in rows}
+
+    def test_professional_save_and_delete_rebuild_the_snapshot(self):
+        self.assertEqual(self.listed(), {self.doctor.pk: 'Wanjiru'})
+        self.doctor.first_name = 'Njeri'
+        self.doctor.save()
+        self.assertEqual(self.listed(), {self.doctor.pk: 'Njeri'})
+        self.doctor.delete()
+        self.assertEqual(self.listed(), {})
+
+    def test_leaving_a_professional_role_rebuilds_the_snapshot(self):
+        self.listed()
+        self.doctor.role = 'survivor'
+        self.doctor.save()
+        self.assertEqual(self.listed(), {})
+
+    def test_other_saves_keep_the_snapshot(self):
+        self.listed()
+        version = directory.get_version()
+        with mock.patch.object(directory, 'get_snapshot') as get_snapshot:
+            self.survivor.first_name = 'Amina'
+            self.survivor.save()
+            self.doctor.save(update_fields=['last_login'])
+        get_snapshot.assert_not_called()
+        self.assertEqual(directory.get_version(), version)
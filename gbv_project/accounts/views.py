@@ -9,6 +9,7 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from .serializers import UserSignupSerializer
 from .models import User
+from gbv_project.throttling import TokenBucketThrottle
 
 
 from .serializers import (
@@ -26,6 +27,11 @@ class AuthView(APIView):
             return [AllowAny()]
         return [IsAuthenticated()]
     
+    def get_throttles(self):
+        action = self.request.query_params.get("action")
+        if self.request.method == "POST" and action in ("login", "reset_password"):
+            return [TokenBucketThrottle(action)]
+        return super().get_throttles()
     
     def get(self, request, *args, **kwargs):
         user = request.user
@@ -120,6 +126,9 @@ class UserSignupView(generics.CreateAPIView):
     serializer_class = UserSignupSerializer
     permission_classes = [IsAdminUser]
 
+    def get_throttles(self):
+        return [TokenBucketThrottle('signup')]
+
     def create(self, request, *args, **kwargs):
         response = super().create(request, *args, **kwargs)
         role = response.data['role']
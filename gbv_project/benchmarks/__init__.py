@@ -0,0 +1,132 @@
+"""
+Benchmark suite for the GBV API.
+
+Each module in this package exposes ``add_arguments(parser)`` and
+``run(stdout, **options)`` and is executed with
+``python manage.py run_benchmarks <name>``. Benchmarks run against a
+throwaway test database, never against the configured one.
+"""
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+User = get_user_model()
+
+
+@contextmanager
+def benchmark_database():
+    """Create the test databases (and locmem email) for the duration of a run"""
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0, interactive=False)
+    old_config = runner.setup_databases()
+    try:
+        yield
+    finally:
+        runner.teardown_databases(old_config)
+        teardown_test_environment()
+
+
+def timed(func, *args, repeat=1, **kwargs):
+    """Call func repeat times, returning a list of latencies in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'n': len(ordered),
+        'mean': statistics.fmean(ordered),
+        'p50': ordered[len(ordered) // 2],
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'min': ordered[0],
+    }
+
+
+def format_summary(label, samples):
+    s = summarize(samples)
+    return (f"{label:<28} n={s['n']:<5} mean={s['mean']:8.2f}ms "
+            f"p50={s['p50']:8.2f}ms p95={s['p95']:8.2f}ms min={s['min']:8.2f}ms")
+
+
+def create_users(professionals=6):
+    """Create an admin, a survivor and a mix of professionals"""
+    admin = User.objects.create_user('bench-admin@example.com', 'bench-pass', role='admin',
+                                     first_name='Bench', last_name='Admin')
+    survivor = User.objects.create_user('bench-survivor@example.com', 'bench-pass', role='survivor',
+                                        first_name='Bench', last_name='Survivor')
+    roles = ['doctor', 'lawyer', 'counselor']
+    pros = [
+        User.objects.create_user(f'bench-pro-{i}@example.com', 'bench-pass', role=roles[i % 3],
+                                 first_name=f'Pro{i}', last_name=roles[i % 3].title())
+        for i in range(professionals)
+    ]
+    return admin, survivor, pros
+
+
+def seed_reports(reporter, count, prefix='GBVB'):
+    """Bulk create reports (bypassing save signals, so no emails are sent)"""
+    from reports.models import GBVReport
+
+    now = timezone.now()
+    types = [choice for choice, _ in GBVReport.INCIDENT_TYPE_CHOICES]
+    statuses = [choice for choice, _ in GBVReport.REPORT_STATUSES]
+    GBVReport.objects.bulk_create([
+        GBVReport(
+            reference_code=f'{prefix}{i:06d}',
+            reporter=reporter,
+            status=statuses[i % len(statuses)],
+            incident_date=now - timedelta(days=i % 365),
+            incident_location=f'Location {i % 50}',
+            incident_type=types[i % len(types)],
+            description='Benchmark incident description. ' * 20,
+            immediate_danger=i % 7 == 0,
+            needs_medical_attention=i % 11 == 0,
+        )
+        for i in range(count)
+    ], batch_size=500)
+    return GBVReport.objects.filter(reference_code__startswith=prefix)
+
+
+def seed_case(report, admin, professionals, size):
+    """Attach size appointments, notes, documents and assignments to a report"""
+    from reports.models import Appointment, CaseAssignment, CaseNote, Document
+
+    now = timezone.now()
+    n = len(professionals)
+    Appointment.objects.bulk_create([
+        Appointment(report=report, professional=professionals[i % n], appointment_type='follow_up',
+                    scheduled_date=now + timedelta(hours=i), location='Clinic',
+                    notes='Bring documents')
+        for i in range(size)
+    ], batch_size=500)
+    CaseNote.objects.bulk_create([
+        CaseNote(report=report, created_by=professionals[i % n], note_type='general',
+                 content='Progress update. ' * 10, is_confidential=i % 4 == 0)
+        for i in range(size)
+    ], batch_size=500)
+    Document.objects.bulk_create([
+        Document(report=report, uploaded_by=professionals[i % n], document_type='evidence',
+                 file=f'case_documents/bench-{i}.pdf', description='Scanned evidence')
+        for i in range(size)
+    ], batch_size=500)
+    CaseAssignment.objects.bulk_create([
+        CaseAssignment(report=report, professional=professionals[i % n], assigned_by=admin)
+        for i in range(size)
+    ], batch_size=500)
+
+
+def auth_header(user):
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    return {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}
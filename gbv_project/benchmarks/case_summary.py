@@ -0,0 +1,41 @@
+"""
+Compares case_summary and the dashboard with their sub-queries run one
+after another and in the reports.parallel thread pool.
+"""
+from unittest import mock
+
+from django.test import Client
+
+from reports import parallel
+
+from . import auth_header, benchmark_database, create_users, format_summary, seed_case, seed_reports, timed
+
+
+def add_arguments(parser):
+    parser.add_argument('--case-size', type=int, default=500,
+                        help='Appointments, notes, documents and assignments per case')
+    parser.add_argument('--reports', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+
+
+def run(stdout, case_size, reports, repeat, **options):
+    with benchmark_database():
+        admin, survivor, pros = create_users()
+        seed_reports(survivor, reports)
+        report = seed_reports(survivor, 1, prefix='GBVCASE').get()
+        seed_case(report, admin, pros, case_size)
+
+        headers = auth_header(admin)
+        client = Client()
+
+        def get(path):
+            response = client.get(path, headers=headers)
+            assert response.status_code == 200, response.content
+
+        stdout.write(f'case size={case_size} reports={reports} repeat={repeat}')
+        for name, path in [('case_summary', f'/api/cases/{report.pk}/summary/'), ('dashboard', '/api/dashboard/')]:
+            for mode, enabled in [('serial', False), ('parallel', True)]:
+                with mock.patch.object(parallel, 'ENABLED', enabled):
+                    # Warm up (and start the pool) before measuring
+                    get(path)
+                    stdout.write(format_summary(f'{name} {mode}', timed(get, path, repeat=repeat)))
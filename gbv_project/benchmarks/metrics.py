@@ -0,0 +1,54 @@
+"""
+Cost of the metrics on the request path: a single histogram observation,
+then the same cheap and DB-bound requests with and without
+MetricsMiddleware, interleaved, and the cost of rendering the endpoint.
+"""
+import time
+
+from django.conf import settings
+from django.test import Client
+from django.test.utils import override_settings
+
+from gbv_project import metrics
+from . import auth_header, benchmark_database, create_users, format_summary, seed_reports, summarize, timed
+
+MIDDLEWARE = 'gbv_project.metrics.MetricsMiddleware'
+
+
+def add_arguments(parser):
+    parser.add_argument('--requests', type=int, default=300, help='Requests per endpoint and variant')
+    parser.add_argument('--reports', type=int, default=200)
+
+
+def run(stdout, requests, reports, **options):
+    # Keep the benchmark's numbers out of the real workers' metrics
+    metrics.METRICS_DIR = None
+    labels = (('view', 'bench'), ('action', 'list'))
+    start = time.perf_counter()
+    for _ in range(100_000):
+        metrics.registry.observe('gbv_http_request_duration_seconds', labels, 0.01)
+    stdout.write(f"registry.observe: {(time.perf_counter() - start) * 10:.2f}us per call")
+
+    without = [name for name in settings.MIDDLEWARE if name != MIDDLEWARE]
+    with benchmark_database():
+        admin, survivor, _ = create_users()
+        seed_reports(survivor, reports)
+        headers = auth_header(admin)
+        clients = {}
+        for label, middleware in [('without', without), ('with', [MIDDLEWARE, *without])]:
+            with override_settings(MIDDLEWARE=middleware):
+                clients[label] = Client(headers=headers)
+                # Load the middleware chain under these settings
+                clients[label].get('/api/sync/')
+
+        for path in ['/api/sync/', '/api/reports/?page_size=20']:
+            samples = {'without': [], 'with': []}
+            for _ in range(requests):
+                for label, client in clients.items():
+                    samples[label] += timed(client.get, path)
+            for label in samples:
+                stdout.write(format_summary(f'{path[:18]} {label}', samples[label]))
+            overhead = summarize(samples['with'])['p50'] - summarize(samples['without'])['p50']
+            stdout.write(f"  p50 overhead {overhead * 1000:.0f}us")
+
+        stdout.write(format_summary('render /metrics', timed(metrics.render, repeat=50)))
@@ -0,0 +1,69 @@
+"""
+Rendering throughput of FastJSONRenderer against DRF's JSONRenderer on the
+payloads of ReportApiView.list, DashBoardView and case_summary.
+"""
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from gbv_project.renderers import FastJSONRenderer, orjson
+from . import benchmark_database, create_users, seed_case, seed_reports
+
+
+def add_arguments(parser):
+    parser.add_argument('--reports', type=int, default=5000)
+    parser.add_argument('--case-size', type=int, default=500)
+    parser.add_argument('--seconds', type=float, default=2.0, help='Time budget per renderer and payload')
+
+
+def _throughput(renderer, data, seconds):
+    size, count = 0, 0
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        size = len(renderer.render(data))
+        count += 1
+    elapsed = time.perf_counter() - start
+    return count / elapsed, size * count / elapsed / 1e6
+
+
+def run(stdout, reports, case_size, seconds, **options):
+    from reports.models import Appointment, CaseAssignment, CaseNote, Document, GBVReport
+    from reports.serializers import (
+        AppointmentSerializer, CaseAssignmentSerializer, CaseNoteSerializer,
+        DocumentSerializer, GBVReportSerializer,
+    )
+
+    if orjson is None:
+        stdout.write('orjson is not installed; FastJSONRenderer falls back to JSONRenderer')
+
+    with benchmark_database():
+        admin, survivor, pros = create_users()
+        seed_reports(survivor, reports)
+        report = seed_reports(survivor, 1, prefix='GBVCASE').get()
+        seed_case(report, admin, pros, case_size)
+
+        payloads = {
+            'reports list': GBVReportSerializer(
+                GBVReport.objects.select_related('reporter', 'assigned_to'), many=True
+            ).data,
+            'case summary': {
+                'report_reference': report.reference_code,
+                'appointments': AppointmentSerializer(Appointment.objects.filter(report=report), many=True).data,
+                'notes': CaseNoteSerializer(CaseNote.objects.filter(report=report), many=True).data,
+                'documents': DocumentSerializer(Document.objects.filter(report=report), many=True).data,
+                'assignments': CaseAssignmentSerializer(CaseAssignment.objects.filter(report=report), many=True).data,
+            },
+        }
+
+        stock, fast = JSONRenderer(), FastJSONRenderer()
+        stdout.write(f'reports={reports} case size={case_size}')
+        for name, data in payloads.items():
+            assert stock.render(data) == fast.render(data), f'{name}: renderer output differs'
+            stock_ops, stock_mb = _throughput(stock, data, seconds)
+            fast_ops, fast_mb = _throughput(fast, data, seconds)
+            stdout.write(
+                f'{name:<14} JSONRenderer {stock_ops:8.1f} renders/s {stock_mb:8.1f} MB/s | '
+                f'FastJSONRenderer {fast_ops:8.1f} renders/s {fast_mb:8.1f} MB/s | '
+                f'x{fast_ops / stock_ops:.1f}'
+            )
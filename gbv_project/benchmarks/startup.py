@@ -0,0 +1,57 @@
+"""
+Cold start: wall time of fresh interpreters setting Django up (what every
+management command and cron job pays) and booting the WSGI application
+(what every new web worker pays), each against the plain way of doing it,
+without gbv_project.startup's collector pause and URLconf preload. Then
+the slowest modules of a worker boot, as profile_startup reports them.
+"""
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+from gbv_project import importtime
+from . import format_summary
+
+PLAIN_SETUP = 'import django; django.setup()'
+PLAIN_WORKER = (
+    'import django; django.setup(); '
+    'from django.core.wsgi import get_wsgi_application; get_wsgi_application(); '
+    'from django.urls import get_resolver; get_resolver().url_patterns'
+)
+
+
+def add_arguments(parser):
+    parser.add_argument('--repeat', type=int, default=10, help='Cold starts per variant')
+    parser.add_argument('--top', type=int, default=10, help='Slowest modules to list')
+
+
+def _cold_start(script):
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'gbv_project.settings'}
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(stdout, repeat, top, **options):
+    variants = [
+        ('setup, plain', PLAIN_SETUP),
+        ('setup', importtime.SCRIPTS['setup']),
+        ('worker boot, plain', PLAIN_WORKER),
+        ('worker boot', importtime.SCRIPTS['worker']),
+    ]
+    # Interleaved so drift in machine load hits every variant alike
+    samples = {label: [] for label, _ in variants}
+    _cold_start(importtime.SCRIPTS['setup'])
+    for _ in range(repeat):
+        for label, script in variants:
+            samples[label].append(_cold_start(script))
+    for label, _ in variants:
+        stdout.write(format_summary(label, samples[label]))
+
+    _, records = importtime.measure('worker')
+    stdout.write(f"\nSlowest modules of a worker boot ({sum(r.self_us for r in records) / 1000:.0f}ms importing):")
+    for record in sorted(records, key=lambda record: record.self_us, reverse=True)[:top]:
+        stdout.write(f"  {record.self_us / 1000:7.1f}ms  {record.module}")
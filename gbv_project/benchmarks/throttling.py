@@ -0,0 +1,75 @@
+"""
+Load test of the token-bucket throttle: many threads hammering one bucket
+must together get no more than burst + rate x elapsed tokens, and the
+check itself must stay cheap. Then the same through the anonymous report
+endpoint, counting 201s and 429s.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from gbv_project import throttling
+from . import benchmark_database, format_summary
+
+
+def add_arguments(parser):
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--rate', default='50/s')
+    parser.add_argument('--burst', type=int, default=20)
+    parser.add_argument('--cache', default=throttling.CACHE_ALIAS, help='Cache alias holding the buckets')
+
+
+def _hammer(bucket, key, deadline, allowed, latencies, lock):
+    mine, samples = 0, []
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        wait = bucket.take(key)
+        samples.append((time.perf_counter() - start) * 1000)
+        mine += not wait
+    with lock:
+        allowed.append(mine)
+        latencies.extend(samples)
+
+
+def run(stdout, threads, seconds, rate, burst, cache, **options):
+    bucket = throttling.TokenBucket(rate, burst, cache_alias=cache)
+    key = f'{throttling.KEY_PREFIX}:bench:{uuid.uuid4().hex}'
+    allowed, latencies, lock = [], [], threading.Lock()
+
+    start = time.perf_counter()
+    deadline = start + seconds
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for _ in range(threads):
+            pool.submit(_hammer, bucket, key, deadline, allowed, latencies, lock)
+    elapsed = time.perf_counter() - start
+
+    admitted = sum(allowed)
+    ceiling = burst + elapsed * 1000 / bucket.interval
+    stdout.write(f'rate={rate} burst={burst} threads={threads} cache={cache}')
+    stdout.write(f'{len(latencies)} checks in {elapsed:.2f}s, {admitted} allowed, '
+                 f'ceiling {ceiling:.0f} ({admitted / ceiling:.1%})')
+    stdout.write(format_summary('TokenBucket.take', latencies))
+    if admitted > ceiling + threads:
+        stdout.write('FAIL: the throttle let through more than its ceiling')
+
+    # Through the API: one client IP submitting reports as fast as it can
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    policy = throttling.POLICIES['report_create']
+    with benchmark_database(), override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+        client, statuses = Client(REMOTE_ADDR='198.51.100.7'), []
+        throttling._buckets.pop('report_create', None)
+        for i in range(policy['burst'] * 3):
+            response = client.post('/api/reports/', {
+                'reporter_email': f'bench-{i}@example.com', 'reporter_first_name': 'Bench',
+                'reporter_last_name': 'Client', 'reporter_phone': '0700000000',
+                'incident_location': 'Nairobi', 'incident_type': 'other', 'description': 'Load test',
+                'incident_date': '2024-01-01T00:00:00Z',
+            }, content_type='application/json')
+            statuses.append(response.status_code)
+        stdout.write(f"report_create {policy['rate']} burst {policy['burst']}: "
+                     f"{statuses.count(201)} created, {statuses.count(429)} throttled, "
+                     f"Retry-After {response.get('Retry-After')}")
@@ -0,0 +1,59 @@
+"""
+Import-time profile of a cold process start.
+
+Starts a fresh interpreter with ``python -X importtime`` that either sets
+Django up, as manage.py does, or boots the WSGI application, as a web
+worker does, and parses what it reports on stderr. Used by
+``manage.py profile_startup`` and the startup benchmark.
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+SCRIPTS = {
+    'setup': 'from gbv_project.startup import setup; setup()',
+    'worker': 'import gbv_project.wsgi',
+}
+
+
+ImportRecord = namedtuple('ImportRecord', 'module self_us cumulative_us depth')
+
+
+def parse(stderr):
+    """ImportRecords from -X importtime output, in the order they finished"""
+    records = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            records.append(ImportRecord(module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return records
+
+
+def measure(mode='setup', python=sys.executable):
+    """Cold-start a process in one of SCRIPTS; returns (wall time in ms, ImportRecords)"""
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'gbv_project.settings')}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [python, '-X', 'importtime', '-c', SCRIPTS[mode]],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'startup failed')
+    return wall_ms, parse(result.stderr)
+
+
+def by_package(records):
+    """{top-level package: total self time in microseconds}"""
+    totals = defaultdict(int)
+    for record in records:
+        totals[record.module.split('.')[0]] += record.self_us
+    return dict(totals)
@@ -0,0 +1,306 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+The request path only touches a dict in this process's registry:
+MetricsMiddleware times each request, counts its database queries, and
+files both under the view and DRF action that
+profiling.view_tag names. Other code records through inc() and observe()
+(the email service, the location and directory snapshot caches).
+
+With several worker processes each one writes its registry to
+METRICS_DIR/<pid>-<start time>.json, at most every METRICS_FLUSH_SECONDS
+and at exit. The metrics endpoint merges every file there, so counters
+from workers that have exited keep counting and never go backwards.
+Clear the directory when the service is (re)deployed. Without METRICS_DIR
+the endpoint reports only the process serving it.
+
+Point-in-time values (reports by status) are read from the database when
+the endpoint is scraped. /metrics requires METRICS_TOKEN as a bearer
+token and is disabled while the token is unset.
+"""
+import atexit
+import bisect
+import contextvars
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, JsonResponse
+
+from .profiling import view_tag
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = getattr(settings, 'METRICS_DIR', None)
+FLUSH_SECONDS = getattr(settings, 'METRICS_FLUSH_SECONDS', 5)
+TOKEN = getattr(settings, 'METRICS_TOKEN', None)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'gbv_http_request_duration_seconds': (
+        'histogram', 'Time to handle a request, by view and DRF action', LATENCY_BUCKETS),
+    'gbv_http_request_db_queries': (
+        'histogram', 'Database queries run by a request, by view and DRF action', QUERY_BUCKETS),
+    'gbv_cache_lookups_total': (
+        'counter', 'Snapshot cache lookups; result is local, shared or miss', None),
+    'gbv_email_send_duration_seconds': (
+        'histogram', 'Time to hand emails to the mail server, per send or batch', LATENCY_BUCKETS),
+    'gbv_emails_total': (
+        'counter', 'Notification emails by result: sent, failed or queued for a batch', None),
+    'gbv_reports': (
+        'gauge', 'Reports that are not deleted, by status', None),
+}
+UNMATCHED = ('unmatched', 'none')
+
+
+class Registry:
+    """Counters and histograms of one process, keyed by (name, label pairs)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        # [count per bucket..., count above the last bucket, sum]
+        self.histograms = {}
+        self.dirty = False
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.counters[name, labels] += value
+            self.dirty = True
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        with self.lock:
+            series = self.histograms.get((name, labels))
+            if series is None:
+                series = self.histograms[name, labels] = [0] * (len(buckets) + 1) + [0.0]
+            series[bisect.bisect_left(buckets, value)] += 1
+            series[-1] += value
+            self.dirty = True
+
+    def snapshot(self):
+        """A JSON-able copy: {'counters': [[name, labels, value]], 'histograms': [[name, labels, series]]}"""
+        with self.lock:
+            self.dirty = False
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, labels, list(series)] for (name, labels), series in self.histograms.items()],
+            }
+
+
+registry = Registry()
+
+
+def _labels(labels):
+    return tuple(labels.items())
+
+
+def inc(name, value=1, **labels):
+    registry.inc(name, _labels(labels), value)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, _labels(labels), value)
+
+
+_process_file = None
+_next_flush = 0.0
+_flush_lock = threading.Lock()
+
+
+def flush():
+    """Write this process's registry to METRICS_DIR, if there is one and anything changed"""
+    global _process_file, _next_flush
+    _next_flush = time.monotonic() + FLUSH_SECONDS
+    if not METRICS_DIR or not registry.dirty or not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        directory = Path(METRICS_DIR)
+        if _process_file is None:
+            _process_file = directory / f'{os.getpid()}-{int(time.time() * 1000)}.json'
+        directory.mkdir(parents=True, exist_ok=True)
+        partial = _process_file.with_suffix('.tmp')
+        partial.write_text(json.dumps(registry.snapshot()))
+        os.replace(partial, _process_file)
+    except OSError:
+        logger.exception("Could not write metrics to %s", METRICS_DIR)
+    finally:
+        _flush_lock.release()
+
+
+atexit.register(flush)
+
+
+def _merged():
+    """Counters and histograms summed over every process that has written to METRICS_DIR"""
+    if not METRICS_DIR:
+        snapshots = [registry.snapshot()]
+    else:
+        flush()
+        snapshots = []
+        for path in Path(METRICS_DIR).glob('*.json'):
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        if _process_file is None:
+            # Nothing flushed from here yet
+            snapshots.append(registry.snapshot())
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[name, tuple(map(tuple, labels))] += value
+        for name, labels, series in snapshot['histograms']:
+            key = name, tuple(map(tuple, labels))
+            if name not in METRICS or len(series) != len(METRICS[name][2]) + 2:
+                # Written by a process running other buckets
+                continue
+            merged = histograms.setdefault(key, [0] * len(series))
+            for i, value in enumerate(series):
+                merged[i] += value
+    return counters, histograms
+
+
+def _report_gauges():
+    from django.db.models import Count
+
+    from reports.models import GBVReport
+
+    return [
+        ('gbv_reports', (('status', status),), count)
+        for status, count in GBVReport.objects.order_by().values_list('status').annotate(Count('pk'))
+    ]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _series(name, labels, value, extra=()):
+    pairs = ','.join(f'{key}="{_escape(label)}"' for key, label in (*labels, *extra))
+    value = int(value) if float(value).is_integer() else value
+    return f'{name}{{{pairs}}} {value}' if pairs else f'{name} {value}'
+
+
+def render():
+    """Every metric, merged across processes, in the text exposition format"""
+    counters, histograms = _merged()
+    by_name = defaultdict(list)
+    for (name, labels), value in sorted(counters.items()):
+        by_name[name].append(_series(name, labels, value))
+    for (name, labels), series in sorted(histograms.items()):
+        buckets, total = series[:-1], series[-1]
+        cumulative = 0
+        for bound, count in zip((*METRICS[name][2], '+Inf'), buckets):
+            cumulative += count
+            by_name[name].append(_series(f'{name}_bucket', labels, cumulative, [('le', bound)]))
+        by_name[name].append(_series(f'{name}_sum', labels, total))
+        by_name[name].append(_series(f'{name}_count', labels, cumulative))
+    for name, labels, value in _report_gauges():
+        by_name[name].append(_series(name, labels, value))
+
+    lines = []
+    for name, (kind, help_text, _) in METRICS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', *by_name.get(name, ())]
+    return '\n'.join(lines) + '\n'
+
+
+class QueryCounter:
+    """Queries run for one request"""
+
+    def __init__(self):
+        self.count = 0
+
+
+# The request's counter. Context variables follow the request into the
+# threads that sync_to_async and reports.parallel run it in under ASGI, so
+# queries are counted on whichever connection runs them.
+_request_queries = contextvars.ContextVar('gbv_request_queries', default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    queries = _request_queries.get()
+    if queries is not None:
+        queries.count += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(connection, **kwargs):
+    # First in line, so connection.execute_wrapper() blocks still pop their own
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+connection_created.connect(install_query_counter)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        # Connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request._metrics_view = None
+        queries = QueryCounter()
+        token = _request_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self.record(request, response, time.perf_counter() - start, queries.count)
+        return response
+
+    async def __acall__(self, request):
+        request._metrics_view = None
+        queries = QueryCounter()
+        token = _request_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self.record(request, response, time.perf_counter() - start, queries.count)
+        return response
+
+    def record(self, request, response, duration, queries):
+        view, action = request._metrics_view or UNMATCHED
+        labels = (('view', view), ('action', action))
+        registry.observe('gbv_http_request_duration_seconds',
+                         (*labels, ('status', f'{response.status_code // 100}xx')), duration)
+        registry.observe('gbv_http_request_db_queries', labels, queries)
+        if time.monotonic() >= _next_flush:
+            flush()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view = view_tag(view_func, request.method)
+
+
+def metrics_view(request):
+    supplied = request.headers.get('Authorization', '')
+    if not TOKEN or not hmac.compare_digest(supplied.encode(), f'Bearer {TOKEN}'.encode()):
+        return JsonResponse({'error': 'A valid metrics token is required'}, status=403)
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
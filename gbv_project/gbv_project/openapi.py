@@ -0,0 +1,81 @@
+"""
+Precomputed OpenAPI schema.
+
+Introspecting every viewset and serializer takes hundreds of milliseconds,
+so the schema is generated once by ``manage.py build_openapi_schema`` into
+OPENAPI_SCHEMA_FILE, which is committed with the code. ``--check`` fails
+when the committed file no longer matches what the code generates, for
+CI. The schema view reads the file once per process and serves the bytes
+with an ETag. Without the file (a fresh checkout in development) it falls
+back to generating the schema per request as before. drf-spectacular
+itself is imported only to build the schema or render the Swagger UI.
+"""
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_safe
+
+SCHEMA_FILE = Path(getattr(settings, 'OPENAPI_SCHEMA_FILE', Path(settings.BASE_DIR) / 'openapi.json'))
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def generate():
+    """The schema for the current code, as the bytes written to SCHEMA_FILE"""
+    from drf_spectacular.generators import SchemaGenerator
+    from drf_spectacular.renderers import OpenApiJsonRenderer
+
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    rendered = OpenApiJsonRenderer().render(schema, renderer_context={})
+    # Re-indented so diffs of the committed file stay readable
+    return json.dumps(json.loads(rendered), indent=2, ensure_ascii=False).encode() + b'\n'
+
+
+def load():
+    """(body, etag) of the schema file, read once per process; None if there is no file"""
+    if 'body' not in _loaded:
+        with _lock:
+            if 'body' not in _loaded:
+                try:
+                    body = SCHEMA_FILE.read_bytes()
+                except FileNotFoundError:
+                    body = None
+                _loaded['body'] = body
+                _loaded['etag'] = body and f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    return _loaded['body'], _loaded['etag']
+
+
+@require_safe
+def schema_view(request):
+    body, etag = load()
+    if body is None:
+        from drf_spectacular.views import SpectacularAPIView
+
+        return SpectacularAPIView.as_view()(request)
+
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(body, content_type='application/vnd.oai.openapi+json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+_swagger_view = None
+
+
+def swagger_ui(request):
+    """Swagger UI for the schema; drf-spectacular is only imported once it is asked for"""
+    global _swagger_view
+    if _swagger_view is None:
+        from drf_spectacular.views import SpectacularSwaggerView
+
+        _swagger_view = SpectacularSwaggerView.as_view(url_name='schema')
+    return _swagger_view(request)
@@ -0,0 +1,29 @@
+"""
+Fast JSON request parsing; the counterpart of gbv_project.renderers.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(JSONParser):
+    """
+    Parses JSON request bodies with orjson, falling back to JSONParser.
+    orjson already rejects NaN and Infinity, matching STRICT_JSON.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        body = stream.read() if stream is not None else b''
+        if encoding.lower().replace('-', '') != 'utf8':
+            body = body.decode(encoding)
+        try:
+            return orjson.loads(body)
+        except (orjson.JSONDecodeError, UnicodeDecodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
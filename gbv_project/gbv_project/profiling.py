@@ -0,0 +1,155 @@
+"""
+On-demand cProfile of production requests.
+
+ProfilingMiddleware profiles a random PROFILE_SAMPLE_RATE fraction of
+requests, plus any request that carries PROFILE_HEADER set to
+PROFILE_TOKEN (off while the token is unset). It profiles the rest of the
+handler, the view and the rendering of its response, so it should be the
+last middleware, after authentication and idempotency have had their say.
+Only requests served synchronously (WSGI) are profiled.
+
+Each profile is written as a pstats file to PROFILE_DIR, named
+<unix ms>~<pid>~<view>~<action>~<duration ms>.prof, where view is the
+dotted path of the view class (or function) and action is the DRF action
+or the HTTP method. The directory is a ring: once it holds more than
+PROFILE_MAX_FILES profiles the oldest are deleted. A request profiled by
+header gets the file name back in the PROFILE_HEADER response header.
+``manage.py aggregate_profiles`` merges and summarises the collected files.
+"""
+import cProfile
+import hmac
+import logging
+import os
+import random
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = float(getattr(settings, 'PROFILE_SAMPLE_RATE', 0.0))
+TOKEN = getattr(settings, 'PROFILE_TOKEN', None)
+HEADER = getattr(settings, 'PROFILE_HEADER', 'X-GBV-Profile')
+PROFILE_DIR = Path(getattr(settings, 'PROFILE_DIR', Path(settings.BASE_DIR) / 'profiles'))
+MAX_FILES = getattr(settings, 'PROFILE_MAX_FILES', 500)
+SUFFIX = '.prof'
+SEPARATOR = '~'
+
+
+ProfileFile = namedtuple('ProfileFile', 'path recorded_at pid view action duration_ms')
+
+
+def parse_name(path):
+    """The ProfileFile for a path in PROFILE_DIR, or None if it is not one of ours"""
+    path = Path(path)
+    if path.suffix != SUFFIX:
+        return None
+    parts = path.stem.split(SEPARATOR)
+    if len(parts) != 5:
+        return None
+    try:
+        return ProfileFile(path, int(parts[0]) / 1000, int(parts[1]), parts[2], parts[3], int(parts[4]))
+    except ValueError:
+        return None
+
+
+def collected(directory=None):
+    """ProfileFiles in directory (PROFILE_DIR by default), oldest first"""
+    try:
+        entries = list(os.scandir(directory or PROFILE_DIR))
+    except FileNotFoundError:
+        return []
+    files = (parse_name(entry.path) for entry in entries if entry.is_file())
+    return sorted((file for file in files if file is not None), key=lambda file: file.recorded_at)
+
+
+def view_tag(view_func, method):
+    """(view, action) naming a resolved view, e.g. ('reports.views.GBVReportViewSet', 'list')"""
+    # DRF's as_view() sets .cls; @api_view names its class after the function
+    target = getattr(view_func, 'cls', view_func)
+    view = f'{target.__module__}.{target.__name__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower()) or method.lower()
+    # Keep the separator and path characters out of file names
+    return view.replace(SEPARATOR, '-'), action.replace(SEPARATOR, '-').replace(os.sep, '-')
+
+
+def _trim(directory, keep):
+    files = collected(directory)
+    for file in files[:max(0, len(files) - keep)]:
+        try:
+            file.path.unlink()
+        except FileNotFoundError:
+            # Another worker got there first
+            pass
+
+
+def save(profiler, view, action, duration_ms, directory=None):
+    """Write a finished profile into the ring; returns its file name"""
+    directory = Path(directory or PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = SEPARATOR.join([str(int(time.time() * 1000)), str(os.getpid()), view, action, str(int(duration_ms))])
+    path = directory / f'{name}{SUFFIX}'
+    # Written under a temporary name so readers never see half a file
+    partial = directory / f'.{name}.tmp'
+    profiler.dump_stats(partial)
+    os.replace(partial, path)
+    _trim(directory, MAX_FILES)
+    return path.name
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        requested = self._requested(request)
+        if not requested and not (SAMPLE_RATE and random.random() < SAMPLE_RATE):
+            return self.get_response(request)
+
+        request._profile_view = None
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        # Rendering happens inside get_response, so it is part of the profile
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        if request._profile_view is None:
+            # Not resolved to a view
+            return response
+        try:
+            name = save(profiler, *request._profile_view, duration_ms)
+        except OSError:
+            logger.exception("Could not write request profile to %s", PROFILE_DIR)
+            return response
+        if requested:
+            response[HEADER] = name
+        return response
+
+    async def __acall__(self, request):
+        # cProfile follows one thread, not a request hopping between the
+        # event loop and sync_to_async threads
+        return await self.get_response(request)
+
+    def _requested(self, request):
+        """Whether the request asks to be profiled with a valid token"""
+        supplied = request.headers.get(HEADER)
+        return bool(TOKEN and supplied) and hmac.compare_digest(supplied.encode(), str(TOKEN).encode())
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, '_profile_view'):
+            request._profile_view = view_tag(view_func, request.method)
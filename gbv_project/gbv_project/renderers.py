@@ -0,0 +1,61 @@
+"""
+Fast JSON rendering for DRF responses.
+
+Uses orjson when it is installed and falls back to DRF's stdlib-based
+JSONRenderer otherwise. Datetimes, Decimals, lazy translation strings and
+anything else orjson does not handle natively are passed to DRF's own
+JSONEncoder, so the output matches the stock renderer.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+_encoder = encoders.JSONEncoder()
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for JSONRenderer. Indented output (browsable API,
+    ``Accept: application/json; indent=4``), non-default UNICODE_JSON or
+    COMPACT_JSON settings and anything orjson refuses, such as integers
+    beyond 64 bits, go through the stock renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        # orjson always writes compact, unescaped UTF-8
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Match JSONRenderer: escape U+2028/U+2029 so the output stays a strict
+        # javascript subset.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class EventStreamRenderer(FastJSONRenderer):
+    """
+    Lets views that stream server-sent events accept ``Accept:
+    text/event-stream``. The stream itself bypasses rendering; error
+    responses raised before it starts are written as JSON.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
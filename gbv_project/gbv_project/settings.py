@@ -33,7 +33,8 @@ ALLOWED_HOSTS = ["*"]
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # Admin modules are autodiscovered in urls.py, not at startup
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -41,7 +42,6 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'corsheaders',
-    'rest_framework_simplejwt',
     'drf_spectacular',
 
     'accounts.apps.AccountsConfig',
@@ -53,14 +53,19 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'accounts.User'
 
 MIDDLEWARE = [
+    # First, so its timings cover the other middleware
+    'gbv_project.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'reports.idempotency.IdempotencyMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Last, so profiles cover the view rather than the other middleware
+    'gbv_project.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'gbv_project.urls'
@@ -98,9 +103,18 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
 ]
 WSGI_APPLICATION = 'gbv_project.wsgi.application'
 
+ASGI_APPLICATION = 'gbv_project.asgi.application'
+
+# Run the independent sub-queries of case_summary and the dashboard in a
+# thread pool (reports.parallel), each on its own DB connection. Leave off
+# for SQLite and under tests.
+GBV_PARALLEL_QUERIES = False
+GBV_PARALLEL_QUERY_THREADS = 4
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -112,6 +126,38 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Point this at a shared backend (Redis/Memcached) when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'gbv-default',
+    }
+}
+
+# API throttling buckets (gbv_project.throttling). Per-worker with locmem;
+# point this at a Redis or memcached cache so limits hold across workers.
+THROTTLE_CACHE = 'default'
+
+# Request profiling (gbv_project.profiling). PROFILE_SAMPLE_RATE is the
+# fraction of requests profiled at random; a request with an X-GBV-Profile
+# header equal to PROFILE_TOKEN is always profiled (disabled while unset).
+# Collect the files with manage.py aggregate_profiles.
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_TOKEN = None
+PROFILE_DIR = BASE_DIR / 'profiles'
+PROFILE_MAX_FILES = 500
+
+# Metrics (gbv_project.metrics), served at /metrics to scrapers presenting
+# METRICS_TOKEN as a bearer token; disabled while the token is unset. Each
+# worker process writes its counters to METRICS_DIR, which must be shared
+# by all workers on the host and cleared on deploy.
+METRICS_TOKEN = None
+METRICS_DIR = BASE_DIR / 'metrics'
+METRICS_FLUSH_SECONDS = 5
+
 
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
@@ -121,6 +167,20 @@ REST_FRAMEWORK = {
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # Client IPs (throttling) come from REMOTE_ADDR. Behind a reverse proxy,
+    # set this to the number of proxies that append to X-Forwarded-For;
+    # unset, DRF would trust whatever X-Forwarded-For the client sends.
+    "NUM_PROXIES": 0,
+    # orjson-backed when installed, stock DRF JSON otherwise
+    "DEFAULT_RENDERER_CLASSES": [
+        "gbv_project.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "gbv_project.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
 
@@ -145,6 +205,9 @@ SPECTACULAR_SETTINGS = {
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
     'COMPONENT_SPLIT_REQUEST': True,
+    # Operation ids and tags keep their 'api_' prefix; otherwise it is
+    # guessed from whichever views happen to be in the URLconf
+    'SCHEMA_PATH_PREFIX': '',
     'SECURITY': [
         {
             'Bearer': {
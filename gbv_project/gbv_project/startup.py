@@ -0,0 +1,44 @@
+"""
+Process boot for manage.py and the WSGI and ASGI entry points.
+
+Startup allocates hundreds of thousands of long-lived objects (modules,
+classes, URL patterns), which trigger repeated garbage collections, full
+ones included, that find nothing to free. The collector is paused while
+Django is set up and everything loaded so far is then frozen out of future
+collections, which also keeps a preforking server's workers from copying
+those pages on write. Web workers also load the URLconf (and with it every
+view module) at boot, so the first request is not the one to pay for it.
+"""
+import gc
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+@contextmanager
+def paused_gc():
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.freeze()
+        gc.enable()
+
+
+def setup():
+    """django.setup() for management commands"""
+    import django
+
+    with paused_gc():
+        django.setup()
+
+
+def load_application(factory):
+    """Build the application with factory (get_wsgi_application or get_asgi_application)"""
+    with paused_gc():
+        application = factory()
+        if getattr(settings, 'PRELOAD_URLCONF', True):
+            from django.urls import get_resolver
+
+            get_resolver().url_patterns
+    return application
@@ -0,0 +1,153 @@
+"""
+Token-bucket throttling on the shared cache.
+
+Each bucket is stored as one integer: its theoretical arrival time (TAT)
+in milliseconds, as in the generic cell rate algorithm. A bucket refills
+one token every interval = period / rate and holds up to burst tokens. A
+request takes a token with a single atomic cache.incr(key, interval) and
+is allowed if the new TAT is no more than burst intervals ahead of now.
+
+A request usually has several buckets (per IP, per email, ...). A token
+is taken from each in turn, so an allowed request costs one round trip
+per bucket. The first empty bucket denies the request, and the tokens
+already taken from its other buckets are given back.
+
+The slower paths take another trip:
+- A denied take gives its token back with decr, so hammering a closed
+  bucket does not push it further into the future.
+- A TAT that has fallen behind now means the bucket refilled while idle,
+  and it is reset to now + interval.
+- A missing key is created with add.
+
+Requests racing on the reset of an idle bucket can each be let through,
+so the excess is bounded by how many arrive in that instant.
+
+Policies are named scopes set in THROTTLE_POLICIES:
+    {'reset_password': {'rate': '5/hour', 'burst': 3, 'by': ('ip', 'field:email')}}
+'by' lists the identities that get their own bucket: 'ip', 'user', or
+'field:<name>' for a value in the request body. Every bucket must have a
+token for the request to pass. The IP is REMOTE_ADDR, or the address
+REST_FRAMEWORK['NUM_PROXIES'] hops back in X-Forwarded-For; never the
+raw header, which any client can set. A rate of None turns a policy off. The
+buckets live in THROTTLE_CACHE, which must be shared by all workers
+(Redis or memcached) for the limits to hold across processes.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+POLICIES = {
+    # Anonymous report submission; each one sends email
+    'report_create': {'rate': '20/hour', 'burst': 5, 'by': ('ip',)},
+    'signup': {'rate': '10/hour', 'burst': 3, 'by': ('ip',)},
+    # Per IP only: a per-email bucket would let anyone lock a user out
+    'login': {'rate': '10/min', 'burst': 10, 'by': ('ip',)},
+    'reset_password': {'rate': '5/hour', 'burst': 3, 'by': ('ip', 'field:email')},
+    **getattr(settings, 'THROTTLE_POLICIES', {}),
+}
+CACHE_ALIAS = getattr(settings, 'THROTTLE_CACHE', 'default')
+KEY_PREFIX = 'throttle'
+# Buckets idle this long are full again anyway; keep keys at least an hour
+MIN_KEY_TIMEOUT = 3600
+
+
+def parse_rate(rate):
+    """'10/min' -> interval between tokens in milliseconds"""
+    count, _, period = rate.partition('/')
+    return max(1, int(PERIODS[period.strip()] * 1000 / int(count)))
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, cache_alias=CACHE_ALIAS):
+        self.interval = parse_rate(rate)
+        self.burst = max(1, int(burst))
+        # How far ahead of now the TAT may run: the burst, less the token being taken
+        self.tolerance = self.interval * self.burst
+        self.timeout = max(MIN_KEY_TIMEOUT, self.tolerance // 1000 + 1)
+        self.cache = caches[cache_alias]
+
+    def take(self, key, now=None):
+        """Take a token; returns 0 if allowed, else the seconds until one is available"""
+        now = int((time.time() if now is None else now) * 1000)
+        try:
+            tat = self.cache.incr(key, self.interval)
+        except ValueError:
+            if self.cache.add(key, now + self.interval, self.timeout):
+                return 0
+            tat = self.cache.incr(key, self.interval)
+        if tat - self.interval < now:
+            # Idle long enough to be full again
+            self.cache.set(key, now + self.interval, self.timeout)
+            return 0
+        if tat - now <= self.tolerance:
+            return 0
+        self.give_back(key)
+        return (tat - now - self.tolerance) / 1000
+
+    def give_back(self, key):
+        """Return a token taken with take()"""
+        try:
+            self.cache.decr(key, self.interval)
+        except ValueError:
+            # Expired meanwhile, so the bucket is full anyway
+            pass
+
+
+_buckets = {}
+
+
+def get_bucket(scope):
+    """The TokenBucket for a policy, or None if it is off"""
+    if scope not in _buckets:
+        policy = POLICIES.get(scope) or {}
+        _buckets[scope] = (
+            TokenBucket(policy['rate'], policy.get('burst', 1)) if policy.get('rate') else None
+        )
+    return _buckets[scope]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """DRF throttle for one named policy; views return it from get_throttles()"""
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.wait_seconds = None
+
+    def identities(self, request):
+        # get_ident honours NUM_PROXIES, and is REMOTE_ADDR when it is 0
+        for kind in POLICIES.get(self.scope, {}).get('by', ('ip',)):
+            if kind == 'ip':
+                yield 'ip', self.get_ident(request)
+            elif kind == 'user':
+                if request.user and request.user.is_authenticated:
+                    yield 'user', request.user.pk
+            elif kind.startswith('field:'):
+                value = request.data.get(kind[6:]) if hasattr(request.data, 'get') else None
+                if isinstance(value, str) and value.strip():
+                    # Hashed: keys may end up in cache dumps and logs
+                    yield kind, hashlib.sha256(value.strip().casefold().encode()).hexdigest()[:32]
+
+    def allow_request(self, request, view):
+        bucket = get_bucket(self.scope)
+        if bucket is None:
+            return True
+        keys = [f'{KEY_PREFIX}:{self.scope}:{kind}:{ident}' for kind, ident in self.identities(request)]
+        now = time.time()
+        taken = []
+        for key in keys:
+            self.wait_seconds = bucket.take(key, now)
+            if self.wait_seconds:
+                # Denied: don't charge the buckets that still had a token
+                for other in taken:
+                    bucket.give_back(other)
+                return False
+            taken.append(key)
+        return True
+
+    def wait(self):
+        return self.wait_seconds
@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from gbv_project.metrics import metrics_view
+from gbv_project.openapi import schema_view, swagger_ui
+
+# Admin modules are loaded with the URLconf rather than at startup
+# (INSTALLED_APPS has SimpleAdminConfig), so management commands skip them
+admin.autodiscover()
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -12,9 +15,10 @@ urlpatterns = [
   
     
     # API Documentation
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-]
+    # Served from the file written by manage.py build_openapi_schema
+    path('api/schema/', schema_view, name='schema'),
+    path('', swagger_ui, name='swagger-ui'),
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # Prometheus scrape endpoint
+    path('metrics', metrics_view, name='metrics'),
+]
\ No newline at end of file
@@ -11,6 +11,8 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from gbv_project.startup import load_application
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gbv_project.settings')
 
-application = get_wsgi_application()
+application = load_application(get_wsgi_application)
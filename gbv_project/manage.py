@@ -15,6 +15,10 @@ def main():
             "available on your PYTHONPATH environment variable? Did you "
             "forget to activate a virtual environment?"
         ) from exc
+    from gbv_project.startup import setup
+
+    # Set up ahead of the command so it happens with the collector paused
+    setup()
     execute_from_command_line(sys.argv)
 
 
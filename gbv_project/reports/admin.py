@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import GBVReport, Appointment, CaseAssignment, CaseNote, Document
+from .models import GBVReport, Appointment, CaseAssignment, CaseNote, Document, ArchivedGBVReport, AccessLog, Location, LocationAlias, UnmatchedLocation, WebhookEndpoint
+from .archiving import restore_report
+from .locations import display_name, normalize_key
 
 @admin.register(GBVReport)
 class GBVReportAdmin(admin.ModelAdmin):
@@ -36,6 +38,100 @@ class GBVReportAdmin(admin.ModelAdmin):
         })
     )
 
+@admin.register(ArchivedGBVReport)
+class ArchivedGBVReportAdmin(admin.ModelAdmin):
+    list_display = ['reference_code', 'incident_type', 'status', 'date_reported', 'archived_at']
+    search_fields = ['reference_code', 'incident_location']
+    actions = ['restore_reports']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description="Restore selected reports")
+    def restore_reports(self, request, queryset):
+        refs = list(queryset.values_list('reference_code', flat=True))
+        for ref in refs:
+            restore_report(ref)
+        self.message_user(request, f"Restored {len(refs)} reports")
+
+class LocationAliasInline(admin.TabularInline):
+    model = LocationAlias
+    extra = 1
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ['name', 'key', 'latitude', 'longitude', 'is_reviewed']
+    list_filter = ['is_reviewed']
+    search_fields = ['name', 'aliases__key']
+    readonly_fields = ['key']
+    inlines = [LocationAliasInline]
+    actions = ['mark_reviewed']
+
+    @admin.action(description="Mark reviewed (offer in autocomplete)")
+    def mark_reviewed(self, request, queryset):
+        # save() rather than update() so the gazetteer is invalidated
+        for location in queryset.filter(is_reviewed=False):
+            location.is_reviewed = True
+            location.save(update_fields=['is_reviewed'])
+        self.message_user(request, "Marked as reviewed")
+
+    def save_model(self, request, obj, form, change):
+        obj.key = normalize_key(obj.name)
+        super().save_model(request, obj, form, change)
+
+    def save_formset(self, request, form, formset, change):
+        aliases = formset.save(commit=False)
+        for alias in aliases:
+            alias.key = normalize_key(alias.key)
+            alias.save()
+        for alias in formset.deleted_objects:
+            alias.delete()
+
+@admin.register(UnmatchedLocation)
+class UnmatchedLocationAdmin(admin.ModelAdmin):
+    list_display = ['text', 'key', 'first_seen', 'last_seen']
+    search_fields = ['key']
+    readonly_fields = ['key', 'first_seen', 'last_seen']
+    actions = ['add_as_locations']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Add as new locations (then run normalize_locations)")
+    def add_as_locations(self, request, queryset):
+        added = 0
+        for unmatched in queryset:
+            if not Location.objects.filter(key=unmatched.key).exists():
+                Location.objects.create(name=display_name(unmatched.text), key=unmatched.key)
+                added += 1
+        queryset.delete()
+        self.message_user(request, f"Added {added} locations")
+
+@admin.register(AccessLog)
+class AccessLogAdmin(admin.ModelAdmin):
+    list_display = ['accessed_at', 'user', 'action', 'report_reference', 'object_id', 'is_confidential']
+    list_filter = ['action', 'is_confidential']
+    search_fields = ['report_reference']
+    actions = None
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(WebhookEndpoint)
+class WebhookEndpointAdmin(admin.ModelAdmin):
+    list_display = ['name', 'url', 'is_active', 'consecutive_failures', 'circuit_open_until']
+    list_filter = ['is_active']
+    readonly_fields = ['consecutive_failures', 'circuit_open_until']
+
 admin.site.register(Appointment)
 admin.site.register(CaseAssignment)
 admin.site.register(CaseNote)
@@ -0,0 +1,114 @@
+"""
+Moves soft-deleted reports and everything hanging off them into the archive
+tables, and brings them back on request. Each batch is one transaction.
+"""
+from django.db import transaction
+
+from . import events, heatmap, rollups, sync, triage
+from .models import (
+    GBVReport, ReportStatusChange, CaseAssignment, Appointment, AppointmentReminder, CaseNote, Document,
+    ArchivedGBVReport, ArchivedReportStatusChange, ArchivedCaseAssignment,
+    ArchivedAppointment, ArchivedAppointmentReminder, ArchivedCaseNote, ArchivedDocument,
+)
+
+# (live model manager, archive model) for the child tables of a report
+CHILD_TABLES = [
+    (ReportStatusChange.objects, ArchivedReportStatusChange),
+    (CaseAssignment.all_objects, ArchivedCaseAssignment),
+    (Appointment.objects, ArchivedAppointment),
+    (CaseNote.objects, ArchivedCaseNote),
+    (Document.objects, ArchivedDocument),
+]
+
+# (live model manager, archive model, path to the report) for the tables
+# hanging off those children. Archived reminders stop a restored
+# appointment from sending its reminders again.
+GRANDCHILD_TABLES = [
+    (AppointmentReminder.objects, ArchivedAppointmentReminder, 'appointment__report_id'),
+]
+
+
+def _copy_columns(target_model):
+    """Attribute names shared by the live and archive tables"""
+    return [
+        field.attname for field in target_model._meta.concrete_fields
+        if field.name != 'archived_at'
+    ]
+
+
+def _move(source_queryset, target_model):
+    columns = _copy_columns(target_model)
+    rows = [target_model(**row) for row in source_queryset.values(*columns)]
+    target_model.objects.bulk_create(rows)
+    return len(rows)
+
+
+def _restore(source_queryset, target_model):
+    columns = _copy_columns(source_queryset.model)
+    rows = list(source_queryset.values(*columns))
+    objs = [target_model(**row) for row in rows]
+    target_model._base_manager.bulk_create(objs)
+
+    # bulk_create applies auto_now/auto_now_add; put the original
+    # timestamps back.
+    auto_fields = [
+        field.name for field in target_model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    if auto_fields and objs:
+        for obj, row in zip(objs, rows):
+            for name in auto_fields:
+                setattr(obj, name, row[name])
+        target_model._base_manager.bulk_update(objs, auto_fields)
+    return len(objs)
+
+
+def archive_deleted_reports(batch_size=200, max_batches=None):
+    """
+    Archive soft-deleted reports batch_size at a time.
+    Yields the number of reports moved by each batch.
+    """
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            refs = list(
+                GBVReport.all_objects.filter(is_deleted=True)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not refs:
+                return
+            _move(GBVReport.all_objects.filter(pk__in=refs), ArchivedGBVReport)
+            # Before their parents, whose deletion cascades to them
+            for manager, archive_model, report_path in GRANDCHILD_TABLES:
+                _move(manager.filter(**{f'{report_path}__in': refs}), archive_model)
+            for manager, archive_model in CHILD_TABLES:
+                children = manager.filter(report_id__in=refs)
+                _move(children, archive_model)
+                children.delete()
+            GBVReport.all_objects.filter(pk__in=refs).delete()
+        batches += 1
+        yield len(refs)
+
+
+@transaction.atomic
+def restore_report(reference_code):
+    """Move an archived report and its children back into the live tables"""
+    archived = ArchivedGBVReport.objects.select_for_update().get(pk=reference_code)
+    _restore(ArchivedGBVReport.objects.filter(pk=reference_code), GBVReport)
+    GBVReport.all_objects.filter(pk=reference_code).update(is_deleted=False)
+    for manager, archive_model in CHILD_TABLES:
+        _restore(archive_model.objects.filter(report_id=reference_code), manager.model)
+    for manager, archive_model, report_path in GRANDCHILD_TABLES:
+        _restore(archive_model.objects.filter(**{report_path: reference_code}), manager.model)
+    archived.delete()
+    report = GBVReport.objects.get(pk=reference_code)
+    triage.sync_report(report)
+    rollups.apply_changes([(None, report)])
+    heatmap.apply_changes([(None, report)])
+    events.publish_model_event(report, True)
+    sync.record_changes(
+        [(report, 'created')]
+        + [(child, 'created') for manager, _ in CHILD_TABLES for child in manager.filter(report_id=reference_code)]
+    )
+    return report
@@ -0,0 +1,144 @@
+"""
+Access auditing for sensitive case data.
+
+Reads are recorded into an in-process buffer instead of inserting a row per
+request. The buffer is written with one bulk_create when it reaches
+AUDIT_LOG_BATCH_SIZE entries, or by a background thread at most
+AUDIT_LOG_FLUSH_SECONDS after the oldest entry was added, and once more when
+the process exits. Setting AUDIT_LOG_FLUSH_SECONDS to 0 writes every entry
+immediately.
+"""
+import atexit
+import logging
+import threading
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import AccessLog
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 200)
+FLUSH_SECONDS = getattr(settings, 'AUDIT_LOG_FLUSH_SECONDS', 5)
+# Entries kept while the database is unavailable; the oldest are dropped past this
+MAX_BUFFERED = getattr(settings, 'AUDIT_LOG_MAX_BUFFERED', 10000)
+
+
+class AuditBuffer:
+    def __init__(self, batch_size=BATCH_SIZE, flush_seconds=FLUSH_SECONDS):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.entries = []
+        self.lock = threading.Lock()
+        # Serializes writers so a failed batch is requeued ahead of newer entries
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def add(self, entries):
+        with self.lock:
+            self.entries.extend(entries)
+            size = len(self.entries)
+        if size >= self.batch_size or not self.flush_seconds:
+            self.flush()
+        elif size:
+            self._ensure_thread()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows written"""
+        with self.flush_lock:
+            with self.lock:
+                entries, self.entries = self.entries, []
+            if not entries:
+                return 0
+            try:
+                AccessLog.objects.bulk_create(entries, batch_size=self.batch_size)
+            except Exception:
+                logger.exception("Could not write %d access log entries", len(entries))
+                with self.lock:
+                    self.entries[:0] = entries
+                    del self.entries[:-MAX_BUFFERED]
+                return 0
+            return len(entries)
+
+    def _ensure_thread(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='audit-log-flush', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while not self.wakeup.wait(self.flush_seconds):
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+_buffer = AuditBuffer()
+atexit.register(_buffer.flush)
+
+
+def client_ip(request):
+    if request is None:
+        return None
+    return request.META.get('REMOTE_ADDR') or None
+
+
+def entry(user, report_reference, action, object_id='', is_confidential=False, ip_address=None):
+    return AccessLog(
+        user_id=user.pk,
+        report_reference=report_reference,
+        action=action,
+        object_id=str(object_id),
+        is_confidential=is_confidential,
+        ip_address=ip_address,
+        accessed_at=timezone.now(),
+    )
+
+
+def record(request, report_reference, action, object_id='', is_confidential=False, user=None):
+    """Record one access by user, which defaults to request.user"""
+    _buffer.add([entry(user or request.user, report_reference, action, object_id,
+                       is_confidential, client_ip(request))])
+
+
+def record_objects(request, objects, action, report_reference=attrgetter('report_id'), user=None):
+    """Record access to each object; report_reference maps an object to its report"""
+    user, ip_address = user or request.user, client_ip(request)
+    _buffer.add([
+        entry(user, report_reference(obj), action, obj.pk,
+              getattr(obj, 'is_confidential', False), ip_address)
+        for obj in objects
+    ])
+
+
+def flush():
+    return _buffer.flush()
+
+
+class AuditAccessMixin:
+    """
+    ViewSet mixin recording every object served by the audited actions.
+    The columns the entry needs are listed in sparse_always_fields so they
+    stay loaded when ?fields= narrows the query.
+    """
+    audit_action = None
+    audit_actions = ('list', 'retrieve')
+    sparse_always_fields = ('report', 'is_confidential')
+
+    def audit_report_reference(self, obj):
+        return obj.report_id
+
+    def get_serializer(self, *args, **kwargs):
+        # DRF's list/retrieve pass the objects positionally; the browsable
+        # API's forms pass instance= and are not reads worth recording.
+        if args and getattr(self, 'action', None) in self.audit_actions:
+            objects = args[0] if kwargs.get('many') else [args[0]]
+            record_objects(self.request, objects, self.audit_action, self.audit_report_reference)
+        return super().get_serializer(*args, **kwargs)
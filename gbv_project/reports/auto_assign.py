@@ -0,0 +1,162 @@
+"""
+Workload-balanced auto-assignment of pending reports.
+
+Professionals are kept in one min-heap per role, keyed by their caseload:
+active case assignments plus a weighted count of upcoming appointments.
+Pending reports are taken most urgent first (immediate danger, then medical
+attention, then oldest). Each report goes to the least-loaded professional
+of the role its incident type maps to, and that professional's load is
+pushed back up.
+"""
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from accounts import directory
+from accounts.models import User
+from .models import GBVReport, CaseAssignment, Appointment
+from .send_mails import GBVEmailService
+from . import bulk
+
+INCIDENT_ROLE_RULES = getattr(settings, 'AUTO_ASSIGNMENT_RULES', {
+    'physical': 'lawyer',
+    'sexual': 'doctor',
+    'emotional': 'counselor',
+    'online': 'lawyer',
+    'other': 'counselor',
+})
+MEDICAL_ROLE = 'doctor'
+UPCOMING_APPOINTMENT_DAYS = 14
+APPOINTMENT_WEIGHT = 0.5
+
+
+def role_for_report(report):
+    if report.needs_medical_attention:
+        return MEDICAL_ROLE
+    return INCIDENT_ROLE_RULES.get(report.incident_type, 'counselor')
+
+
+def get_caseloads():
+    """Return {professional_id: {'assignments': n, 'appointments': n, 'load': x}}"""
+    _, rows = directory.get_snapshot()
+    loads = {
+        row['id']: {**row, 'assignments': 0, 'appointments': 0, 'load': 0.0}
+        for row in rows
+    }
+    assignment_counts = CaseAssignment.objects.filter(
+        professional_id__in=loads
+    ).values('professional').annotate(n=Count('id'))
+    for row in assignment_counts:
+        loads[row['professional']]['assignments'] = row['n']
+
+    now = timezone.now()
+    appointment_counts = Appointment.objects.filter(
+        professional_id__in=loads,
+        status__in=['scheduled', 'confirmed'],
+        scheduled_date__gte=now,
+        scheduled_date__lt=now + timedelta(days=UPCOMING_APPOINTMENT_DAYS),
+    ).values('professional').annotate(n=Count('id'))
+    for row in appointment_counts:
+        loads[row['professional']]['appointments'] = row['n']
+
+    for entry in loads.values():
+        entry['load'] = entry['assignments'] + APPOINTMENT_WEIGHT * entry['appointments']
+    return loads
+
+
+class WorkloadQueue:
+    """Per-role min-heaps of (load, professional_id)"""
+
+    def __init__(self, caseloads):
+        self.heaps = {}
+        for professional_id, entry in caseloads.items():
+            self.heaps.setdefault(entry['role'], []).append((entry['load'], professional_id))
+        for heap in self.heaps.values():
+            heapq.heapify(heap)
+
+    def take(self, role):
+        """Return the least-loaded professional for a role and count one more case"""
+        heap = self.heaps.get(role)
+        if not heap:
+            return None
+        load, professional_id = heap[0]
+        heapq.heapreplace(heap, (load + 1, professional_id))
+        return professional_id
+
+
+def pending_reports():
+    return GBVReport.objects.filter(status='pending').order_by(
+        '-immediate_danger', '-needs_medical_attention', 'date_reported'
+    )
+
+
+def assign_batch(queue, batch_size=100, assigned_by=None, dry_run=False, skip=()):
+    """
+    Assign up to batch_size pending reports in one transaction, through the
+    same path as bulk.assign. Returns (planned, unplaced): (report,
+    professional_id) pairs and the reports no professional could take, or
+    already had their planned professional.
+    """
+    with transaction.atomic():
+        reports = list(
+            pending_reports().exclude(pk__in=skip).select_related('reporter').select_for_update()[:batch_size]
+        )
+        planned, unplaced = [], []
+        for report in reports:
+            professional_id = queue.take(role_for_report(report))
+            if professional_id is None:
+                unplaced.append(report)
+            else:
+                planned.append((report, professional_id))
+        if dry_run or not planned:
+            return planned, unplaced
+
+        _, assignments = bulk.apply_assignments(
+            {report.pk: report for report, _ in planned},
+            User.objects.in_bulk({professional_id for _, professional_id in planned}),
+            [(report.pk, professional_id) for report, professional_id in planned],
+            assigned_by, notes='Auto-assigned',
+        )
+    assigned = {(assignment.report_id, assignment.professional_id) for assignment in assignments}
+    # A report its professional was already on stays pending; skip it from now on
+    unplaced += [report for report, professional_id in planned if (report.pk, professional_id) not in assigned]
+    planned = [(report, professional_id) for report, professional_id in planned
+               if (report.pk, professional_id) in assigned]
+    return planned, unplaced
+
+
+def _notify(planned, assigned_by):
+    professionals = User.objects.in_bulk({professional_id for _, professional_id in planned})
+    with GBVEmailService.batched():
+        for report, professional_id in planned:
+            GBVEmailService.send_report_assigned_notification(
+                report=report, professional=professionals[professional_id], assigned_by=assigned_by
+            )
+
+
+def auto_assign(batch_size=100, max_batches=None, assigned_by=None, dry_run=False):
+    """
+    Assign pending reports batch by batch until none are left.
+    Notifications for each batch are sent together after it commits.
+    Returns (assigned pairs, reports left unplaced).
+    """
+    queue = WorkloadQueue(get_caseloads())
+    assigned, skipped, batches = [], [], 0
+    while max_batches is None or batches < max_batches:
+        planned, unplaced = assign_batch(
+            queue, batch_size, assigned_by=assigned_by, dry_run=dry_run,
+            skip=[report.pk for report in skipped],
+        )
+        batches += 1
+        assigned.extend(planned)
+        skipped.extend(unplaced)
+        if planned and not dry_run:
+            _notify(planned, assigned_by)
+        # A dry run leaves the reports pending, so one pass is all it can plan
+        if dry_run or len(planned) + len(unplaced) < batch_size:
+            break
+    return assigned, skipped
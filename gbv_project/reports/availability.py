@@ -0,0 +1,169 @@
+"""
+Appointment availability for professionals.
+
+Busy time comes from scheduled/confirmed appointments only. Lookups are
+range scans on the (professional, scheduled_date) index, bounded by
+the search window and APPOINTMENT_MAX_DURATION_MINUTES, so the size of the
+appointment history does not matter. Per professional, the busy intervals
+are merged into a sorted list and searched with bisect.
+"""
+import heapq
+from bisect import bisect_right
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from accounts import directory
+from .models import Appointment
+
+ACTIVE_STATUSES = ['scheduled', 'confirmed']
+
+MAX_DURATION_MINUTES = getattr(settings, 'APPOINTMENT_MAX_DURATION_MINUTES', 24 * 60)
+WORKING_HOURS = getattr(settings, 'APPOINTMENT_WORKING_HOURS', (8, 17))
+WORKING_DAYS = getattr(settings, 'APPOINTMENT_WORKING_DAYS', (0, 1, 2, 3, 4))
+SLOT_STEP_MINUTES = getattr(settings, 'APPOINTMENT_SLOT_STEP_MINUTES', 15)
+
+
+class IntervalIndex:
+    """Sorted, merged busy intervals for one professional"""
+
+    def __init__(self, intervals=()):
+        merged = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                if end > merged[-1][1]:
+                    merged[-1][1] = end
+            else:
+                merged.append([start, end])
+        self.starts = [start for start, _ in merged]
+        self.intervals = merged
+
+    def first_overlap(self, start, end):
+        """Return the busy interval overlapping [start, end), if any"""
+        i = bisect_right(self.starts, start) - 1
+        if i >= 0 and self.intervals[i][1] > start:
+            return self.intervals[i]
+        if i + 1 < len(self.intervals) and self.intervals[i + 1][0] < end:
+            return self.intervals[i + 1]
+        return None
+
+
+def _busy_intervals(professional_ids, window_start, window_end, exclude_id=None):
+    appointments = Appointment.objects.filter(
+        professional_id__in=professional_ids,
+        status__in=ACTIVE_STATUSES,
+        scheduled_date__gte=window_start - timedelta(minutes=MAX_DURATION_MINUTES),
+        scheduled_date__lt=window_end,
+        report__is_deleted=False,
+    )
+    if exclude_id is not None:
+        appointments = appointments.exclude(pk=exclude_id)
+
+    busy = {pk: [] for pk in professional_ids}
+    for professional_id, start, minutes in appointments.values_list(
+        'professional_id', 'scheduled_date', 'duration_minutes'
+    ):
+        end = start + timedelta(minutes=minutes)
+        if end > window_start:
+            busy[professional_id].append((start, end))
+    return {pk: IntervalIndex(intervals) for pk, intervals in busy.items()}
+
+
+def lock_bookings(professional_id):
+    """
+    Serialise bookings for a professional until the transaction ends, so a
+    conflict check and the write after it cannot interleave with another's.
+    SQLite has no row locks; a no-op update takes its database write lock
+    up front, making a concurrent booking wait and then see this one.
+    """
+    professionals = get_user_model().objects.filter(pk=professional_id)
+    if connection.features.has_select_for_update:
+        list(professionals.select_for_update().values_list('pk', flat=True))
+    else:
+        professionals.update(is_active=F('is_active'))
+
+
+def find_conflict(professional_id, start, duration_minutes, exclude_id=None):
+    """Return the busy (start, end) clashing with a proposed appointment, or None"""
+    end = start + timedelta(minutes=duration_minutes)
+    index = _busy_intervals([professional_id], start, end, exclude_id)[professional_id]
+    overlap = index.first_overlap(start, end)
+    return tuple(overlap) if overlap else None
+
+
+def _align(moment, step):
+    """Round moment up to the next multiple of step minutes past the hour"""
+    moment = moment.replace(second=0, microsecond=0) + (
+        timedelta(minutes=1) if moment.second or moment.microsecond else timedelta()
+    )
+    remainder = moment.minute % step
+    return moment + timedelta(minutes=(step - remainder) % step)
+
+
+def _working_periods(window_start, window_end):
+    tz = timezone.get_current_timezone()
+    day = timezone.localtime(window_start, tz).date()
+    last_day = timezone.localtime(window_end, tz).date()
+    open_hour, close_hour = WORKING_HOURS
+    while day <= last_day:
+        if day.weekday() in WORKING_DAYS:
+            opens = timezone.make_aware(datetime.combine(day, time(open_hour)), tz)
+            closes = timezone.make_aware(datetime.combine(day, time(close_hour)), tz)
+            start, end = max(opens, window_start), min(closes, window_end)
+            if start < end:
+                yield start, end
+        day += timedelta(days=1)
+
+
+def _free_slots(index, window_start, window_end, duration):
+    """Yield non-overlapping free (start, end) slots in time order"""
+    for period_start, period_end in _working_periods(window_start, window_end):
+        cursor = _align(period_start, SLOT_STEP_MINUTES)
+        while cursor + duration <= period_end:
+            overlap = index.first_overlap(cursor, cursor + duration)
+            if overlap:
+                cursor = _align(overlap[1], SLOT_STEP_MINUTES)
+                continue
+            yield cursor, cursor + duration
+            cursor += duration
+
+
+def _tagged_slots(professional_id, index, window_start, window_end, duration):
+    for start, end in _free_slots(index, window_start, window_end, duration):
+        yield timezone.localtime(start), professional_id, timezone.localtime(end)
+
+
+def earliest_free_slots(roles, duration_minutes, window_start, window_end, limit=10):
+    """
+    Earliest free slots of duration_minutes across all professionals with
+    one of the given roles, ordered by start time.
+    """
+    _, rows = directory.get_snapshot()
+    professionals = {row['id']: row for row in rows if row['role'] in roles}
+    if not professionals:
+        return []
+
+    duration = timedelta(minutes=duration_minutes)
+    indexes = _busy_intervals(list(professionals), window_start, window_end)
+    streams = [
+        _tagged_slots(professional_id, index, window_start, window_end, duration)
+        for professional_id, index in indexes.items()
+    ]
+
+    slots = []
+    for start, professional_id, end in heapq.merge(*streams):
+        row = professionals[professional_id]
+        slots.append({
+            'professional': professional_id,
+            'professional_name': f"{row['first_name']} {row['last_name']}".strip(),
+            'professional_role': row['role'],
+            'start': start,
+            'end': end,
+        })
+        if len(slots) >= limit:
+            break
+    return slots
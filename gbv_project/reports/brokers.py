@@ -0,0 +1,93 @@
+"""
+Event brokers behind the server-sent events stream.
+
+The broker is chosen with the GBV_EVENT_BROKER setting. InProcessBroker
+fans events out to subscribers in the same process, which is enough for a
+single ASGI node. A multi-node deployment needs a broker backed by shared
+infrastructure (e.g. Redis pub/sub) implementing the same two methods.
+"""
+import asyncio
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BaseBroker:
+    # Lets publishers skip building events nobody would receive
+    has_subscribers = True
+
+    def publish(self, event):
+        """Deliver an event dict to subscribers; safe to call from any thread"""
+        raise NotImplementedError
+
+    def subscribe(self):
+        """Return a Subscription bound to the running event loop"""
+        raise NotImplementedError
+
+
+class Subscription:
+    def __init__(self, broker, maxsize):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, event):
+        # Runs on the subscriber's loop. A slow client loses events rather
+        # than letting its queue grow without bound.
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker(BaseBroker):
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    @property
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def subscribe(self):
+        subscription = Subscription(self, self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # Loop already closed; the stream is gone
+                self.unsubscribe(subscription)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'GBV_EVENT_BROKER', 'reports.brokers.InProcessBroker')
+                _broker = import_string(path)()
+    return _broker
@@ -0,0 +1,222 @@
+"""
+Bulk case operations.
+
+Each operation loads everything it touches with one in_bulk query,
+writes with set-based statements in a single transaction, keeps the
+triage queue, rollups, sync feed and webhooks in step (bulk writes skip
+the save signals), and sends its notifications as one email batch after commit. The
+result for every requested item is reported back.
+"""
+import copy
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.directory import PROFESSIONAL_ROLES
+from accounts.models import User
+from . import events, rollups, sync, triage, webhooks
+from .models import CaseAssignment, GBVReport, ReportStatusChange
+from .send_mails import GBVEmailService
+
+MAX_ITEMS = getattr(settings, 'BULK_MAX_ITEMS', 500)
+STATUS_TRANSITIONS = getattr(settings, 'REPORT_STATUS_TRANSITIONS', {
+    'pending': ('under_review', 'resolved'),
+    'under_review': ('pending', 'resolved'),
+    'resolved': ('under_review',),
+})
+
+
+def _unique(values):
+    return list(dict.fromkeys(values))
+
+
+def _after_save(changes):
+    """Bring the triage queue, rollups, sync feed, event stream and webhooks up to date"""
+    reports = [report for _, report in changes]
+    queued = [report for report in reports if triage.in_queue(report)]
+    triage.remove(report.pk for report in reports if not triage.in_queue(report))
+    for report in queued:
+        triage.sync_report(report)
+    rollups.apply_changes(changes)
+    sync.record_changes((report, 'updated') for report in reports)
+    webhooks.publish('report.status_changed', [
+        webhooks.status_changed_data(report, before.status)
+        for before, report in changes if before.status != report.status
+    ])
+    for report in reports:
+        events.publish_model_event(report, False)
+
+
+def _update_status(reports, old_status, **values):
+    """
+    Update the reports still in old_status; returns the pks updated. One
+    statement, or one per report if another writer changed some of them
+    since they were read.
+    """
+    pks = [report.pk for report in reports]
+    with transaction.atomic():
+        if GBVReport.objects.filter(pk__in=pks, status=old_status).update(**values) == len(pks):
+            return set(pks)
+        transaction.set_rollback(True)
+    return {pk for pk in pks if GBVReport.objects.filter(pk=pk, status=old_status).update(**values)}
+
+
+def change_status(queryset, refs, new_status, changed_by, notes=''):
+    """
+    Move the reports in refs that queryset can see to new_status.
+    Returns {reference_code: result}, where result is one of 'updated',
+    'unchanged', 'invalid_transition', 'not_found' or 'conflict' (its
+    status was changed by someone else meanwhile).
+    """
+    refs = _unique(refs)
+    results, changes = {}, []
+    with transaction.atomic():
+        reports = queryset.select_for_update().select_related('reporter').in_bulk(refs)
+        by_old_status = defaultdict(list)
+        for ref in refs:
+            report = reports.get(ref)
+            if report is None:
+                results[ref] = 'not_found'
+            elif report.status == new_status:
+                results[ref] = 'unchanged'
+            elif new_status not in STATUS_TRANSITIONS.get(report.status, ()):
+                results[ref] = 'invalid_transition'
+            else:
+                by_old_status[report.status].append(report)
+
+        resolved_at = timezone.now() if new_status == 'resolved' else None
+        for old_status, group in by_old_status.items():
+            updated = _update_status(group, old_status, status=new_status, resolved_at=resolved_at)
+            for report in group:
+                if report.pk not in updated:
+                    results[report.pk] = 'conflict'
+                    continue
+                before = copy.copy(report)
+                report.status, report.resolved_at = new_status, resolved_at
+                changes.append((before, report))
+                results[report.pk] = 'updated'
+
+        ReportStatusChange.objects.bulk_create([
+            ReportStatusChange(report=report, old_status=before.status, new_status=new_status,
+                               changed_by=changed_by, notes=notes)
+            for before, report in changes
+        ])
+        _after_save(changes)
+
+    with GBVEmailService.batched():
+        for before, report in changes:
+            GBVEmailService.send_status_update_notification(
+                report=report, old_status=before.status, updated_by=changed_by, notes=notes or None
+            )
+    return results
+
+
+def apply_assignments(reports, professionals, pairs, assigned_by, notes=''):
+    """
+    Assign within the caller's transaction, given the reports (locked, by
+    reference code) and professionals (by id) the pairs refer to. Returns
+    (results as for assign, the assignments made or reactivated).
+    """
+    results, created, reactivated, changes = {}, [], [], []
+    existing = {
+        (assignment.report_id, assignment.professional_id): assignment
+        for assignment in CaseAssignment.all_objects.filter(
+            report_id__in=list(reports), professional_id__in=list(professionals)
+        )
+    }
+
+    assigned_reports = {}
+    for ref, professional_id in pairs:
+        report, professional = reports.get(ref), professionals.get(professional_id)
+        if report is None:
+            results[ref, professional_id] = 'report_not_found'
+            continue
+        if professional is None:
+            results[ref, professional_id] = 'professional_not_found'
+            continue
+        assignment = existing.get((ref, professional_id))
+        if assignment is not None and assignment.is_active:
+            results[ref, professional_id] = 'already_assigned'
+            continue
+        if assignment is not None:
+            assignment.is_active, assignment.assigned_by = True, assigned_by
+            assignment.deactivated_at = None
+            reactivated.append(assignment)
+            results[ref, professional_id] = 'reactivated'
+        else:
+            assignment = CaseAssignment(report=report, professional=professional,
+                                        assigned_by=assigned_by, notes=notes)
+            created.append(assignment)
+            results[ref, professional_id] = 'assigned'
+        # The last professional assigned in the request becomes the lead
+        assigned_reports[ref] = professional
+
+    CaseAssignment.all_objects.bulk_create(created)
+    CaseAssignment.all_objects.bulk_update(reactivated, ['is_active', 'assigned_by', 'deactivated_at'])
+
+    history = []
+    for ref, professional in assigned_reports.items():
+        report = reports[ref]
+        before = copy.copy(report)
+        report.status, report.assigned_to = 'under_review', professional
+        report.stamp_resolution()
+        changes.append((before, report))
+        if before.status != report.status:
+            history.append(ReportStatusChange(report=report, old_status=before.status,
+                                              new_status=report.status, changed_by=assigned_by))
+    GBVReport.objects.bulk_update([report for _, report in changes],
+                                  ['status', 'assigned_to', 'resolved_at'])
+    ReportStatusChange.objects.bulk_create(history)
+    _after_save(changes)
+    sync.record_changes([(assignment, 'created') for assignment in created]
+                        + [(assignment, 'updated') for assignment in reactivated])
+    webhooks.publish('report.assigned', [
+        webhooks.assigned_data(assignment) for assignment in created + reactivated
+    ])
+    for assignment in created:
+        events.publish_model_event(assignment, True)
+    for assignment in reactivated:
+        events.publish_model_event(assignment, False)
+    return results, created + reactivated
+
+
+def _assign(pairs, assigned_by, notes):
+    pairs = _unique(pairs)
+    with transaction.atomic():
+        reports = GBVReport.objects.select_for_update().select_related('reporter').in_bulk(
+            {ref for ref, _ in pairs}
+        )
+        professionals = User.objects.filter(role__in=PROFESSIONAL_ROLES).in_bulk(
+            {professional_id for _, professional_id in pairs}
+        )
+        results, assignments = apply_assignments(reports, professionals, pairs, assigned_by, notes)
+
+    with GBVEmailService.batched():
+        for assignment in assignments:
+            GBVEmailService.send_report_assigned_notification(
+                report=reports[assignment.report_id],
+                professional=professionals[assignment.professional_id],
+                assigned_by=assigned_by,
+            )
+    return results, assignments
+
+
+def assign(pairs, assigned_by, notes=''):
+    """
+    Assign professionals to reports from (reference_code, professional_id)
+    pairs. Returns a result per pair: 'assigned', 'reactivated',
+    'already_assigned', 'report_not_found' or 'professional_not_found'.
+    """
+    results, _ = _assign(pairs, assigned_by, notes)
+    return results
+
+
+def assign_one(ref, professional_id, assigned_by, notes=''):
+    """
+    assign for a single report and professional. Returns (result, the
+    assignment made or reactivated, or None).
+    """
+    results, assignments = _assign([(ref, professional_id)], assigned_by, notes)
+    return results[ref, professional_id], next(iter(assignments), None)
@@ -0,0 +1,158 @@
+"""
+Case events pushed to clients over server-sent events.
+
+Each event records who may see it when it is published: the reporter and
+the professionals assigned to, or holding an appointment on, the report.
+This mirrors BaseGBVViewSet.get_user_assigned_reports. Confidential notes
+are never shown to survivors. The stream then filters with set lookups
+only.
+
+EventSource cannot send an Authorization header, so browsers first POST
+for a short-lived signed ticket and open the stream with ?ticket=.
+"""
+import asyncio
+import itertools
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import authentication, exceptions
+
+from .brokers import get_broker
+from .models import GBVReport, CaseNote, Appointment, CaseAssignment
+
+PROFESSIONAL_ROLES = ('doctor', 'lawyer', 'counselor')
+
+SSE_HEARTBEAT_SECONDS = getattr(settings, 'SSE_HEARTBEAT_SECONDS', 15)
+STREAM_TICKET_SECONDS = getattr(settings, 'STREAM_TICKET_SECONDS', 30)
+STREAM_TICKET_SALT = 'reports.events.stream-ticket'
+
+_ids = itertools.count(1)
+
+
+def _audience(report_id):
+    professionals = set(
+        CaseAssignment.objects.filter(report_id=report_id).values_list('professional_id', flat=True)
+    )
+    professionals.update(
+        Appointment.objects.filter(report_id=report_id).values_list('professional_id', flat=True)
+    )
+    return professionals
+
+
+def _payload(instance):
+    if isinstance(instance, GBVReport):
+        return 'report', instance.pk, {
+            'reference_code': instance.pk,
+            'status': instance.status,
+            'is_deleted': instance.is_deleted,
+        }
+    if isinstance(instance, CaseNote):
+        return 'note', instance.report_id, {
+            'id': instance.pk,
+            'note_type': instance.note_type,
+            'created_by': instance.created_by_id,
+        }
+    if isinstance(instance, Appointment):
+        return 'appointment', instance.report_id, {
+            'id': instance.pk,
+            'status': instance.status,
+            'scheduled_date': instance.scheduled_date.isoformat() if instance.scheduled_date else None,
+            'professional': instance.professional_id,
+        }
+    if isinstance(instance, CaseAssignment):
+        return 'assignment', instance.report_id, {
+            'id': instance.pk,
+            'professional': instance.professional_id,
+            'is_active': instance.is_active,
+        }
+    return None
+
+
+def build_event(instance, created):
+    described = _payload(instance)
+    if described is None:
+        return None
+    kind, report_id, data = described
+    reporter_id = (
+        instance.reporter_id if isinstance(instance, GBVReport)
+        else GBVReport.all_objects.filter(pk=report_id).values_list('reporter_id', flat=True).first()
+    )
+    return {
+        'id': next(_ids),
+        'type': f"{kind}.{'created' if created else 'updated'}",
+        'report': report_id,
+        'data': data,
+        'timestamp': timezone.now().isoformat(),
+        # Visibility, stripped before sending
+        'reporter_id': reporter_id,
+        'professional_ids': _audience(report_id),
+        'confidential': bool(getattr(instance, 'is_confidential', False)) and kind == 'note',
+    }
+
+
+def publish_model_event(instance, created):
+    """Publish an event for a saved model once the transaction commits"""
+    broker = get_broker()
+    if not broker.has_subscribers:
+        return
+    event = build_event(instance, created)
+    if event is not None:
+        transaction.on_commit(lambda: broker.publish(event))
+
+
+def visible_to(event, user):
+    if user.role == 'admin':
+        return True
+    if user.role in PROFESSIONAL_ROLES:
+        return user.pk in event['professional_ids']
+    return event['reporter_id'] == user.pk and not event['confidential']
+
+
+def public_fields(event):
+    return {key: event[key] for key in ('id', 'type', 'report', 'data', 'timestamp')}
+
+
+def issue_ticket(user):
+    return signing.dumps(user.pk, salt=STREAM_TICKET_SALT)
+
+
+class StreamTicketAuthentication(authentication.BaseAuthentication):
+    """Authenticates ?ticket= from issue_ticket, valid for STREAM_TICKET_SECONDS"""
+
+    def authenticate(self, request):
+        ticket = request.query_params.get('ticket')
+        if not ticket:
+            return None
+        try:
+            user_id = signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=STREAM_TICKET_SECONDS)
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed('Invalid or expired stream ticket')
+        user = get_user_model().objects.filter(pk=user_id, is_active=True).first()
+        if user is None:
+            raise exceptions.AuthenticationFailed('Invalid or expired stream ticket')
+        return user, None
+
+
+async def stream(user):
+    """Server-sent event lines for the events visible to user"""
+    # Subscriptions bind to the running loop, so subscribe once iterating
+    subscription = get_broker().subscribe()
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                event = await subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            if not visible_to(event, user):
+                continue
+            payload = json.dumps(public_fields(event))
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+    finally:
+        subscription.close()
@@ -0,0 +1,159 @@
+"""
+Report density heatmap.
+
+Reports are placed at the coordinates of their gazetteer location and
+counted into web-mercator grid cells (the slippy-map tile scheme) at each
+zoom level in CELL_ZOOMS, per incident type. Counts move incrementally
+as reports are saved, the same way as the analytics rollups, and when a
+location is given new coordinates.
+
+A map tile z/x/y is served as the TILE_BITS-finer cells it contains,
+read from the nearest stored level. Roles other than admin get a coarser
+maximum level and never see a cell's count for an incident type with fewer
+than MIN_CELL_COUNT reports; it is shown as 0.
+"""
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from . import locations
+from .models import GBVReport, HeatmapCell
+from .rollups import add_counts
+
+CELL_ZOOMS = tuple(getattr(settings, 'HEATMAP_CELL_ZOOMS', (4, 7, 10, 13, 16)))
+# A tile is a 2**TILE_BITS x 2**TILE_BITS grid of cells
+TILE_BITS = 4
+MAX_CELL_ZOOM_BY_ROLE = getattr(settings, 'HEATMAP_MAX_CELL_ZOOM_BY_ROLE', {
+    'admin': max(CELL_ZOOMS),
+    'doctor': 10,
+    'lawyer': 10,
+    'counselor': 10,
+})
+MIN_CELL_COUNT = getattr(settings, 'HEATMAP_MIN_CELL_COUNT', 3)
+INCIDENT_TYPES = [choice for choice, _ in GBVReport.INCIDENT_TYPE_CHOICES]
+# Web mercator cannot represent the poles
+MAX_LATITUDE = 85.05112878
+
+
+def cell_for(latitude, longitude, zoom):
+    """Tile coordinates (x, y) of a point at a zoom level"""
+    n = 2 ** zoom
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def cells_for(coordinates):
+    if coordinates is None:
+        return []
+    return [(zoom, *cell_for(*coordinates, zoom)) for zoom in CELL_ZOOMS]
+
+
+def contribution(report):
+    """The (zoom, x, y, incident_type) cells a report is counted in"""
+    if report is None or report.is_deleted or not report.location_id:
+        return []
+    coordinates = locations.coordinates_for(report.location_id)
+    return [(*cell, report.incident_type) for cell in cells_for(coordinates)]
+
+
+def _apply(deltas):
+    deltas = {key: count for key, count in deltas.items() if count}
+    if not deltas:
+        return
+    with transaction.atomic():
+        for zoom, x, y, incident_type in sorted(deltas):
+            add_counts(HeatmapCell, {'zoom': zoom, 'x': x, 'y': y, 'incident_type': incident_type},
+                       report_count=deltas[zoom, x, y, incident_type])
+
+
+def apply_changes(changes):
+    """Apply (before, after) report pairs, as for reports.rollups.apply_changes"""
+    deltas = defaultdict(int)
+    for before, after in changes:
+        for key in contribution(before):
+            deltas[key] -= 1
+        for key in contribution(after):
+            deltas[key] += 1
+    _apply(deltas)
+
+
+def move_location(location_id, old_coordinates, new_coordinates):
+    """Move the counts of every report at a location to its new coordinates"""
+    if old_coordinates == new_coordinates:
+        return
+    counts = GBVReport.objects.filter(location_id=location_id).values('incident_type').annotate(n=Count('pk'))
+    deltas = defaultdict(int)
+    for row in counts:
+        for cell in cells_for(old_coordinates):
+            deltas[(*cell, row['incident_type'])] -= row['n']
+        for cell in cells_for(new_coordinates):
+            deltas[(*cell, row['incident_type'])] += row['n']
+    _apply(deltas)
+
+
+def rebuild():
+    """Recompute every cell from the reports; returns the number of cells written"""
+    placed = locations.get_index().coordinates
+    counts = GBVReport.objects.filter(
+        location__latitude__isnull=False, location__longitude__isnull=False
+    ).values('location_id', 'incident_type').annotate(n=Count('pk')).order_by()
+    totals = defaultdict(int)
+    for row in counts:
+        for cell in cells_for(placed.get(row['location_id'])):
+            totals[(*cell, row['incident_type'])] += row['n']
+    with transaction.atomic():
+        HeatmapCell.objects.all().delete()
+        HeatmapCell.objects.bulk_create([
+            HeatmapCell(zoom=zoom, x=x, y=y, incident_type=incident_type, report_count=count)
+            for (zoom, x, y, incident_type), count in totals.items()
+        ], batch_size=1000)
+    return len(totals)
+
+
+def level_for(tile_zoom, role):
+    """The stored cell zoom to answer a tile with, or None if the role has no access"""
+    max_zoom = MAX_CELL_ZOOM_BY_ROLE.get(role)
+    if max_zoom is None:
+        return None
+    wanted = min(tile_zoom + TILE_BITS, max_zoom)
+    levels = [zoom for zoom in CELL_ZOOMS if zoom <= wanted]
+    return max(levels) if levels else min(CELL_ZOOMS)
+
+
+def tile(tile_zoom, x, y, role, incident_types=None):
+    """
+    Cells covering tile z/x/y as {'zoom', 'types', 'cells'}, each cell a
+    compact [x, y, count per type...] row at the returned zoom.
+    """
+    zoom = level_for(tile_zoom, role)
+    if zoom is None:
+        return None
+    if zoom >= tile_zoom:
+        shift = zoom - tile_zoom
+        x_range = (x << shift, ((x + 1) << shift) - 1)
+        y_range = (y << shift, ((y + 1) << shift) - 1)
+    else:
+        x_range = (x >> (tile_zoom - zoom),) * 2
+        y_range = (y >> (tile_zoom - zoom),) * 2
+
+    types = [t for t in INCIDENT_TYPES if not incident_types or t in incident_types]
+    # Per type: a small count stays hidden however many other reports share the cell
+    minimum = 1 if role == 'admin' else MIN_CELL_COUNT
+    rows = HeatmapCell.objects.filter(
+        zoom=zoom, x__range=x_range, y__range=y_range,
+        incident_type__in=types, report_count__gte=minimum,
+    ).values_list('x', 'y', 'incident_type', 'report_count')
+
+    cells = {}
+    for cell_x, cell_y, incident_type, count in rows:
+        cells.setdefault((cell_x, cell_y), [0] * len(types))[types.index(incident_type)] = count
+    return {
+        'zoom': zoom,
+        'types': types,
+        'cells': [[cell_x, cell_y, *counts] for (cell_x, cell_y), counts in sorted(cells.items())],
+    }
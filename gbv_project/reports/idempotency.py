@@ -0,0 +1,165 @@
+"""
+Idempotency-Key support for POST requests to the reports API.
+
+The first request with a key claims it by inserting an IdempotencyRecord,
+runs normally, and stores its response. A retry with the same key and path
+from the same user gets the stored response back (marked with an
+Idempotent-Replayed header) without the view running again, so no report,
+appointment or email is created twice. A retry that arrives while the
+first request is still running gets 409; reusing a key for a different
+request body gets 422. Server errors are not stored, so those requests
+can be retried. Records expire after IDEMPOTENCY_KEY_TTL_HOURS.
+
+Keys are scoped to the user the request authenticates as, so a retry
+with a refreshed token still matches. Anonymous report submissions are
+scoped to the client IP instead.
+"""
+import hashlib
+import zlib
+from datetime import timedelta
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .audit import client_ip
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+TTL = timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+# A claim this old without a response belongs to a request that died
+PENDING_TIMEOUT = timedelta(seconds=getattr(settings, 'IDEMPOTENCY_PENDING_SECONDS', 120))
+MAX_KEY_LENGTH = 255
+
+
+def _digest(*parts):
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(part if isinstance(part, bytes) else str(part).encode())
+        sha.update(b'\0')
+    return sha.hexdigest()
+
+
+def _request_hash(request):
+    content_type = request.META.get('CONTENT_TYPE', '')
+    if content_type.startswith('multipart/'):
+        # Reading an upload into memory just to hash it is not worth it
+        return _digest(content_type.split(';')[0], request.META.get('CONTENT_LENGTH', ''))
+    return _digest(content_type, request.body)
+
+
+def _claim(key, scope, request_hash):
+    """Insert a pending record for key; returns (record, created)"""
+    now = timezone.now()
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyRecord.objects.create(
+                    key=key, scope=scope, request_hash=request_hash, expires_at=now + TTL,
+                ), True
+        except IntegrityError:
+            record = IdempotencyRecord.objects.filter(key=key, scope=scope).first()
+            if record is None:
+                continue
+            abandoned = record.status_code is None and record.created_at < now - PENDING_TIMEOUT
+            if record.expires_at > now and not abandoned:
+                return record, False
+            IdempotencyRecord.objects.filter(pk=record.pk).delete()
+    return None, False
+
+
+def _replay(record):
+    response = HttpResponse(
+        zlib.decompress(bytes(record.body)) if record.body else b'',
+        status=record.status_code,
+        content_type=record.content_type or None,
+    )
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _authenticated_user_id(request):
+    """The user the view will authenticate the request as, if any"""
+    drf_request = Request(request)
+    for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        user_auth = authenticator().authenticate(drf_request)
+        if user_auth is not None:
+            return user_auth[0].pk
+    return None
+
+
+def _scope(request, user_id):
+    if user_id is not None:
+        return _digest('user', user_id, request.path)
+    # Anonymous clients share no credentials; don't let one replay another's response
+    return _digest('', client_ip(request), request.path)
+
+
+def _store(record, response):
+    if response.status_code >= 500 or response.streaming:
+        # Let the client try again
+        IdempotencyRecord.objects.filter(pk=record.pk).delete()
+        return
+    record.status_code = response.status_code
+    record.content_type = response.get('Content-Type', '')
+    record.body = zlib.compress(response.content)
+    record.save(update_fields=['status_code', 'content_type', 'body'])
+
+
+class IdempotencyMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request._idempotency_record = None
+        response = self.get_response(request)
+        if request._idempotency_record is not None:
+            _store(request._idempotency_record, response)
+        return response
+
+    async def __acall__(self, request):
+        request._idempotency_record = None
+        response = await self.get_response(request)
+        if request._idempotency_record is not None:
+            await sync_to_async(_store)(request._idempotency_record, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        key = request.headers.get(HEADER)
+        if request.method != 'POST' or not key or not view_func.__module__.startswith('reports.'):
+            return None
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}, status=400)
+
+        try:
+            user_id = _authenticated_user_id(request)
+        except exceptions.AuthenticationFailed:
+            # The view will answer 401; nothing to make idempotent
+            return None
+        request_hash = _request_hash(request)
+        scope = _scope(request, user_id)
+        record, created = _claim(key, scope, request_hash)
+        if record is None:
+            return JsonResponse({'error': 'Could not reserve the idempotency key, please retry'}, status=409)
+        if created:
+            request._idempotency_record = record
+            return None
+        if record.request_hash != request_hash:
+            return JsonResponse({'error': f'{HEADER} was already used for a different request'}, status=422)
+        if record.status_code is None:
+            response = JsonResponse({'error': 'A request with this key is still being processed'}, status=409)
+            response['Retry-After'] = '1'
+            return response
+        return _replay(record)
@@ -0,0 +1,225 @@
+"""
+Data retention.
+
+Each policy removes or anonymises one kind of expired record in batches of
+batch_size, one short transaction per batch, so SQLite is never locked for
+long. Policies are generators yielding the number of records handled by
+each batch; with dry_run they yield the number that would be handled.
+Files are deleted only once the transaction that dropped their rows has
+committed.
+
+Retention periods are days, set per policy in DATA_RETENTION_DAYS; None
+turns a policy off.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from . import sync
+from .archiving import archive_deleted_reports
+from .models import (
+    AccessLog, ArchivedCaseNote, ArchivedDocument, ArchivedGBVReport, CaseAssignment, CaseNote,
+    ChangeLog, Document, GBVReport, IdempotencyRecord, WebhookDelivery,
+)
+
+RETENTION_DAYS = {
+    'archived_reports': 365,
+    'inactive_assignments': 180,
+    'resolved_reports': None,
+    'access_logs': None,
+    # Clients with an older sync cursor have to fetch everything again
+    'change_log': 90,
+    # Grace period before an unreferenced upload counts as orphaned
+    'orphaned_files': 1,
+    # Delivered and abandoned deliveries
+    'webhook_deliveries': 30,
+    # Days kept past their own expiry
+    'idempotency_keys': 0,
+    **getattr(settings, 'DATA_RETENTION_DAYS', {}),
+}
+REDACTED = '[redacted]'
+DOCUMENTS_DIR = 'case_documents'
+
+
+def _cutoff(policy, now):
+    return now - timedelta(days=RETENTION_DAYS[policy])
+
+
+def _batches(queryset, batch_size, handle, dry_run):
+    """Run handle(pks) in a transaction per batch of queryset's primary keys"""
+    if dry_run:
+        yield queryset.count()
+        return
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return
+            handle(pks)
+        yield len(pks)
+
+
+def _delete_files_on_commit(names):
+    def delete():
+        for name in names:
+            default_storage.delete(name)
+    transaction.on_commit(delete)
+
+
+def _delete_unreferenced_files(names):
+    """Delete, after commit, the files no document or archived document still refers to"""
+    names = set(filter(None, names))
+    # A restored or archived copy of the document may still point at the file
+    names -= set(Document.objects.filter(file__in=names).values_list('file', flat=True))
+    names -= set(ArchivedDocument.objects.filter(file__in=names).values_list('file', flat=True))
+    _delete_files_on_commit(sorted(names))
+
+
+def archive_deleted(batch_size, now, dry_run=False):
+    """Move soft-deleted reports into the archive tables"""
+    if dry_run:
+        yield GBVReport.all_objects.filter(is_deleted=True).count()
+        return
+    yield from archive_deleted_reports(batch_size=batch_size)
+
+
+def purge_archived_reports(batch_size, now, dry_run=False):
+    """Delete archived reports, their case data and uploaded files"""
+    def handle(refs):
+        names = list(ArchivedDocument.objects.filter(report_id__in=refs).values_list('file', flat=True))
+        ArchivedGBVReport.objects.filter(pk__in=refs).delete()
+        _delete_unreferenced_files(names)
+
+    expired = ArchivedGBVReport.objects.filter(archived_at__lt=_cutoff('archived_reports', now))
+    yield from _batches(expired, batch_size, handle, dry_run)
+
+
+def purge_inactive_assignments(batch_size, now, dry_run=False):
+    """Delete case assignments that ended more than the retention period ago"""
+    def handle(pks):
+        CaseAssignment.all_objects.filter(pk__in=pks).delete()
+
+    expired = CaseAssignment.all_objects.filter(
+        is_active=False, deactivated_at__lt=_cutoff('inactive_assignments', now)
+    )
+    yield from _batches(expired, batch_size, handle, dry_run)
+
+
+def anonymise_resolved_reports(batch_size, now, dry_run=False):
+    """
+    Redact the narrative and place of long-resolved reports, live and
+    archived, and their case notes; delete their documents and files
+    """
+    def handle(refs):
+        documents = list(Document.objects.filter(report_id__in=refs))
+        # update() leaves the resolved location, type and dates alone, so the
+        # rollups, heatmap and triage queue are unaffected
+        GBVReport.objects.filter(pk__in=refs).update(description=REDACTED, incident_location=REDACTED)
+        CaseNote.objects.filter(report_id__in=refs).update(content=REDACTED)
+        # So clients replace the copies they synced, and drop the documents
+        sync.record_changes(
+            [(report, 'updated') for report in GBVReport.objects.filter(pk__in=refs)]
+            + [(note, 'updated') for note in CaseNote.objects.filter(report_id__in=refs)]
+            + [(document, 'deleted') for document in documents]
+        )
+        Document.objects.filter(pk__in=[document.pk for document in documents]).delete()
+        _delete_unreferenced_files(document.file.name for document in documents)
+
+    def handle_archived(refs):
+        names = list(ArchivedDocument.objects.filter(report_id__in=refs).values_list('file', flat=True))
+        ArchivedGBVReport.objects.filter(pk__in=refs).update(description=REDACTED, incident_location=REDACTED)
+        ArchivedCaseNote.objects.filter(report_id__in=refs).update(content=REDACTED)
+        ArchivedDocument.objects.filter(report_id__in=refs).delete()
+        _delete_unreferenced_files(names)
+
+    cutoff = _cutoff('resolved_reports', now)
+    expired = GBVReport.objects.filter(status='resolved', resolved_at__lt=cutoff).exclude(description=REDACTED)
+    yield from _batches(expired, batch_size, handle, dry_run)
+    archived = ArchivedGBVReport.objects.filter(status='resolved', resolved_at__lt=cutoff).exclude(description=REDACTED)
+    yield from _batches(archived, batch_size, handle_archived, dry_run)
+
+
+def purge_access_logs(batch_size, now, dry_run=False):
+    def handle(pks):
+        AccessLog.objects.filter(pk__in=pks).purge()
+
+    expired = AccessLog.objects.filter(accessed_at__lt=_cutoff('access_logs', now))
+    yield from _batches(expired, batch_size, handle, dry_run)
+
+
+def purge_change_log(batch_size, now, dry_run=False):
+    def handle(pks):
+        ChangeLog.objects.filter(pk__in=pks).delete()
+
+    expired = ChangeLog.objects.filter(changed_at__lt=_cutoff('change_log', now))
+    yield from _batches(expired, batch_size, handle, dry_run)
+
+
+def purge_idempotency_keys(batch_size, now, dry_run=False):
+    def handle(pks):
+        IdempotencyRecord.objects.filter(pk__in=pks).delete()
+
+    expired = IdempotencyRecord.objects.filter(expires_at__lt=_cutoff('idempotency_keys', now))
+    yield from _batches(expired, batch_size, handle, dry_run)
+
+
+def purge_webhook_deliveries(batch_size, now, dry_run=False):
+    def handle(pks):
+        WebhookDelivery.objects.filter(pk__in=pks).delete()
+
+    expired = WebhookDelivery.objects.filter(
+        status__in=('delivered', 'failed'), created_at__lt=_cutoff('webhook_deliveries', now)
+    )
+    yield from _batches(expired, batch_size, handle, dry_run)
+
+
+def _stored_files():
+    try:
+        _, files = default_storage.listdir(DOCUMENTS_DIR)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield f'{DOCUMENTS_DIR}/{name}'
+
+
+def purge_orphaned_files(batch_size, now, dry_run=False):
+    """Delete uploads no document or archived document refers to"""
+    cutoff = _cutoff('orphaned_files', now)
+    names = list(_stored_files())
+    for start in range(0, len(names), batch_size):
+        batch = names[start:start + batch_size]
+        referenced = set(Document.objects.filter(file__in=batch).values_list('file', flat=True))
+        referenced |= set(ArchivedDocument.objects.filter(file__in=batch).values_list('file', flat=True))
+        orphaned = [
+            name for name in batch
+            if name not in referenced and default_storage.get_modified_time(name) < cutoff
+        ]
+        if not dry_run:
+            for name in orphaned:
+                default_storage.delete(name)
+        yield len(orphaned)
+
+
+# In the order they run: archive before purging the archive
+POLICIES = {
+    'deleted_reports': archive_deleted,
+    'archived_reports': purge_archived_reports,
+    'inactive_assignments': purge_inactive_assignments,
+    'resolved_reports': anonymise_resolved_reports,
+    'access_logs': purge_access_logs,
+    'change_log': purge_change_log,
+    'webhook_deliveries': purge_webhook_deliveries,
+    'idempotency_keys': purge_idempotency_keys,
+    'orphaned_files': purge_orphaned_files,
+}
+
+
+def enabled_policies():
+    return [name for name in POLICIES if RETENTION_DAYS.get(name, 0) is not None]
+
+
+def run_policy(name, batch_size=500, now=None, dry_run=False):
+    return POLICIES[name](batch_size, now or timezone.now(), dry_run)
@@ -0,0 +1,180 @@
+"""
+Location gazetteer.
+
+Free-text incident locations are reduced to a key (case, accents,
+punctuation and spacing removed) and matched, exactly or closely, against
+the keys of Location names and their aliases. Matching never adds to the
+gazetteer: what survivors type must not become a public place name. A
+report whose location matches nothing is left without one and its
+spelling is recorded as an UnmatchedLocation for an admin to review, who
+can add it as a location or alias and run normalize_locations.
+
+Lookups and autocomplete are served from a per-process index that is
+rebuilt when the gazetteer version in the cache changes, the same way as
+the professionals directory; saving a Location or alias bumps the
+version. Autocomplete offers only reviewed locations; it bisects a sorted
+list of the keys and of every word-suffix of them, so "cbd" finds
+"Nairobi CBD".
+"""
+import difflib
+import re
+import unicodedata
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from gbv_project import metrics
+
+from .models import Location, LocationAlias, UnmatchedLocation
+
+VERSION_KEY = 'location_gazetteer:version'
+SNAPSHOT_KEY = 'location_gazetteer:v2:{version}'
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+MATCH_CUTOFF = getattr(settings, 'LOCATION_MATCH_CUTOFF', 0.88)
+
+_NON_WORD = re.compile(r'[\W_]+')
+_DIGITS = re.compile(r'\d+')
+
+_local_index = {'version': None, 'index': None}
+
+
+def normalize_key(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(_NON_WORD.sub(' ', text.casefold()).split())[:255]
+
+
+def display_name(text):
+    return ' '.join((text or '').split())[:255]
+
+
+class GazetteerIndex:
+    def __init__(self, locations, aliases):
+        self.names = {pk: name for pk, name, *_ in locations}
+        self.reviewed = {pk for pk, *_, is_reviewed in locations if is_reviewed}
+        self.coordinates = {
+            pk: (float(latitude), float(longitude))
+            for pk, _, _, latitude, longitude, _ in locations
+            if latitude is not None and longitude is not None
+        }
+        self.keys = {normalize_key(name): pk for pk, name, *_ in locations}
+        self.keys.update((key, pk) for pk, _, key, *_ in locations)
+        self.keys.update(aliases)
+        entries = set()
+        for key, pk in self.keys.items():
+            words = key.split(' ')
+            for i in range(len(words)):
+                entries.add((' '.join(words[i:]), pk))
+        self.prefixes = sorted(entries)
+
+    def lookup(self, key):
+        return self.keys.get(key)
+
+    def closest(self, key):
+        """Best close spelling; numbers must match exactly ("Phase 2" is not "Phase 3")"""
+        digits = _DIGITS.findall(key)
+        candidates = [candidate for candidate in self.keys if _DIGITS.findall(candidate) == digits]
+        matches = difflib.get_close_matches(key, candidates, n=1, cutoff=MATCH_CUTOFF)
+        return self.keys[matches[0]] if matches else None
+
+    def complete(self, prefix, limit=10):
+        """Reviewed location ids whose name or alias has a word starting with prefix"""
+        found = []
+        i = bisect_left(self.prefixes, (prefix,))
+        while i < len(self.prefixes) and len(found) < limit:
+            entry, pk = self.prefixes[i]
+            if not entry.startswith(prefix):
+                break
+            if pk in self.reviewed and pk not in found:
+                found.append(pk)
+            i += 1
+        return found
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate():
+    """Bump the gazetteer version so every process rebuilds its index"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
+
+
+def get_index():
+    version = get_version()
+    if _local_index['version'] == version:
+        metrics.inc('gbv_cache_lookups_total', cache='locations', result='local')
+        return _local_index['index']
+
+    key = SNAPSHOT_KEY.format(version=version)
+    snapshot = cache.get(key)
+    metrics.inc('gbv_cache_lookups_total', cache='locations', result='miss' if snapshot is None else 'shared')
+    if snapshot is None:
+        snapshot = {
+            'locations': list(Location.objects.values_list('pk', 'name', 'key', 'latitude', 'longitude', 'is_reviewed')),
+            'aliases': list(LocationAlias.objects.values_list('key', 'location_id')),
+        }
+        cache.set(key, snapshot, timeout=SNAPSHOT_TIMEOUT)
+
+    index = GazetteerIndex(snapshot['locations'], snapshot['aliases'])
+    _local_index.update(version=version, index=index)
+    return index
+
+
+def note_unmatched(key, text):
+    """Note a spelling that matched nothing, for review"""
+    if UnmatchedLocation.objects.filter(key=key).update(last_seen=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            UnmatchedLocation.objects.create(key=key, text=display_name(text))
+    except IntegrityError:
+        # Recorded concurrently by another request
+        pass
+
+
+def resolve(text, record_unmatched=False):
+    """The id of the gazetteer location text matches, or None; the gazetteer is never changed"""
+    key = normalize_key(text)
+    if not key:
+        return None
+    index = get_index()
+    location_id = index.lookup(key)
+    if location_id is None:
+        location_id = index.closest(key)
+    if location_id is None and record_unmatched:
+        note_unmatched(key, text)
+    return location_id
+
+
+def name_for(location_id):
+    return get_index().names.get(location_id)
+
+
+def coordinates_for(location_id):
+    """(latitude, longitude) of a location, or None if it has not been placed"""
+    return get_index().coordinates.get(location_id)
+
+
+def canonical_name(text):
+    """The gazetteer name text resolves to"""
+    return name_for(resolve(text))
+
+
+def autocomplete(prefix, limit=10):
+    """[{'id', 'name'}] of locations matching a typed prefix"""
+    key = normalize_key(prefix)
+    if not key:
+        return []
+    index = get_index()
+    return [{'id': pk, 'name': index.names[pk]} for pk in index.complete(key, limit)]
@@ -0,0 +1,71 @@
+import io
+import pstats
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gbv_project import profiling
+
+
+class Command(BaseCommand):
+    help = "Summarise the request profiles written by the profiling middleware"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', dest='directory', default=str(profiling.PROFILE_DIR), help='Profile directory')
+        parser.add_argument('--view', help='Only profiles whose view contains this')
+        parser.add_argument('--action', help='Only profiles of this action')
+        parser.add_argument('--since', type=float, help='Only profiles from the last N hours')
+        parser.add_argument('--list', dest='list_views', action='store_true',
+                            help='List the views and actions profiled instead of merging them')
+        parser.add_argument('--sort', choices=['cumulative', 'tottime', 'calls'], default='cumulative')
+        parser.add_argument('--top', type=int, default=30, help='How many functions to print')
+        parser.add_argument('--output', help='Also write the merged stats to this file, '
+                                             'for snakeviz, gprof2dot or pstats')
+
+    def handle(self, *args, directory, view, action, since, list_views, sort, top, output, **options):
+        files = profiling.collected(Path(directory))
+        if view:
+            files = [file for file in files if view in file.view]
+        if action:
+            files = [file for file in files if file.action == action]
+        if since:
+            cutoff = time.time() - since * 3600
+            files = [file for file in files if file.recorded_at >= cutoff]
+        if not files:
+            raise CommandError(f"No matching profiles in {directory}")
+
+        if list_views:
+            groups = defaultdict(list)
+            for file in files:
+                groups[file.view, file.action].append(file.duration_ms)
+            self.stdout.write(f"{'count':>6}  {'mean ms':>8}  {'max ms':>8}  view / action")
+            for (file_view, file_action), durations in sorted(groups.items(), key=lambda item: -len(item[1])):
+                self.stdout.write(f"{len(durations):6}  {sum(durations) / len(durations):8.0f}  "
+                                  f"{max(durations):8}  {file_view} / {file_action}")
+            return
+
+        buffer = io.StringIO()
+        stats = None
+        for file in files:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(str(file.path), stream=buffer)
+                else:
+                    stats.add(str(file.path))
+            except (FileNotFoundError, EOFError, ValueError):
+                # Rotated out of the ring, or not a pstats file
+                self.stderr.write(f"Skipping {file.path.name}")
+        if stats is None:
+            raise CommandError("None of the profiles could be read")
+
+        durations = [file.duration_ms for file in files]
+        self.stdout.write(f"{len(files)} profiles, {sum(durations) / len(durations):.0f}ms mean request, "
+                          f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(files[0].recorded_at))} to "
+                          f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(files[-1].recorded_at))}")
+        if output:
+            stats.dump_stats(output)
+            self.stdout.write(f"Merged stats written to {output}")
+        stats.strip_dirs().sort_stats(sort).print_stats(top)
+        self.stdout.write(buffer.getvalue(), ending='')
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports import lifecycle
+
+
+class Command(BaseCommand):
+    help = "Archive, purge or anonymise records past their retention period (DATA_RETENTION_DAYS)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('policies', nargs='*',
+                            help=f"Policies to run (default: all enabled): {', '.join(lifecycle.POLICIES)}")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to wait between batches so other writers get the database')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count what would be handled without changing anything')
+
+    def handle(self, *args, policies, batch_size, pause, dry_run, **options):
+        unknown = set(policies) - set(lifecycle.POLICIES)
+        if unknown:
+            raise CommandError(f"Unknown policies: {', '.join(sorted(unknown))}")
+        disabled = set(policies) - set(lifecycle.enabled_policies())
+        if disabled:
+            raise CommandError(f"No retention period set for: {', '.join(sorted(disabled))}")
+        names = policies or lifecycle.enabled_policies()
+
+        for name in names:
+            total, batches, started = 0, 0, time.monotonic()
+            for handled in lifecycle.run_policy(name, batch_size=batch_size, dry_run=dry_run):
+                total += handled
+                batches += 1
+                if not dry_run:
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(f"{name}: batch {batches}, {total} records, {total / elapsed if elapsed else 0:.0f}/s")
+                    if pause:
+                        time.sleep(pause)
+            elapsed = time.monotonic() - started
+            verb = "would handle" if dry_run else "handled"
+            self.stdout.write(self.style.SUCCESS(f"{name}: {verb} {total} records in {elapsed:.2f}s"))
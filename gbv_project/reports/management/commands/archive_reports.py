@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from reports.archiving import archive_deleted_reports
+
+
+class Command(BaseCommand):
+    help = "Move soft-deleted reports and their case data into the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches (default: until none are left)')
+
+    def handle(self, *args, batch_size, max_batches, **options):
+        total = 0
+        for moved in archive_deleted_reports(batch_size=batch_size, max_batches=max_batches):
+            total += moved
+            self.stdout.write(f"Archived {moved} reports ({total} so far)")
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} reports"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from reports.auto_assign import auto_assign
+
+
+class Command(BaseCommand):
+    help = "Assign pending reports to the least-loaded professionals by incident type"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-batches', type=int, default=None)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Show the planned assignments without saving them')
+
+    def handle(self, *args, batch_size, max_batches, dry_run, **options):
+        assigned, unplaced = auto_assign(batch_size=batch_size, max_batches=max_batches, dry_run=dry_run)
+        for report, professional_id in assigned:
+            self.stdout.write(f"{report.reference_code} -> professional {professional_id}")
+        if unplaced:
+            self.stdout.write(self.style.WARNING(
+                f"No professional available for {len(unplaced)} reports: "
+                + ", ".join(report.reference_code for report in unplaced)
+            ))
+        verb = "Would assign" if dry_run else "Assigned"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(assigned)} reports"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from reports.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the report analytics rollups from the report table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Reports read from the database at a time')
+
+    def handle(self, *args, chunk_size, **options):
+        rows = rebuild(chunk_size=chunk_size)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} rollup rows"))
@@ -0,0 +1,39 @@
+import difflib
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gbv_project import openapi
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema file served at /api/schema/, or check it is up to date"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Fail if the committed schema differs from what the code generates')
+
+    def handle(self, *args, check, **options):
+        generated = openapi.generate()
+        try:
+            committed = openapi.SCHEMA_FILE.read_bytes()
+        except FileNotFoundError:
+            committed = None
+
+        if check:
+            if committed == generated:
+                self.stdout.write(self.style.SUCCESS(f"{openapi.SCHEMA_FILE.name} is up to date"))
+                return
+            diff = difflib.unified_diff(
+                (committed or b'').decode().splitlines(), generated.decode().splitlines(),
+                'committed', 'generated', lineterm='', n=2,
+            )
+            for line in list(diff)[:200]:
+                self.stdout.write(line)
+            raise CommandError(f"{openapi.SCHEMA_FILE.name} is out of date; "
+                               f"run manage.py build_openapi_schema and commit the result")
+
+        if committed == generated:
+            self.stdout.write(f"{openapi.SCHEMA_FILE.name} unchanged")
+            return
+        openapi.SCHEMA_FILE.write_bytes(generated)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {openapi.SCHEMA_FILE} ({len(generated)} bytes)"))
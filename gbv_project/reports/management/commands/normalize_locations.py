@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from reports import heatmap, rollups
+from reports.locations import resolve
+from reports.models import GBVReport, UnmatchedLocation
+
+
+class Command(BaseCommand):
+    help = "Match report incident locations against the gazetteer and rebuild the rollups and heatmap"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true', dest='rematch',
+                            help='Re-match reports that already have a location')
+
+    def handle(self, *args, batch_size, rematch, **options):
+        reports = GBVReport.all_objects.order_by('pk').only('pk', 'incident_location', 'location')
+        if not rematch:
+            reports = reports.filter(location__isnull=True)
+
+        updated, last_pk = 0, None
+        while True:
+            batch = reports.filter(pk__gt=last_pk) if last_pk is not None else reports
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            changed = []
+            for report in batch:
+                location_id = resolve(report.incident_location, record_unmatched=True)
+                if location_id != report.location_id:
+                    report.location_id = location_id
+                    changed.append(report)
+            GBVReport.all_objects.bulk_update(changed, ['location'])
+            updated += len(changed)
+            self.stdout.write(f"Normalized {updated} reports")
+
+        # Spellings an admin has since added as a location or alias
+        matched = [unmatched.pk for unmatched in UnmatchedLocation.objects.all() if resolve(unmatched.key) is not None]
+        UnmatchedLocation.objects.filter(pk__in=matched).delete()
+
+        if updated:
+            rows = rollups.rebuild()
+            cells = heatmap.rebuild()
+            self.stdout.write(f"Rebuilt {rows} rollup rows and {cells} heatmap cells")
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} reports"))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gbv_project import importtime
+
+
+class Command(BaseCommand):
+    help = "Report the import-time cost of each module in a cold process start"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=sorted(importtime.SCRIPTS), default='worker',
+                            help="'worker' boots the WSGI application, 'setup' only runs django.setup()")
+        parser.add_argument('--top', type=int, default=25, help='How many modules to list')
+        parser.add_argument('--sort', choices=['self', 'cumulative'], default='self')
+        parser.add_argument('--packages', action='store_true',
+                            help='Total the self time per top-level package instead')
+        parser.add_argument('--match', help='Only list modules whose name contains this')
+
+    def handle(self, *args, mode, top, sort, packages, match, **options):
+        try:
+            wall_ms, records = importtime.measure(mode)
+        except RuntimeError as exc:
+            raise CommandError(f"Startup failed: {exc}")
+        total_us = sum(record.self_us for record in records)
+        self.stdout.write(f"Cold start ({mode}): {wall_ms:.0f}ms wall, "
+                          f"{total_us / 1000:.0f}ms importing {len(records)} modules")
+
+        if packages:
+            rows = sorted(importtime.by_package(records).items(), key=lambda item: -item[1])
+            self.stdout.write(f"{'self ms':>9}  {'share':>6}  package")
+            for package, self_us in rows[:top]:
+                self.stdout.write(f"{self_us / 1000:9.1f}  {self_us / total_us:6.1%}  {package}")
+            return
+
+        if match:
+            records = [record for record in records if match in record.module]
+        key = (lambda record: record.self_us) if sort == 'self' else (lambda record: record.cumulative_us)
+        self.stdout.write(f"{'self ms':>9}  {'cum ms':>9}  module")
+        for record in sorted(records, key=key, reverse=True)[:top]:
+            self.stdout.write(f"{record.self_us / 1000:9.1f}  {record.cumulative_us / 1000:9.1f}  {record.module}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from reports.heatmap import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the report heatmap cells from the reports and location coordinates"
+
+    def handle(self, *args, **options):
+        cells = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {cells} heatmap cells"))
@@ -0,0 +1,42 @@
+import importlib
+import pkgutil
+
+from django.core.management.base import BaseCommand, CommandError
+
+import benchmarks
+
+
+class Command(BaseCommand):
+    help = "Run a benchmark from the benchmarks package against a throwaway database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?', help='Benchmark module name; omit to list them')
+
+    def run_from_argv(self, argv):
+        # Let the chosen benchmark register its own options
+        self._benchmark = None
+        if len(argv) > 2 and not argv[2].startswith('-'):
+            self._benchmark = self._load(argv[2])
+        return super().run_from_argv(argv)
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        benchmark = getattr(self, '_benchmark', None)
+        if benchmark is not None and hasattr(benchmark, 'add_arguments'):
+            benchmark.add_arguments(parser)
+        return parser
+
+    def _load(self, name):
+        try:
+            return importlib.import_module(f'benchmarks.{name}')
+        except ModuleNotFoundError:
+            raise CommandError(f"Unknown benchmark '{name}'")
+
+    def handle(self, *args, name=None, **options):
+        if not name:
+            for module in pkgutil.iter_modules(benchmarks.__path__):
+                if module.name != 'urls':
+                    self.stdout.write(module.name)
+            return
+        benchmark = getattr(self, '_benchmark', None) or self._load(name)
+        benchmark.run(self.stdout, **options)
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reports.reminders import ReminderScheduler, run_once
+
+
+class Command(BaseCommand):
+    help = "Send appointment reminders that are due, catching up on any missed while stopped"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, waking up when the next reminder is due')
+        parser.add_argument('--max-sleep', type=float, default=60,
+                            help='Longest wait in seconds between checks for new appointments')
+
+    def handle(self, *args, loop, max_sleep, **options):
+        # Always start with a catch-up pass over everything already due
+        sent = run_once()
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} reminders"))
+        if not loop:
+            return
+
+        scheduler = ReminderScheduler()
+        try:
+            while True:
+                sent = scheduler.tick()
+                if sent:
+                    self.stdout.write(f"{timezone.now():%Y-%m-%d %H:%M:%S} sent {sent} reminders")
+                time.sleep(scheduler.seconds_until_next(timezone.now(), cap=max_sleep))
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped")
@@ -0,0 +1,36 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reports import webhooks
+
+
+class Command(BaseCommand):
+    help = "Send due webhook deliveries to partner endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, waking up when the next delivery is due')
+        parser.add_argument('--max-sleep', type=float, default=5,
+                            help='Longest wait in seconds between checks for new events')
+        parser.add_argument('--workers', type=int, default=webhooks.WORKERS,
+                            help='Concurrent requests')
+
+    def handle(self, *args, loop, max_sleep, workers, **options):
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='webhook') as pool:
+            sent = webhooks.dispatch(executor=pool)
+            self.stdout.write(self.style.SUCCESS(f"Delivered {sent} events"))
+            if not loop:
+                return
+            try:
+                while True:
+                    sent = webhooks.dispatch(executor=pool)
+                    if sent:
+                        self.stdout.write(f"{timezone.now():%Y-%m-%d %H:%M:%S} delivered {sent} events "
+                                          f"({dict(webhooks.metrics)})")
+                    # Keep going straight away while there is a backlog
+                    time.sleep(0 if sent else webhooks.seconds_until_next(cap=max_sleep))
+            except KeyboardInterrupt:
+                self.stdout.write("Stopped")
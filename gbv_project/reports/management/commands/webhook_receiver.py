@@ -0,0 +1,44 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from reports import webhooks
+
+
+class Command(BaseCommand):
+    help = "Run a local stand-in for a partner endpoint that checks signatures and prints events"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--secret', required=True, help="The endpoint's signing secret")
+        parser.add_argument('--status', type=int, default=200,
+                            help='Status to answer with, e.g. 503 to exercise retries and the circuit breaker')
+
+    def handle(self, *args, port, secret, status, **options):
+        stdout = self.stdout
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if not webhooks.verify_signature(secret, self.headers.get(webhooks.SIGNATURE_HEADER, ''), body):
+                    stdout.write("Rejected a request with a bad signature")
+                    self.send_response(401)
+                else:
+                    for delivery in json.loads(body)['deliveries']:
+                        stdout.write(f"{delivery['type']} {delivery['id']} attempt {delivery['attempt']}: "
+                                     f"{json.dumps(delivery['data'])}")
+                    self.send_response(status)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.stdout.write(f"Listening on http://127.0.0.1:{port}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped")
+        finally:
+            server.server_close()
@@ -0,0 +1,151 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:34
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0011_alter_gbvreport_incident_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAppointment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('appointment_type', models.CharField(choices=[('medical', 'Medical Consultation'), ('legal', 'Legal Consultation'), ('counseling', 'Counseling Session'), ('follow_up', 'Follow-up Meeting')], max_length=20)),
+                ('scheduled_date', models.DateTimeField()),
+                ('duration_minutes', models.PositiveIntegerField(default=60)),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('confirmed', 'Confirmed'), ('completed', 'Completed'), ('cancelled', 'Cancelled'), ('no_show', 'No Show')], max_length=15)),
+                ('notes', models.TextField(blank=True)),
+                ('location', models.CharField(blank=True, max_length=255)),
+                ('is_virtual', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedCaseAssignment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('assigned_date', models.DateTimeField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('notes', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedCaseNote',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('note_type', models.CharField(max_length=20)),
+                ('content', models.TextField()),
+                ('is_confidential', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedDocument',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('document_type', models.CharField(max_length=50)),
+                ('file', models.FileField(upload_to='case_documents/')),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('is_confidential', models.BooleanField(default=True)),
+                ('uploaded_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedGBVReport',
+            fields=[
+                ('reference_code', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('under_review', 'Under Review'), ('resolved', 'Resolved')], max_length=15)),
+                ('incident_date', models.DateTimeField()),
+                ('incident_location', models.CharField(max_length=255)),
+                ('incident_type', models.CharField(choices=[('physical', 'Physical Violence'), ('sexual', 'Sexual Violence'), ('emotional', 'Emotional/Psychological'), ('online', 'Online Bullying'), ('other', 'Other')], max_length=20)),
+                ('description', models.TextField()),
+                ('is_deleted', models.BooleanField(default=True)),
+                ('immediate_danger', models.BooleanField(default=False)),
+                ('needs_medical_attention', models.BooleanField(default=False)),
+                ('date_reported', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Archived GBV Report',
+                'verbose_name_plural': 'Archived GBV Reports',
+                'ordering': ['-archived_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='gbvreport',
+            name='incident_date',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 19, 14, 34, 50, 607351)),
+        ),
+        migrations.AddIndex(
+            model_name='gbvreport',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-date_reported'], name='gbvreport_live_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gbvreport',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['status', '-date_reported'], name='gbvreport_live_status_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedappointment',
+            name='professional',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedcaseassignment',
+            name='assigned_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedcaseassignment',
+            name='professional',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedcasenote',
+            name='created_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archiveddocument',
+            name='uploaded_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedgbvreport',
+            name='assigned_to',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedgbvreport',
+            name='reporter',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_reports', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archiveddocument',
+            name='report',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='documents', to='reports.archivedgbvreport'),
+        ),
+        migrations.AddField(
+            model_name='archivedcasenote',
+            name='report',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='case_notes', to='reports.archivedgbvreport'),
+        ),
+        migrations.AddField(
+            model_name='archivedcaseassignment',
+            name='report',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assigned_reports', to='reports.archivedgbvreport'),
+        ),
+        migrations.AddField(
+            model_name='archivedappointment',
+            name='report',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to='reports.archivedgbvreport'),
+        ),
+    ]
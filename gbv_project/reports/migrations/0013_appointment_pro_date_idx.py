@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:37
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0012_report_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gbvreport',
+            name='incident_date',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 19, 14, 37, 32, 606408)),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['professional', 'scheduled_date'], name='appointment_pro_date_idx'),
+        ),
+    ]
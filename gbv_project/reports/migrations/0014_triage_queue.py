@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:39
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_triage_queue(apps, schema_editor):
+    GBVReport = apps.get_model('reports', 'GBVReport')
+    TriageEntry = apps.get_model('reports', 'TriageEntry')
+    pending = GBVReport._base_manager.filter(status='pending', is_deleted=False)
+    TriageEntry.objects.bulk_create([
+        TriageEntry(
+            report_id=report.pk,
+            urgency=2 * report.immediate_danger + report.needs_medical_attention,
+            date_reported=report.date_reported,
+        )
+        for report in pending.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0013_appointment_pro_date_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gbvreport',
+            name='incident_date',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 19, 14, 39, 25, 785559)),
+        ),
+        migrations.CreateModel(
+            name='TriageEntry',
+            fields=[
+                ('report', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='triage_entry', serialize=False, to='reports.gbvreport')),
+                ('urgency', models.PositiveSmallIntegerField(default=0)),
+                ('date_reported', models.DateTimeField()),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('claimed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='triage_claims', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Triage entries',
+                'ordering': ['-urgency', 'date_reported'],
+                'indexes': [models.Index(fields=['-urgency', 'date_reported'], name='triage_queue_order_idx')],
+            },
+        ),
+        migrations.RunPython(populate_triage_queue, migrations.RunPython.noop),
+    ]
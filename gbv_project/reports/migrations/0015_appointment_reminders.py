@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:41
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0014_triage_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('offset_minutes', models.PositiveIntegerField(help_text='Minutes before the appointment')),
+                ('batch_id', models.UUIDField(help_text='Scheduler run that claimed this reminder')),
+                ('claimed_at', models.DateTimeField()),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='gbvreport',
+            name='incident_date',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 19, 14, 41, 33, 844875)),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['scheduled_date'], name='appointment_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='appointmentreminder',
+            name='appointment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='reports.appointment'),
+        ),
+        migrations.AddIndex(
+            model_name='appointmentreminder',
+            index=models.Index(fields=['batch_id'], name='reminder_batch_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointmentreminder',
+            constraint=models.UniqueConstraint(fields=('appointment', 'offset_minutes'), name='unique_appointment_reminder'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:44
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0015_appointment_reminders'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gbvreport',
+            name='incident_date',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 19, 14, 44, 18, 21217)),
+        ),
+        migrations.CreateModel(
+            name='AccessLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_reference', models.CharField(max_length=20)),
+                ('action', models.CharField(choices=[('view_report', 'Viewed report'), ('view_summary', 'Viewed case summary'), ('view_note', 'Viewed case note'), ('view_document', 'Viewed document')], max_length=20)),
+                ('object_id', models.CharField(blank=True, max_length=40)),
+                ('is_confidential', models.BooleanField(default=False)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('accessed_at', models.DateTimeField()),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-accessed_at'],
+                'indexes': [models.Index(fields=['report_reference', 'accessed_at'], name='accesslog_report_time_idx'), models.Index(fields=['user', 'accessed_at'], name='accesslog_user_time_idx'), models.Index(fields=['accessed_at'], name='accesslog_time_idx')],
+            },
+        ),
+    ]
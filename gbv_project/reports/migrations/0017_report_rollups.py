@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:46
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0016_access_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gbvreport',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='gbvreport',
+            name='incident_date',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 19, 14, 46, 54, 148762)),
+        ),
+        migrations.CreateModel(
+            name='ReportRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField(help_text='Monday of the week the report was made')),
+                ('incident_type', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=15)),
+                ('location', models.CharField(max_length=255)),
+                ('report_count', models.IntegerField(default=0)),
+                ('timed_count', models.IntegerField(default=0)),
+                ('resolution_seconds', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('week', 'incident_type', 'status', 'location'), name='unique_report_rollup')],
+            },
+        ),
+    ]
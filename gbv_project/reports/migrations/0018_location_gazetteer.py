@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:48
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0017_report_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('key', models.CharField(help_text='Normalized form used for matching', max_length=255, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='gbvreport',
+            name='incident_date',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 19, 14, 48, 50, 612020)),
+        ),
+        migrations.AddField(
+            model_name='gbvreport',
+            name='location',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Gazetteer location matched from incident_location', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reports', to='reports.location'),
+        ),
+        migrations.CreateModel(
+            name='LocationAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Normalized form used for matching', max_length=255, unique=True)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='reports.location')),
+            ],
+            options={
+                'verbose_name_plural': 'Location aliases',
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:50
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0018_location_gazetteer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True),
+        ),
+        migrations.AlterField(
+            model_name='gbvreport',
+            name='incident_date',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 19, 14, 50, 47, 559561)),
+        ),
+        migrations.CreateModel(
+            name='HeatmapCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField()),
+                ('x', models.PositiveIntegerField()),
+                ('y', models.PositiveIntegerField()),
+                ('incident_type', models.CharField(max_length=20)),
+                ('report_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('zoom', 'x', 'y', 'incident_type'), name='unique_heatmap_cell')],
+            },
+        ),
+    ]
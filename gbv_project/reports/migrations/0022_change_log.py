@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:57
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0021_idempotency_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gbvreport',
+            name='incident_date',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 19, 14, 57, 15, 645471)),
+        ),
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(choices=[('report', 'Report'), ('appointment', 'Appointment'), ('note', 'Case note'), ('document', 'Document'), ('assignment', 'Case assignment')], max_length=20)),
+                ('object_id', models.CharField(max_length=40)),
+                ('report_reference', models.CharField(max_length=20)),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=10)),
+                ('changed_at', models.DateTimeField()),
+                ('user', models.ForeignKey(db_constraint=False, help_text='Empty for the admin feed', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'id'], name='changelog_user_cursor_idx'), models.Index(fields=['changed_at'], name='changelog_time_idx')],
+            },
+        ),
+    ]
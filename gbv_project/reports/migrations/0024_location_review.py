@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:20
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0023_webhooks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnmatchedLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Normalized form used for matching', max_length=255, unique=True)),
+                ('text', models.CharField(help_text='Spelling as first entered', max_length=255)),
+                ('first_seen', models.DateTimeField(auto_now_add=True)),
+                ('last_seen', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-last_seen'],
+            },
+        ),
+        # Existing locations may have been created from report text, so
+        # they start unreviewed; locations added from now on are reviewed
+        migrations.AddField(
+            model_name='location',
+            name='is_reviewed',
+            field=models.BooleanField(default=False, help_text='Checked by an admin; only reviewed locations are offered in autocomplete'),
+        ),
+        migrations.AlterField(
+            model_name='location',
+            name='is_reviewed',
+            field=models.BooleanField(default=True, help_text='Checked by an admin; only reviewed locations are offered in autocomplete'),
+        ),
+        migrations.AlterField(
+            model_name='gbvreport',
+            name='incident_date',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 19, 15, 20, 13, 27504)),
+        ),
+    ]
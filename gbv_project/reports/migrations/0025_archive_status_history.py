@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:23
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0024_location_review'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedgbvreport',
+            name='location',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='reports.location'),
+        ),
+        migrations.AddField(
+            model_name='archivedgbvreport',
+            name='resolved_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='gbvreport',
+            name='incident_date',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 19, 15, 23, 46, 591500)),
+        ),
+        migrations.CreateModel(
+            name='ArchivedReportStatusChange',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('old_status', models.CharField(choices=[('pending', 'Pending'), ('under_review', 'Under Review'), ('resolved', 'Resolved')], max_length=15)),
+                ('new_status', models.CharField(choices=[('pending', 'Pending'), ('under_review', 'Under Review'), ('resolved', 'Resolved')], max_length=15)),
+                ('changed_at', models.DateTimeField()),
+                ('notes', models.TextField(blank=True)),
+                ('changed_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='reports.archivedgbvreport')),
+            ],
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:28
+
+import datetime
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def stamp_ended_assignments(apps, schema_editor):
+    # When they ended is unknown; start their retention period now
+    now = timezone.now()
+    for name in ('CaseAssignment', 'ArchivedCaseAssignment'):
+        model = apps.get_model('reports', name)
+        model._base_manager.filter(is_active=False, deactivated_at__isnull=True).update(deactivated_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0025_archive_status_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedcaseassignment',
+            name='deactivated_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='caseassignment',
+            name='deactivated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='gbvreport',
+            name='incident_date',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 19, 15, 28, 54, 28371)),
+        ),
+        migrations.RunPython(stamp_ended_assignments, migrations.RunPython.noop),
+    ]
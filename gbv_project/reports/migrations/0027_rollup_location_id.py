@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:30
+
+import datetime
+import django.db.models.deletion
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def clear_rollups(apps, schema_editor):
+    # Keyed by location name until now; rebuilt below
+    apps.get_model('reports', 'ReportRollup').objects.all().delete()
+
+
+def rebuild_rollups(apps, schema_editor):
+    GBVReport = apps.get_model('reports', 'GBVReport')
+    ReportRollup = apps.get_model('reports', 'ReportRollup')
+    totals = defaultdict(lambda: [0, 0, 0])
+    reports = GBVReport._base_manager.filter(is_deleted=False).values_list(
+        'date_reported', 'incident_type', 'status', 'location_id', 'resolved_at')
+    for date_reported, incident_type, status, location_id, resolved_at in reports.iterator():
+        day = timezone.localtime(date_reported).date()
+        counts = totals[day - timedelta(days=day.weekday()), incident_type, status, location_id]
+        counts[0] += 1
+        if status == 'resolved' and resolved_at:
+            counts[1] += 1
+            counts[2] += max(0, int((resolved_at - date_reported).total_seconds()))
+    ReportRollup.objects.bulk_create([
+        ReportRollup(week=week, incident_type=incident_type, status=status, location_id=location_id,
+                     report_count=count, timed_count=timed, resolution_seconds=seconds)
+        for (week, incident_type, status, location_id), (count, timed, seconds) in totals.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0026_assignment_deactivated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gbvreport',
+            name='incident_date',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 19, 15, 30, 0, 957151)),
+        ),
+        migrations.RunPython(clear_rollups, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reportrollup',
+            name='location',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reports.location'),
+        ),
+        migrations.AddConstraint(
+            model_name='reportrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('location__isnull', True)), fields=('week', 'incident_type', 'status'), name='unique_unmatched_report_rollup'),
+        ),
+        migrations.RunPython(rebuild_rollups, clear_rollups),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:46
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0027_rollup_location_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='accesslog',
+            name='action',
+            field=models.CharField(choices=[('view_report', 'Viewed report'), ('view_summary', 'Viewed case summary'), ('view_note', 'Viewed case note'), ('view_document', 'Viewed document'), ('download_document', 'Downloaded document')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='accesslog',
+            name='report_reference',
+            field=models.CharField(max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='changelog',
+            name='report_reference',
+            field=models.CharField(max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='gbvreport',
+            name='incident_date',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 19, 15, 46, 6, 957703)),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:50
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0028_report_reference_length'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gbvreport',
+            name='incident_date',
+            field=models.DateTimeField(default=datetime.datetime(2026, 10, 19, 15, 50, 56, 461825)),
+        ),
+        migrations.CreateModel(
+            name='ArchivedAppointmentReminder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('offset_minutes', models.PositiveIntegerField()),
+                ('batch_id', models.UUIDField()),
+                ('claimed_at', models.DateTimeField()),
+                ('sent_at', models.DateTimeField(null=True)),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='reports.archivedappointment')),
+            ],
+        ),
+    ]
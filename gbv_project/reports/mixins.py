@@ -0,0 +1,153 @@
+"""
+Sparse fieldsets for the report APIs.
+
+GET requests may pass ``?fields=reference_code,status,date_reported`` to
+limit the serialized fields and ``?expand=reporter`` to replace a foreign
+key id with a nested object. The view mixin narrows the SQL to match, so
+columns and joins that are not rendered are never loaded.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+# Model methods used as serializer sources, and the columns they read
+METHOD_COLUMNS = {
+    'get_full_name': ('first_name', 'last_name'),
+}
+
+
+def parse_field_list(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def get_sparse_params(request):
+    """Return (fields, expand) requested on a GET request"""
+    if request is None or request.method != 'GET':
+        return set(), set()
+    params = request.query_params if hasattr(request, 'query_params') else request.GET
+    return parse_field_list(params.get('fields')), parse_field_list(params.get('expand'))
+
+
+class UserSummarySerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    first_name = serializers.CharField()
+    last_name = serializers.CharField()
+    email = serializers.EmailField()
+    role = serializers.CharField()
+
+
+class ReportSummarySerializer(serializers.Serializer):
+    reference_code = serializers.CharField()
+    status = serializers.CharField()
+    incident_type = serializers.CharField()
+    date_reported = serializers.DateTimeField()
+
+
+class SparseFieldsSerializerMixin:
+    """
+    Serializer mixin honouring ?fields= and ?expand= on GET requests.
+
+    ``expandable_fields`` maps an expand name to (serializer class, source).
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, expand = get_sparse_params(self.context.get('request'))
+        for name in expand & set(self.expandable_fields):
+            serializer_class, source = self.expandable_fields[name]
+            kwargs = {'source': source} if source != name else {}
+            self.fields[name] = serializer_class(read_only=True, **kwargs)
+        if fields:
+            keep = fields | expand
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+    @classmethod
+    def get_query_plan(cls, model, fields, expand):
+        """
+        Work out which columns and joins rendering the requested fields needs.
+        Returns (only, select_related); ``only`` is None when it cannot be
+        narrowed safely.
+        """
+        serializer = cls()
+        declared = serializer.fields
+        only, select_related = {model._meta.pk.name}, set()
+
+        for name in expand & set(cls.expandable_fields):
+            serializer_class, source = cls.expandable_fields[name]
+            select_related.add(source)
+            only.add(source)
+            only.update(f'{source}__{column}' for column in serializer_class().fields)
+
+        narrowable = True
+        names = (fields | expand) if fields else set(declared)
+        for name in names:
+            field = declared.get(name)
+            if field is None or getattr(field, 'write_only', False):
+                continue
+            if name in expand and name in cls.expandable_fields:
+                continue
+            columns, joins = cls._columns_for_source(model, field.source)
+            select_related.update(joins)
+            if columns is None:
+                narrowable = False
+                continue
+            only.update(joins)
+            only.update(columns)
+
+        if not fields or not narrowable:
+            only = None
+        return only, select_related
+
+    @staticmethod
+    def _columns_for_source(model, source):
+        """Return (columns, joins) for a field source; columns is None if unknown"""
+        parts = source.split('.')
+        try:
+            field = model._meta.get_field(parts[0])
+        except FieldDoesNotExist:
+            # '*', properties and methods on the model itself
+            return None, set()
+        if len(parts) == 1:
+            return [field.name], set()
+        if len(parts) != 2 or not field.is_relation or field.many_to_many or field.one_to_many:
+            return None, set()
+        related, attr = field.related_model, parts[1]
+        if attr in METHOD_COLUMNS:
+            return [f'{field.name}__{column}' for column in METHOD_COLUMNS[attr]], {field.name}
+        try:
+            related._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None, {field.name}
+        return [f'{field.name}__{attr}'], {field.name}
+
+
+class SparseFieldsViewMixin:
+    """
+    ViewSet mixin that narrows the queryset to the fields requested with
+    ?fields= / ?expand= using select_related() and only(). Applied in
+    filter_queryset() so list and retrieve pick it up; custom list actions
+    call project_queryset() themselves.
+    """
+    sparse_actions = ('list', 'retrieve')
+    # Columns loaded regardless of ?fields=, for code that reads them off the objects
+    sparse_always_fields = ()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if getattr(self, 'action', None) not in self.sparse_actions:
+            return queryset
+        return self.project_queryset(queryset)
+
+    def project_queryset(self, queryset):
+        serializer_class = self.get_serializer_class()
+        if not hasattr(serializer_class, 'get_query_plan'):
+            return queryset
+        fields, expand = get_sparse_params(self.request)
+        only, select_related = serializer_class.get_query_plan(queryset.model, fields, expand)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if only:
+            queryset = queryset.only(*only, *self.sparse_always_fields)
+        return queryset
@@ -1,8 +1,11 @@
 from django.db import models
 from datetime import datetime
 from django.conf import settings
+from django.utils import timezone
 import string
 import random
+import secrets
+import uuid
 
 class ReportManager(models.Manager):
     def get_queryset(self):
@@ -14,6 +17,49 @@ class CaseAssignmentManager(models.Manager):
         return super().get_queryset().filter(is_active=True, report__is_deleted=False)
     
 
+class Location(models.Model):
+    """Canonical place name in the gazetteer used to normalize incident locations"""
+    name = models.CharField(max_length=255, unique=True)
+    key = models.CharField(max_length=255, unique=True, help_text="Normalized form used for matching")
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    is_reviewed = models.BooleanField(
+        default=True, help_text="Checked by an admin; only reviewed locations are offered in autocomplete"
+    )
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class LocationAlias(models.Model):
+    """Another spelling that should resolve to a gazetteer location"""
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='aliases')
+    key = models.CharField(max_length=255, unique=True, help_text="Normalized form used for matching")
+
+    class Meta:
+        verbose_name_plural = "Location aliases"
+
+    def __str__(self):
+        return f"{self.key} -> {self.location}"
+
+
+class UnmatchedLocation(models.Model):
+    """A report location that matched nothing in the gazetteer, kept for an admin to review"""
+    key = models.CharField(max_length=255, unique=True, help_text="Normalized form used for matching")
+    text = models.CharField(max_length=255, help_text="Spelling as first entered")
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-last_seen']
+
+    def __str__(self):
+        return self.text
+
+
 class GBVReport(models.Model):
     INCIDENT_TYPE_CHOICES = [
         ('physical', 'Physical Violence'),
@@ -33,6 +79,15 @@ class GBVReport(models.Model):
     status = models.CharField(max_length=15, choices=REPORT_STATUSES, default="pending")
     incident_date = models.DateTimeField(default=datetime.now())
     incident_location = models.CharField(max_length=255, help_text="Location where the incident occurred") 
+    location = models.ForeignKey(
+        Location,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='reports',
+        help_text="Gazetteer location matched from incident_location"
+    )
     incident_type = models.CharField(
         max_length=20, 
         choices=INCIDENT_TYPE_CHOICES, 
@@ -51,6 +106,8 @@ class GBVReport(models.Model):
         help_text="Indicates if the reporter needs medical attention"
     )
     objects = ReportManager()
+    # Includes soft-deleted rows; used by the archiver and admin tooling
+    all_objects = models.Manager()
     # System Fields
     reference_code = models.CharField(
         max_length=50, 
@@ -60,12 +117,29 @@ class GBVReport(models.Model):
         help_text="Unique reference code for tracking the report"
     )
     date_reported = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True, editable=False)
     
     def save(self, *args, **kwargs):
         """Generate reference code if not provided"""
         if not self.reference_code:
             self.reference_code = self.generate_reference_code()
+        resolved_at = self.resolved_at
+        self.stamp_resolution()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.resolved_at != resolved_at:
+            kwargs['update_fields'] = update_fields = {*update_fields, 'resolved_at'}
+        if update_fields is not None and 'incident_location' in update_fields:
+            # reports.signals resolves it again if the incident location changed
+            kwargs['update_fields'] = {*update_fields, 'location'}
         super().save(*args, **kwargs)
+    
+    def stamp_resolution(self):
+        """Set resolved_at when the report becomes resolved, clear it if reopened"""
+        if self.status == 'resolved':
+            if self.resolved_at is None:
+                self.resolved_at = timezone.now()
+        else:
+            self.resolved_at = None
         
     def delete(self):
         self.is_deleted=True
@@ -85,7 +159,41 @@ class GBVReport(models.Model):
         ordering = ['-date_reported']
         verbose_name = "GBV Report"
         verbose_name_plural = "GBV Reports"
+        # Partial indexes: every query goes through ReportManager, so only
+        # live rows need to be indexed.
+        indexes = [
+            models.Index(
+                fields=['-date_reported'],
+                condition=models.Q(is_deleted=False),
+                name='gbvreport_live_date_idx',
+            ),
+            models.Index(
+                fields=['status', '-date_reported'],
+                condition=models.Q(is_deleted=False),
+                name='gbvreport_live_status_idx',
+            ),
+        ]
         
+class ReportStatusChange(models.Model):
+    """History of report status changes"""
+    report = models.ForeignKey(GBVReport, on_delete=models.CASCADE, related_name='status_changes')
+    old_status = models.CharField(max_length=15, choices=GBVReport.REPORT_STATUSES)
+    new_status = models.CharField(max_length=15, choices=GBVReport.REPORT_STATUSES)
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+'
+    )
+    changed_at = models.DateTimeField(auto_now_add=True)
+    notes = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['report', 'changed_at'], name='statuschange_report_idx'),
+        ]
+
 class CaseAssignment(models.Model):
     """Track which professionals are assigned to which cases"""
     report = models.ForeignKey(GBVReport, on_delete=models.CASCADE, related_name="assigned_reports")
@@ -98,9 +206,26 @@ class CaseAssignment(models.Model):
         related_name='assignments_made'
     )
     is_active = models.BooleanField(default=True)
+    deactivated_at = models.DateTimeField(null=True, blank=True, editable=False)
     notes = models.TextField(blank=True)
     
     objects = CaseAssignmentManager()
+    all_objects = models.Manager()
+
+    def save(self, *args, **kwargs):
+        deactivated_at = self.deactivated_at
+        self.stamp_deactivation()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.deactivated_at != deactivated_at:
+            kwargs['update_fields'] = {*update_fields, 'deactivated_at'}
+        super().save(*args, **kwargs)
+
+    def stamp_deactivation(self):
+        """Set deactivated_at when the assignment ends, clear it if reactivated"""
+        if self.is_active:
+            self.deactivated_at = None
+        elif self.deactivated_at is None:
+            self.deactivated_at = timezone.now()
 
 class Appointment(models.Model):
     APPOINTMENT_TYPES = [
@@ -131,6 +256,14 @@ class Appointment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Range scans per professional for availability and conflict checks
+            models.Index(fields=['professional', 'scheduled_date'], name='appointment_pro_date_idx'),
+            # Range scans across professionals for reminders
+            models.Index(fields=['scheduled_date'], name='appointment_date_idx'),
+        ]
+
 class CaseNote(models.Model):
     """Track case progress and communications"""
     report = models.ForeignKey(GBVReport, on_delete=models.CASCADE, related_name='case_notes')
@@ -160,4 +293,365 @@ class Document(models.Model):
     file = models.FileField(upload_to='case_documents/')
     description = models.CharField(max_length=255, blank=True)
     is_confidential = models.BooleanField(default=True)
-    uploaded_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+
+
+class TriageEntry(models.Model):
+    """
+    Queue of pending reports ordered by urgency and age, maintained by
+    reports.triage as reports are saved and assigned. Admins claim entries
+    so that several of them can work the queue at once.
+    """
+    report = models.OneToOneField(GBVReport, on_delete=models.CASCADE, primary_key=True, related_name='triage_entry')
+    urgency = models.PositiveSmallIntegerField(default=0)
+    date_reported = models.DateTimeField()
+    claimed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='triage_claims'
+    )
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-urgency', 'date_reported']
+        indexes = [
+            models.Index(fields=['-urgency', 'date_reported'], name='triage_queue_order_idx'),
+        ]
+        verbose_name_plural = "Triage entries"
+
+class AppointmentReminder(models.Model):
+    """
+    One row per reminder sent (or being sent) for an appointment. The unique
+    constraint is what guarantees each reminder goes out once, even with
+    overlapping scheduler runs.
+    """
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='reminders')
+    offset_minutes = models.PositiveIntegerField(help_text="Minutes before the appointment")
+    batch_id = models.UUIDField(help_text="Scheduler run that claimed this reminder")
+    claimed_at = models.DateTimeField()
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['appointment', 'offset_minutes'], name='unique_appointment_reminder'),
+        ]
+        indexes = [
+            models.Index(fields=['batch_id'], name='reminder_batch_idx'),
+        ]
+
+class ReportRollup(models.Model):
+    """
+    Report counts per week, incident type, status and location, kept up to
+    date by reports.rollups as reports are saved. Resolution times are
+    summed for resolved reports whose resolution time is known. Reports
+    not matched to the gazetteer are counted under a null location.
+    """
+    week = models.DateField(help_text="Monday of the week the report was made")
+    incident_type = models.CharField(max_length=20)
+    status = models.CharField(max_length=15)
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, null=True, related_name='+')
+    report_count = models.IntegerField(default=0)
+    timed_count = models.IntegerField(default=0)
+    resolution_seconds = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['week', 'incident_type', 'status', 'location'],
+                name='unique_report_rollup',
+            ),
+            models.UniqueConstraint(
+                fields=['week', 'incident_type', 'status'],
+                condition=models.Q(location__isnull=True),
+                name='unique_unmatched_report_rollup',
+            ),
+        ]
+
+class HeatmapCell(models.Model):
+    """
+    Report count per incident type in one web-mercator grid cell, at each
+    zoom level in reports.heatmap.CELL_ZOOMS. Maintained by reports.heatmap.
+    """
+    zoom = models.PositiveSmallIntegerField()
+    x = models.PositiveIntegerField()
+    y = models.PositiveIntegerField()
+    incident_type = models.CharField(max_length=20)
+    report_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['zoom', 'x', 'y', 'incident_type'], name='unique_heatmap_cell'),
+        ]
+
+class AccessLogQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise TypeError("Access log entries cannot be changed")
+
+    def delete(self):
+        raise TypeError("Access log entries cannot be deleted")
+
+    def purge(self):
+        """Delete entries past retention; only for reports.lifecycle"""
+        return super().delete()
+
+
+class AccessLog(models.Model):
+    """
+    Append-only record of who read sensitive case data. Written in batches
+    by reports.audit. The report is kept as a plain reference code so
+    entries outlive archiving and deletion of the report itself.
+    """
+    ACTION_CHOICES = [
+        ('view_report', 'Viewed report'),
+        ('view_summary', 'Viewed case summary'),
+        ('view_note', 'Viewed case note'),
+        ('view_document', 'Viewed document'),
+        ('download_document', 'Downloaded document'),
+    ]
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    report_reference = models.CharField(max_length=50)
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    object_id = models.CharField(max_length=40, blank=True)
+    is_confidential = models.BooleanField(default=False)
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    accessed_at = models.DateTimeField()
+
+    objects = AccessLogQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-accessed_at']
+        indexes = [
+            models.Index(fields=['report_reference', 'accessed_at'], name='accesslog_report_time_idx'),
+            models.Index(fields=['user', 'accessed_at'], name='accesslog_user_time_idx'),
+            models.Index(fields=['accessed_at'], name='accesslog_time_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise TypeError("Access log entries cannot be changed")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise TypeError("Access log entries cannot be deleted")
+
+class IdempotencyRecord(models.Model):
+    """
+    Stored outcome of a POST made with an Idempotency-Key, replayed to
+    retries of the same request until it expires. status_code is null
+    while the first request is still being handled.
+    """
+    key = models.CharField(max_length=255)
+    scope = models.CharField(max_length=64, help_text="Hash of the caller's credentials and the path")
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    body = models.BinaryField(blank=True, help_text="zlib-compressed response body")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expiry_idx'),
+        ]
+
+class ChangeLog(models.Model):
+    """
+    Per-user feed of changes to case data, written by reports.sync. Each
+    change gets one row per user who can see it, plus one row with no user
+    for admins, so the id is a cursor a client can poll from.
+    """
+    MODEL_CHOICES = [
+        ('report', 'Report'),
+        ('appointment', 'Appointment'),
+        ('note', 'Case note'),
+        ('document', 'Document'),
+        ('assignment', 'Case assignment'),
+    ]
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='+',
+        help_text="Empty for the admin feed"
+    )
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.CharField(max_length=40)
+    report_reference = models.CharField(max_length=50)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='changelog_user_cursor_idx'),
+            models.Index(fields=['changed_at'], name='changelog_time_idx'),
+        ]
+
+def generate_webhook_secret():
+    return secrets.token_hex(32)
+
+
+class WebhookEndpoint(models.Model):
+    """
+    A partner system receiving case events. The circuit breaker fields are
+    maintained by reports.webhooks: after repeated failures the endpoint is
+    skipped until circuit_open_until.
+    """
+    EVENT_CHOICES = [
+        ('report.created', 'Report created'),
+        ('report.status_changed', 'Report status changed'),
+        ('report.assigned', 'Report assigned'),
+        ('appointment.scheduled', 'Appointment scheduled'),
+    ]
+    name = models.CharField(max_length=100)
+    url = models.URLField()
+    secret = models.CharField(max_length=64, default=generate_webhook_secret)
+    events = models.JSONField(default=list, blank=True, help_text="Event types to send; empty for all")
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    consecutive_failures = models.PositiveIntegerField(default=0, editable=False)
+    circuit_open_until = models.DateTimeField(null=True, blank=True, editable=False)
+
+    def __str__(self):
+        return self.name
+
+
+class WebhookDelivery(models.Model):
+    """One event for one endpoint, retried with backoff until delivered or given up"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('delivered', 'Delivered'),
+        ('failed', 'Failed'),
+    ]
+    endpoint = models.ForeignKey(WebhookEndpoint, on_delete=models.CASCADE, related_name='deliveries')
+    event_id = models.UUIDField(default=uuid.uuid4, editable=False)
+    event_type = models.CharField(max_length=40)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.UUIDField(null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    last_error = models.CharField(max_length=255, blank=True)
+    duration_ms = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='webhook_due_idx'),
+            models.Index(fields=['endpoint', 'status'], name='webhook_endpoint_status_idx'),
+        ]
+
+# Archive tables
+# Soft-deleted reports are moved here, together with their notes, documents,
+# appointments (and their reminders) and assignments, by reports.archiving.
+# Rows keep their original primary keys so a report can be restored unchanged.
+
+class ArchivedGBVReport(models.Model):
+    reference_code = models.CharField(max_length=50, primary_key=True)
+    reporter = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="archived_reports")
+    assigned_to = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="+")
+    status = models.CharField(max_length=15, choices=GBVReport.REPORT_STATUSES)
+    incident_date = models.DateTimeField()
+    incident_location = models.CharField(max_length=255)
+    location = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, related_name="+")
+    incident_type = models.CharField(max_length=20, choices=GBVReport.INCIDENT_TYPE_CHOICES)
+    description = models.TextField()
+    is_deleted = models.BooleanField(default=True)
+    immediate_danger = models.BooleanField(default=False)
+    needs_medical_attention = models.BooleanField(default=False)
+    date_reported = models.DateTimeField()
+    resolved_at = models.DateTimeField(null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived report {self.reference_code}"
+
+    class Meta:
+        ordering = ['-archived_at']
+        verbose_name = "Archived GBV Report"
+        verbose_name_plural = "Archived GBV Reports"
+
+
+class ArchivedReportStatusChange(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    report = models.ForeignKey(ArchivedGBVReport, on_delete=models.CASCADE, related_name="status_changes")
+    old_status = models.CharField(max_length=15, choices=GBVReport.REPORT_STATUSES)
+    new_status = models.CharField(max_length=15, choices=GBVReport.REPORT_STATUSES)
+    changed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="+")
+    changed_at = models.DateTimeField()
+    notes = models.TextField(blank=True)
+
+
+class ArchivedCaseAssignment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    report = models.ForeignKey(ArchivedGBVReport, on_delete=models.CASCADE, related_name="assigned_reports")
+    professional = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    assigned_date = models.DateTimeField()
+    assigned_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="+")
+    is_active = models.BooleanField(default=True)
+    deactivated_at = models.DateTimeField(null=True)
+    notes = models.TextField(blank=True)
+
+
+class ArchivedAppointment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    report = models.ForeignKey(ArchivedGBVReport, on_delete=models.CASCADE, related_name="appointments")
+    professional = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    appointment_type = models.CharField(max_length=20, choices=Appointment.APPOINTMENT_TYPES)
+    scheduled_date = models.DateTimeField()
+    duration_minutes = models.PositiveIntegerField(default=60)
+    status = models.CharField(max_length=15, choices=Appointment.STATUS_CHOICES)
+    notes = models.TextField(blank=True)
+    location = models.CharField(max_length=255, blank=True)
+    is_virtual = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+
+class ArchivedAppointmentReminder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    appointment = models.ForeignKey(ArchivedAppointment, on_delete=models.CASCADE, related_name="reminders")
+    offset_minutes = models.PositiveIntegerField()
+    batch_id = models.UUIDField()
+    claimed_at = models.DateTimeField()
+    sent_at = models.DateTimeField(null=True)
+
+
+class ArchivedCaseNote(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    report = models.ForeignKey(ArchivedGBVReport, on_delete=models.CASCADE, related_name="case_notes")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    note_type = models.CharField(max_length=20)
+    content = models.TextField()
+    is_confidential = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+
+
+class ArchivedDocument(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    report = models.ForeignKey(ArchivedGBVReport, on_delete=models.CASCADE, related_name="documents")
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    document_type = models.CharField(max_length=50)
+    file = models.FileField(upload_to='case_documents/')
+    description = models.CharField(max_length=255, blank=True)
+    is_confidential = models.BooleanField(default=True)
+    uploaded_at = models.DateTimeField()
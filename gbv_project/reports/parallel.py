@@ -0,0 +1,50 @@
+"""
+Runs the independent sub-queries of a view (the case summary, the
+dashboard) at the same time when GBV_PARALLEL_QUERIES is on.
+
+Each call runs in a pool thread with its own database connection, which
+is closed when the call returns, so the pool never holds connections
+between requests. Off (the default, and under tests, where other threads
+cannot see the test transaction), the calls run one after another in the
+request thread.
+"""
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+ENABLED = getattr(settings, 'GBV_PARALLEL_QUERIES', False)
+THREADS = getattr(settings, 'GBV_PARALLEL_QUERY_THREADS', 4)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix='gbv-query')
+    return _executor
+
+
+def _run(func, args):
+    try:
+        return func(*args)
+    finally:
+        connections.close_all()
+
+
+def gather(*calls):
+    """Results of (func, *args) calls, in order"""
+    if not ENABLED or len(calls) < 2:
+        return [func(*args) for func, *args in calls]
+    # Each call carries the request's context (e.g. its metrics query counter)
+    futures = [
+        _get_executor().submit(contextvars.copy_context().run, _run, func, args)
+        for func, *args in calls
+    ]
+    return [future.result() for future in futures]
@@ -0,0 +1,186 @@
+"""
+Appointment reminders.
+
+A reminder is due offset minutes before a scheduled/confirmed appointment
+and is only sent while the appointment is still ahead. Sending is
+claim-then-send. The run inserts AppointmentReminder rows under its own
+batch id, ignoring conflicts, so only the rows it inserted are its own;
+it emails those in one batch and stamps sent_at on the ones delivered (or
+no longer worth sending). Claims whose email failed, or whose appointment
+moved so they are not due yet, are deleted again so a later run retries
+them. A claim that never got sent_at (the process died mid-send) is taken
+over after STALE_CLAIM_MINUTES. Moving an appointment resets its
+reminders that are not yet due for the new time.
+
+Because due reminders are derived from appointments and the claim table,
+a run after downtime naturally catches up on everything still relevant.
+ReminderScheduler keeps a heap of upcoming reminder times for the
+long-running mode, so it wakes only when something is due.
+"""
+import heapq
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Appointment, AppointmentReminder
+from .send_mails import GBVEmailService
+
+REMINDER_OFFSETS = tuple(getattr(settings, 'APPOINTMENT_REMINDER_OFFSETS_MINUTES', (24 * 60, 60)))
+ACTIVE_STATUSES = ('scheduled', 'confirmed')
+STALE_CLAIM_MINUTES = 10
+
+
+def _upcoming(now, until):
+    return Appointment.objects.filter(
+        status__in=ACTIVE_STATUSES,
+        scheduled_date__gt=now,
+        scheduled_date__lte=until,
+        report__is_deleted=False,
+    )
+
+
+def due_reminders(now=None):
+    """(appointment_id, offset) pairs whose reminder time has passed and that were never claimed"""
+    now = now or timezone.now()
+    due = []
+    for offset in REMINDER_OFFSETS:
+        appointment_ids = _upcoming(now, now + timedelta(minutes=offset)).exclude(
+            reminders__offset_minutes=offset
+        ).values_list('pk', flat=True)
+        due.extend((appointment_id, offset) for appointment_id in appointment_ids)
+    return due
+
+
+def _claim(pairs, now):
+    """Claim reminders for this run; returns the claimed AppointmentReminder rows"""
+    batch_id = uuid.uuid4()
+    with transaction.atomic():
+        AppointmentReminder.objects.bulk_create([
+            AppointmentReminder(appointment_id=appointment_id, offset_minutes=offset,
+                                batch_id=batch_id, claimed_at=now)
+            for appointment_id, offset in pairs
+        ], ignore_conflicts=True)
+        # Take over claims from runs that died before sending
+        AppointmentReminder.objects.filter(
+            sent_at__isnull=True,
+            claimed_at__lt=now - timedelta(minutes=STALE_CLAIM_MINUTES),
+        ).update(batch_id=batch_id, claimed_at=now)
+    return list(
+        AppointmentReminder.objects.filter(batch_id=batch_id, sent_at__isnull=True)
+        .select_related('appointment__report__reporter', 'appointment__professional')
+    )
+
+
+def send_reminders(pairs, now=None):
+    """Claim and send the given reminders in one email batch; returns the count sent"""
+    now = now or timezone.now()
+    claimed = _claim(pairs, now)
+    # Re-check: the appointment may have moved or been cancelled since
+    not_due = {
+        reminder.pk for reminder in claimed
+        if reminder.appointment.scheduled_date - timedelta(minutes=reminder.offset_minutes) > now
+    }
+    to_send = [
+        reminder for reminder in claimed
+        if reminder.appointment.status in ACTIVE_STATUSES
+        and reminder.appointment.scheduled_date > now
+        and not reminder.appointment.report.is_deleted
+        and reminder.pk not in not_due
+    ]
+    # After downtime several offsets can be due at once; only the closest one is worth sending
+    closest = {}
+    for reminder in to_send:
+        current = closest.get(reminder.appointment_id)
+        if current is None or reminder.offset_minutes < current.offset_minutes:
+            closest[reminder.appointment_id] = reminder
+    to_send = list(closest.values())
+    queued = []
+    with GBVEmailService.batched() as batch:
+        for reminder in to_send:
+            start = len(batch)
+            GBVEmailService.send_appointment_reminder_notification(
+                reminder.appointment, reminder.offset_minutes
+            )
+            queued.append((reminder, start, len(batch)))
+    # None when an outer batch owns the sending; count what was queued as sent
+    delivered = batch.delivered
+    failed = [
+        reminder for reminder, start, end in queued
+        if start == end or (delivered is not None and not all(delivered[start:end]))
+    ]
+    release = not_due | {reminder.pk for reminder in failed}
+    AppointmentReminder.objects.filter(pk__in=release).delete()
+    AppointmentReminder.objects.filter(
+        pk__in=[reminder.pk for reminder in claimed if reminder.pk not in release]
+    ).update(sent_at=timezone.now())
+    return len(to_send) - len(failed)
+
+
+def reset(appointment, now=None):
+    """Forget a moved appointment's reminders that are unsent or not yet due for its new time"""
+    now = now or timezone.now()
+    minutes_ahead = (appointment.scheduled_date - now).total_seconds() / 60
+    AppointmentReminder.objects.filter(appointment=appointment).filter(
+        Q(sent_at__isnull=True) | Q(offset_minutes__lt=minutes_ahead)
+    ).delete()
+
+
+def run_once(now=None):
+    """Send everything currently due; cheap enough to run every minute"""
+    now = now or timezone.now()
+    due = due_reminders(now)
+    stale = AppointmentReminder.objects.filter(
+        sent_at__isnull=True, claimed_at__lt=now - timedelta(minutes=STALE_CLAIM_MINUTES)
+    ).exists()
+    if not due and not stale:
+        return 0
+    return send_reminders(due, now)
+
+
+class ReminderScheduler:
+    """Heap of (remind_at, appointment_id, offset) for the next horizon"""
+
+    def __init__(self, horizon=timedelta(hours=1)):
+        self.horizon = horizon
+        self.heap = []
+        self.loaded_until = None
+
+    def load(self, now):
+        self.heap = []
+        until = now + self.horizon
+        max_offset = timedelta(minutes=max(REMINDER_OFFSETS))
+        rows = _upcoming(now, until + max_offset).values_list('pk', 'scheduled_date')
+        sent = set(AppointmentReminder.objects.filter(
+            appointment__in=[pk for pk, _ in rows]
+        ).values_list('appointment_id', 'offset_minutes'))
+        for appointment_id, scheduled_date in rows:
+            for offset in REMINDER_OFFSETS:
+                remind_at = scheduled_date - timedelta(minutes=offset)
+                if remind_at <= until and (appointment_id, offset) not in sent:
+                    self.heap.append((remind_at, appointment_id, offset))
+        heapq.heapify(self.heap)
+        self.loaded_until = until
+
+    def pop_due(self, now):
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            _, appointment_id, offset = heapq.heappop(self.heap)
+            due.append((appointment_id, offset))
+        return due
+
+    def seconds_until_next(self, now, cap=60):
+        """Sleep until the next reminder, but at most cap so new bookings are picked up"""
+        if not self.heap:
+            return cap
+        return max(0.0, min(cap, (self.heap[0][0] - now).total_seconds()))
+
+    def tick(self, now=None, refresh=timedelta(minutes=1)):
+        now = now or timezone.now()
+        if self.loaded_until is None or now + self.horizon - refresh >= self.loaded_until:
+            self.load(now)
+        due = self.pop_due(now)
+        return send_reminders(due, now) if due else 0
@@ -0,0 +1,148 @@
+"""
+Incremental report rollups (ReportRollup) for the analytics endpoint.
+
+Every live report contributes to exactly one rollup row: the week it was
+reported in, its incident type, status and gazetteer location (null when
+its incident location is unmatched). Rows are keyed by location id, so
+renaming a location moves nothing; names are looked up when the rollups
+are read. When a report is
+saved, its old contribution is subtracted and the new one added, so the
+rollups always add up to the report table without ever scanning it.
+Bulk updates bypass signals and must call apply_changes() themselves.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import locations
+from .models import GBVReport, ReportRollup
+
+KEY_FIELDS = ('week', 'incident_type', 'status', 'location')
+# The columns holding a key
+KEY_COLUMNS = ('week', 'incident_type', 'status', 'location_id')
+# Report fields a contribution depends on
+SOURCE_FIELDS = ('date_reported', 'incident_type', 'status', 'location', 'is_deleted', 'resolved_at')
+
+
+def week_of(moment):
+    day = timezone.localtime(moment).date()
+    return day - timedelta(days=day.weekday())
+
+
+def contribution(report):
+    """Return (key, (count, timed, seconds)) for a report, or None if it doesn't count"""
+    if report is None or report.is_deleted or report.date_reported is None:
+        return None
+    key = (week_of(report.date_reported), report.incident_type, report.status, report.location_id)
+    if report.status == 'resolved' and report.resolved_at:
+        seconds = max(0, int((report.resolved_at - report.date_reported).total_seconds()))
+        return key, (1, 1, seconds)
+    return key, (1, 0, 0)
+
+
+def previous_state(report):
+    """The stored version of a report, loaded with only the fields the save signals need"""
+    return GBVReport.all_objects.only(*SOURCE_FIELDS, 'incident_location').filter(pk=report.pk).first()
+
+
+def diff(changes):
+    """Sum the deltas of (before, after) report pairs by rollup key"""
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for before, after in changes:
+        for item, sign in ((contribution(before), -1), (contribution(after), 1)):
+            if item is None:
+                continue
+            key, values = item
+            for i, value in enumerate(values):
+                deltas[key][i] += sign * value
+    return {key: values for key, values in deltas.items() if any(values)}
+
+
+def add_counts(model, lookup, **counts):
+    """Add counts to the counter row matching lookup, creating it if needed"""
+    increments = {field: F(field) + value for field, value in counts.items()}
+    if model.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **counts)
+    except IntegrityError:
+        # Another writer created the row first
+        model.objects.filter(**lookup).update(**increments)
+
+
+def apply_changes(changes):
+    """Apply (before, after) pairs; before is None for new reports, after None for removed ones"""
+    deltas = diff(changes)
+    if not deltas:
+        return
+    with transaction.atomic():
+        # None (unmatched) sorts first
+        for key in sorted(deltas, key=lambda key: (*key[:3], key[3] or 0)):
+            count, timed, seconds = deltas[key]
+            add_counts(ReportRollup, dict(zip(KEY_COLUMNS, key)), report_count=count,
+                       timed_count=timed, resolution_seconds=seconds)
+
+
+def rebuild(chunk_size=2000):
+    """Recompute every rollup from the report table; returns the number of rows written"""
+    totals = defaultdict(lambda: [0, 0, 0])
+    reports = GBVReport.objects.only(*SOURCE_FIELDS).order_by().iterator(chunk_size=chunk_size)
+    for report in reports:
+        key, values = contribution(report)
+        for i, value in enumerate(values):
+            totals[key][i] += value
+    with transaction.atomic():
+        ReportRollup.objects.all().delete()
+        ReportRollup.objects.bulk_create([
+            ReportRollup(**dict(zip(KEY_COLUMNS, key)), report_count=count,
+                         timed_count=timed, resolution_seconds=seconds)
+            for key, (count, timed, seconds) in totals.items()
+        ], batch_size=chunk_size)
+    return len(totals)
+
+
+def clear_location(location_id):
+    """Move a location's counts to the unmatched rows, as its reports lose their location"""
+    with transaction.atomic():
+        rows = ReportRollup.objects.filter(location_id=location_id)
+        for row in rows:
+            add_counts(ReportRollup, {'week': row.week, 'incident_type': row.incident_type,
+                                      'status': row.status, 'location_id': None},
+                       report_count=row.report_count, timed_count=row.timed_count,
+                       resolution_seconds=row.resolution_seconds)
+        rows.delete()
+
+
+def summarize(start=None, end=None, group_by=(), filters=None):
+    """
+    Aggregate rollups between the weeks containing start and end (dates),
+    grouped by any of KEY_FIELDS. Cost depends on the number of rollup
+    rows in range, not on the number of reports.
+    """
+    rollups = ReportRollup.objects.filter(**(filters or {}))
+    if start:
+        rollups = rollups.filter(week__gte=start - timedelta(days=start.weekday()))
+    if end:
+        rollups = rollups.filter(week__lte=end)
+    sums = {
+        'count': Sum('report_count'),
+        'timed': Sum('timed_count'),
+        'seconds': Sum('resolution_seconds'),
+    }
+    if group_by:
+        rows = rollups.values(*group_by).annotate(**sums).filter(count__gt=0).order_by(*group_by)
+    else:
+        rows = [{key: value or 0 for key, value in rollups.aggregate(**sums).items()}]
+
+    groups = []
+    for row in rows:
+        if 'location' in row:
+            row['location'] = locations.name_for(row['location']) if row['location'] else None
+        timed, seconds = row.pop('timed'), row.pop('seconds')
+        row['avg_resolution_hours'] = round(seconds / timed / 3600, 2) if timed else None
+        groups.append(row)
+    return groups
@@ -1,16 +1,74 @@
 # email_service.py
-from django.core.mail import EmailMultiAlternatives
+import threading
+import time
+from contextlib import contextmanager
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 from django.utils import timezone
-from reports.models import GBVReport
 from django.conf import settings
 from django.utils.html import strip_tags
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+
+from gbv_project import metrics
+
+# Emails queued by GBVEmailService.batched() on the current thread
+_batch = threading.local()
+
+
+class EmailBatch(list):
+    """Emails queued by batched(); delivered is filled with one bool per email once they are sent"""
+    delivered = None
+
 
 class GBVEmailService:
     """Service class for sending GBV system notifications"""
     
+    @staticmethod
+    @contextmanager
+    def batched():
+        """
+        Queue the notification emails sent inside the block and deliver them
+        together over a single SMTP connection when the block exits. Yields
+        the EmailBatch; inside an outer block it is the outer one, which is
+        only sent when that block exits.
+        """
+        if getattr(_batch, 'emails', None) is not None:
+            # Already batching further up the stack
+            yield _batch.emails
+            return
+        _batch.emails = EmailBatch()
+        try:
+            yield _batch.emails
+        finally:
+            emails, _batch.emails = _batch.emails, None
+            emails.delivered = GBVEmailService.send_batch(emails)
+    
+    @staticmethod
+    def send_batch(emails):
+        """Send prepared emails over one connection; returns whether each one went out"""
+        if not emails:
+            return []
+        start = time.perf_counter()
+        delivered = []
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception:
+            delivered = [False] * len(emails)
+        else:
+            try:
+                for email in emails:
+                    try:
+                        delivered.append(bool(connection.send_messages([email])))
+                    except Exception:
+                        delivered.append(False)
+            finally:
+                connection.close()
+        sent = sum(delivered)
+        metrics.observe('gbv_email_send_duration_seconds', time.perf_counter() - start, mode='batch')
+        metrics.inc('gbv_emails_total', sent, result='sent')
+        metrics.inc('gbv_emails_total', len(emails) - sent, result='failed')
+        return delivered
+    
     @staticmethod
     def send_report_assigned_notification(report, professional, assigned_by=None):
         """Send notification when report is assigned to a professional"""
@@ -77,6 +135,38 @@ class GBVEmailService:
             context=context
         )
     
+    @staticmethod
+    def send_appointment_reminder_notification(appointment, minutes_before):
+        """Send a reminder ahead of an upcoming appointment"""
+        
+        if minutes_before >= 24 * 60 and minutes_before % (24 * 60) == 0:
+            days = minutes_before // (24 * 60)
+            lead_time = f'{days} day{"s" if days != 1 else ""}'
+        elif minutes_before >= 60 and minutes_before % 60 == 0:
+            hours = minutes_before // 60
+            lead_time = f'{hours} hour{"s" if hours != 1 else ""}'
+        else:
+            lead_time = f'{minutes_before} minutes'
+        scheduled = timezone.localtime(appointment.scheduled_date)
+        
+        context = {
+            'report': appointment.report,
+            'notification_title': 'Appointment Reminder',
+            'action_title': f'Your Appointment Is in {lead_time}',
+            'action_message': f'This is a reminder of your appointment on {scheduled.strftime("%B %d, %Y at %I:%M %p")}.',
+            'action_button_url': f'{settings.FRONTEND_URL}/appointments/{appointment.id}',
+            'action_button_text': 'View Appointment Details',
+            'appointment_date': appointment.scheduled_date,
+            'additional_info': f'Professional: {appointment.professional.get_full_name()}\nLocation: {"Virtual" if appointment.is_virtual else appointment.location}\nType: {appointment.get_appointment_type_display()}',
+            'system_contact': getattr(settings, 'SUPPORT_EMAIL', 'support@example.com')
+        }
+        
+        return GBVEmailService._send_notification_email(
+            report=appointment.report,
+            subject=f'Appointment Reminder - Report #{appointment.report.reference_code}',
+            context=context
+        )
+    
     @staticmethod
     def send_appointment_status_update_notification(appointment, old_status):
         """Send notification when appointment status is updated"""
@@ -208,8 +298,17 @@ class GBVEmailService:
             # Attach the HTML version
             email.attach_alternative(html_content, "text/html")
             
+            queue = getattr(_batch, 'emails', None)
+            if queue is not None:
+                queue.append(email)
+                metrics.inc('gbv_emails_total', result='queued')
+                return {'success': True, 'message': 'Email queued'}
+            
             # Send the email
+            start = time.perf_counter()
             result = email.send()
+            metrics.observe('gbv_email_send_duration_seconds', time.perf_counter() - start, mode='single')
+            metrics.inc('gbv_emails_total', result='sent' if result > 0 else 'failed')
             
             return {
                 'success': result > 0,
@@ -217,13 +316,8 @@ class GBVEmailService:
             }
             
         except Exception as e:
+            metrics.inc('gbv_emails_total', result='failed')
             return {
                 'success': False,
                 'message': f'Error sending email: {str(e)}'
             }
-
-@receiver(post_save, sender=GBVReport)
-def send_report_confirmation(sender, instance, created, **kwargs):
-    """Send confirmation email when a new report is created"""
-    if created:
-        GBVEmailService.send_report_received_confirmation(instance)
\ No newline at end of file
@@ -1,13 +1,16 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
-from reports.models import GBVReport, Appointment, CaseAssignment, CaseNote, Document
+from django.urls import reverse
+from reports.models import GBVReport, Appointment, CaseAssignment, CaseNote, Document, ArchivedGBVReport, TriageEntry, AccessLog, WebhookEndpoint, WebhookDelivery
+from reports.availability import MAX_DURATION_MINUTES
+from reports.mixins import SparseFieldsSerializerMixin, UserSummarySerializer, ReportSummarySerializer
 import string
 import random
 
 User = get_user_model()
 
-class GBVReportSerializer(serializers.ModelSerializer):
+class GBVReportSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     # Read-only (for displaying reporter info)
     full_name = serializers.CharField(source='reporter.get_full_name', read_only=True)
     email = serializers.EmailField(source='reporter.email', read_only=True)
@@ -21,6 +24,11 @@ class GBVReportSerializer(serializers.ModelSerializer):
     reporter_last_name = serializers.CharField(write_only=True)
     reporter_phone = serializers.CharField(write_only=True)
 
+    expandable_fields = {
+        'reporter': (UserSummarySerializer, 'reporter'),
+        'assigned_to': (UserSummarySerializer, 'assigned_to'),
+    }
+
     class Meta:
         model = GBVReport
         fields = '__all__'
@@ -58,42 +66,120 @@ class GBVReportSerializer(serializers.ModelSerializer):
         return GBVReport.objects.create(reporter=user, **validated_data)
 
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     professional_name = serializers.CharField(source='professional.get_full_name', read_only=True)
     report_reference = serializers.CharField(source='report.reference_code', read_only=True)
     
+    expandable_fields = {
+        'report': (ReportSummarySerializer, 'report'),
+        'professional': (UserSummarySerializer, 'professional'),
+    }
+
     class Meta:
         model = Appointment
         fields = '__all__'
         extra_kwargs = { 'professional': {'required': False} }
         read_only_fields = ['created_at', 'updated_at']
 
-class CaseNoteSerializer(serializers.ModelSerializer):
+    def validate_duration_minutes(self, value):
+        if not 0 < value <= MAX_DURATION_MINUTES:
+            raise serializers.ValidationError(f"Duration must be between 1 and {MAX_DURATION_MINUTES} minutes")
+        return value
+
+class CaseNoteSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     report_reference = serializers.CharField(source='report.reference_code', read_only=True)
     
+    expandable_fields = {
+        'report': (ReportSummarySerializer, 'report'),
+        'created_by': (UserSummarySerializer, 'created_by'),
+    }
+
     class Meta:
         model = CaseNote
         fields = '__all__'
         read_only_fields = ['created_by', 'created_at']
 
-class DocumentSerializer(serializers.ModelSerializer):
+class DocumentSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     uploaded_by_name = serializers.CharField(source='uploaded_by.get_full_name', read_only=True)
     report_reference = serializers.CharField(source='report.reference_code', read_only=True)
+    # Files are only served through the audited download action
+    file = serializers.FileField(write_only=True)
+    download_url = serializers.SerializerMethodField()
     
+    expandable_fields = {
+        'report': (ReportSummarySerializer, 'report'),
+        'uploaded_by': (UserSummarySerializer, 'uploaded_by'),
+    }
+
     class Meta:
         model = Document
         fields = '__all__'
         read_only_fields = ['uploaded_by', 'uploaded_at']
 
+    def get_download_url(self, obj) -> str:
+        url = reverse('document-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
 
-class CaseAssignmentSerializer(serializers.ModelSerializer):
+class CaseAssignmentSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     professional_name = serializers.CharField(source='professional.get_full_name', read_only=True)
     professional_role = serializers.CharField(source='professional.role', read_only=True)
     assigned_by_name = serializers.CharField(source='assigned_by.get_full_name', read_only=True)
     report_reference = serializers.CharField(source='report.reference_code', read_only=True)
     
+    expandable_fields = {
+        'report': (ReportSummarySerializer, 'report'),
+        'professional': (UserSummarySerializer, 'professional'),
+        'assigned_by': (UserSummarySerializer, 'assigned_by'),
+    }
+
     class Meta:
         model = CaseAssignment
         fields = '__all__'
-        read_only_fields = ['assigned_by', 'assigned_date']
\ No newline at end of file
+        read_only_fields = ['assigned_by', 'assigned_date']
+
+
+class ArchivedGBVReportSerializer(serializers.ModelSerializer):
+    full_name = serializers.CharField(source='reporter.get_full_name', read_only=True)
+    appointments_count = serializers.IntegerField(source='appointments.count', read_only=True)
+    notes_count = serializers.IntegerField(source='case_notes.count', read_only=True)
+    documents_count = serializers.IntegerField(source='documents.count', read_only=True)
+
+    class Meta:
+        model = ArchivedGBVReport
+        fields = '__all__'
+
+
+class TriageEntrySerializer(serializers.ModelSerializer):
+    report = GBVReportSerializer(read_only=True)
+    claimed_by_name = serializers.CharField(source='claimed_by.get_full_name', read_only=True)
+
+    class Meta:
+        model = TriageEntry
+        fields = '__all__'
+
+class AccessLogSerializer(serializers.ModelSerializer):
+    user_name = serializers.CharField(source='user.get_full_name', read_only=True)
+
+    class Meta:
+        model = AccessLog
+        fields = '__all__'
+
+class WebhookEndpointSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WebhookEndpoint
+        fields = '__all__'
+        read_only_fields = ['secret', 'created_at', 'consecutive_failures', 'circuit_open_until']
+
+    def validate_events(self, value):
+        known = {event_type for event_type, _ in WebhookEndpoint.EVENT_CHOICES}
+        if not isinstance(value, list) or not set(value) <= known:
+            raise serializers.ValidationError(f"Choose from {', '.join(sorted(known))}")
+        return value
+
+class WebhookDeliverySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WebhookDelivery
+        exclude = ['claimed_by', 'claimed_at']
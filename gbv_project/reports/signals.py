@@ -0,0 +1,176 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import events, heatmap, locations, rollups, sync, triage, webhooks
+from .models import GBVReport, CaseNote, Appointment, CaseAssignment, Document, Location, LocationAlias, WebhookEndpoint
+
+
+@receiver(post_save, sender=GBVReport)
+def update_triage_queue(sender, instance, raw=False, **kwargs):
+    """Keep the report's triage entry in step with its status and flags"""
+    if not raw:
+        triage.sync_report(instance)
+
+
+@receiver(pre_save, sender=GBVReport)
+def remember_stored_state(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Load the stored report so its old rollup and heatmap counts can be subtracted"""
+    instance._stored_state = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(rollups.SOURCE_FIELDS):
+        instance._stored_state = False
+        return
+    instance._stored_state = rollups.previous_state(instance)
+
+
+@receiver(pre_save, sender=GBVReport)
+def resolve_location(sender, instance, raw=False, **kwargs):
+    """Match a new or changed incident location against the gazetteer"""
+    before = getattr(instance, '_stored_state', None)
+    if raw or before is False:
+        return
+    if before is None or before.incident_location != instance.incident_location:
+        instance.location_id = locations.resolve(instance.incident_location, record_unmatched=True)
+
+
+@receiver(post_save, sender=GBVReport)
+def update_rollups(sender, instance, raw=False, **kwargs):
+    """Move the report's count to its new week/type/status/location rollup"""
+    before = getattr(instance, '_stored_state', None)
+    if raw or before is False:
+        return
+    rollups.apply_changes([(before, instance)])
+
+
+@receiver(post_save, sender=GBVReport)
+def update_heatmap(sender, instance, raw=False, **kwargs):
+    """Move the report's count to the heatmap cells of its location"""
+    before = getattr(instance, '_stored_state', None)
+    if raw or before is False:
+        return
+    heatmap.apply_changes([(before, instance)])
+
+
+@receiver(post_save, sender=GBVReport)
+@receiver(post_save, sender=CaseNote)
+@receiver(post_save, sender=Appointment)
+@receiver(post_save, sender=CaseAssignment)
+def publish_case_event(sender, instance, created, raw=False, **kwargs):
+    """Push saves to subscribers of the server-sent events stream"""
+    if not raw:
+        events.publish_model_event(instance, created)
+
+
+@receiver(post_save, sender=GBVReport)
+@receiver(post_save, sender=CaseNote)
+@receiver(post_save, sender=Appointment)
+@receiver(post_save, sender=Document)
+@receiver(post_save, sender=CaseAssignment)
+def record_sync_change(sender, instance, created, raw=False, **kwargs):
+    """Add the save to the delta sync feed of everyone who can see it"""
+    if not raw:
+        sync.record(instance, created)
+
+
+@receiver(post_save, sender=GBVReport)
+def queue_report_webhooks(sender, instance, created, raw=False, **kwargs):
+    """Queue report.created and report.status_changed for partner endpoints"""
+    if raw:
+        return
+    if created:
+        webhooks.publish('report.created', [webhooks.report_data(instance)])
+        return
+    before = getattr(instance, '_stored_state', None)
+    if before and before.status != instance.status:
+        webhooks.publish('report.status_changed', [webhooks.status_changed_data(instance, before.status)])
+
+
+@receiver(post_save, sender=GBVReport)
+def send_report_confirmation(sender, instance, created, raw=False, **kwargs):
+    """Email the reporter that their report was received"""
+    if created and not raw:
+        # Imported on first use, not at startup: it loads the mail and template machinery
+        from .send_mails import GBVEmailService
+        GBVEmailService.send_report_received_confirmation(instance)
+
+
+@receiver(post_save, sender=CaseAssignment)
+def queue_assignment_webhook(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        webhooks.publish('report.assigned', [webhooks.assigned_data(instance)])
+
+
+@receiver(post_save, sender=Appointment)
+def queue_appointment_webhook(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        webhooks.publish('appointment.scheduled', [webhooks.appointment_data(instance)])
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_scheduled_date(sender, instance, raw=False, **kwargs):
+    stored = None if raw or instance._state.adding else (
+        Appointment.objects.filter(pk=instance.pk).values_list('scheduled_date', flat=True).first()
+    )
+    instance._stored_scheduled_date = stored
+
+
+@receiver(post_save, sender=Appointment)
+def reset_reminders(sender, instance, raw=False, **kwargs):
+    """Let a moved appointment's reminders go out again for its new time"""
+    stored = getattr(instance, '_stored_scheduled_date', None)
+    if not raw and stored is not None and stored != instance.scheduled_date:
+        # Imported on first use, not at startup: it loads the mail machinery
+        from . import reminders
+        reminders.reset(instance)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=LocationAlias)
+@receiver(post_delete, sender=LocationAlias)
+def invalidate_gazetteer(sender, **kwargs):
+    """Have every process rebuild its location index"""
+    locations.invalidate()
+
+
+@receiver(post_save, sender=WebhookEndpoint)
+@receiver(post_delete, sender=WebhookEndpoint)
+def invalidate_webhook_subscriptions(sender, update_fields=None, **kwargs):
+    """Have every process reload which endpoints take which events"""
+    if update_fields and not {'events', 'is_active'} & set(update_fields):
+        return
+    webhooks.invalidate_subscriptions()
+    # Again once committed, in case another process reloaded the old rows meanwhile
+    transaction.on_commit(webhooks.invalidate_subscriptions)
+
+
+def _coordinates(location):
+    if location is None or location.latitude is None or location.longitude is None:
+        return None
+    return float(location.latitude), float(location.longitude)
+
+
+@receiver(pre_save, sender=Location)
+def remember_coordinates(sender, instance, raw=False, **kwargs):
+    stored = None if raw or instance._state.adding else Location.objects.filter(pk=instance.pk).first()
+    instance._stored_coordinates = _coordinates(stored)
+
+
+@receiver(post_save, sender=Location)
+def move_heatmap_counts(sender, instance, raw=False, **kwargs):
+    """Re-place the location's reports on the heatmap when it is moved"""
+    if not raw:
+        heatmap.move_location(instance.pk, getattr(instance, '_stored_coordinates', None), _coordinates(instance))
+
+
+@receiver(pre_delete, sender=Location)
+def remove_heatmap_counts(sender, instance, **kwargs):
+    # Before the reports' location is set to NULL
+    heatmap.move_location(instance.pk, _coordinates(instance), None)
+
+
+@receiver(pre_delete, sender=Location)
+def move_rollups_to_unmatched(sender, instance, **kwargs):
+    rollups.clear_location(instance.pk)
@@ -0,0 +1,222 @@
+"""
+Delta sync for mobile and offline clients.
+
+Every insert, update and delete of a report, appointment, case note,
+document or assignment is written to ChangeLog in the same transaction as
+the change itself, one row per user who can see the object at that moment
+(the rules of the list views) plus one row for the admin feed. A client
+polls with the cursor from its last response and gets back what changed
+since, read with one range scan of the (user, id) index.
+
+Soft deletes, ended assignments and notes made confidential come back as
+'deleted'. A professional whose assignment starts also gets every object
+already on the case, and loses them again when it ends. Cursors are row ids; SQLite serialises writes, so ids are handed
+out in commit order and a poll never skips a row committed after it.
+"""
+import itertools
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import Appointment, CaseAssignment, CaseNote, ChangeLog, Document, GBVReport
+
+PAGE_SIZE = getattr(settings, 'SYNC_PAGE_SIZE', 500)
+PROFESSIONAL_ROLES = ('doctor', 'lawyer', 'counselor')
+MODELS = {
+    GBVReport: 'report',
+    Appointment: 'appointment',
+    CaseNote: 'note',
+    Document: 'document',
+    CaseAssignment: 'assignment',
+}
+
+
+def _report_id(instance):
+    return instance.pk if isinstance(instance, GBVReport) else instance.report_id
+
+
+def _audiences(report_ids):
+    """{report_id: (reporter_id, ids of the professionals on the case)}"""
+    reporters = dict(GBVReport.all_objects.filter(pk__in=report_ids).values_list('pk', 'reporter_id'))
+    professionals = defaultdict(set)
+    for report_id, professional_id in itertools.chain(
+        # all_objects: the professionals of a report being deleted still hear about it
+        CaseAssignment.all_objects.filter(report_id__in=report_ids, is_active=True)
+        .values_list('report_id', 'professional_id'),
+        Appointment.objects.filter(report_id__in=report_ids).values_list('report_id', 'professional_id'),
+    ):
+        professionals[report_id].add(professional_id)
+    return {report_id: (reporters.get(report_id), professionals[report_id]) for report_id in report_ids}
+
+
+def _recipients(instance, action, reporter_id, professional_ids):
+    """(user_id, action) pairs for a change; user_id None is the admin feed"""
+    kind = MODELS[type(instance)]
+    if kind == 'appointment':
+        users = {reporter_id, instance.professional_id}
+    elif kind == 'assignment':
+        users = {instance.professional_id}
+    else:
+        users = {reporter_id, *professional_ids}
+    recipients = [(None, action)]
+    if kind == 'note' and instance.is_confidential:
+        users.discard(reporter_id)
+        if action == 'updated':
+            # The reporter may have synced it before it was made confidential
+            recipients.append((reporter_id, 'deleted'))
+    recipients.extend((user_id, action) for user_id in users if user_id is not None)
+    return recipients
+
+
+def _case_rows(assignment_changes, audiences, now):
+    """
+    Rows putting the objects already on a case into, or taking them out of,
+    the feed of a professional whose assignment started or ended
+    """
+    grants = {}
+    for assignment, action in assignment_changes:
+        _, professional_ids = audiences[assignment.report_id]
+        if action == 'deleted' and assignment.professional_id in professional_ids:
+            # Still on the case through an appointment
+            continue
+        grants[assignment.report_id, assignment.professional_id] = action if action == 'deleted' else 'created'
+    if not grants:
+        return []
+    report_ids = {report_id for report_id, _ in grants}
+    objects = defaultdict(list)
+    for report_id in GBVReport.objects.filter(pk__in=report_ids).values_list('pk', flat=True):
+        objects[report_id].append(('report', report_id))
+    for model, queryset in (('note', CaseNote.objects), ('document', Document.objects)):
+        for pk, report_id in queryset.filter(report_id__in=report_ids).values_list('pk', 'report_id'):
+            objects[report_id].append((model, pk))
+    # Professionals only see their own appointments
+    for pk, report_id, professional_id in Appointment.objects.filter(report_id__in=report_ids).values_list(
+        'pk', 'report_id', 'professional_id'
+    ):
+        objects[report_id, professional_id].append(('appointment', pk))
+    return [
+        ChangeLog(user_id=user_id, model=model, object_id=str(pk), report_reference=report_id,
+                  action=action, changed_at=now)
+        for (report_id, user_id), action in grants.items()
+        for model, pk in objects[report_id] + objects[report_id, user_id]
+    ]
+
+
+def action_for(instance, created):
+    if getattr(instance, 'is_deleted', False) or getattr(instance, 'is_active', True) is False:
+        return 'deleted'
+    return 'created' if created else 'updated'
+
+
+def record_changes(changes):
+    """Write (instance, action) pairs to the change log"""
+    changes = [(instance, action) for instance, action in changes if type(instance) in MODELS]
+    if not changes:
+        return
+    audiences = _audiences({_report_id(instance) for instance, _ in changes})
+    now = timezone.now()
+    assignment_changes = [(instance, action) for instance, action in changes if isinstance(instance, CaseAssignment)]
+    ChangeLog.objects.bulk_create(_case_rows(assignment_changes, audiences, now) + [
+        ChangeLog(
+            user_id=user_id,
+            model=MODELS[type(instance)],
+            object_id=str(instance.pk),
+            report_reference=_report_id(instance),
+            action=user_action,
+            changed_at=now,
+        )
+        for instance, action in changes
+        for user_id, user_action in _recipients(instance, action, *audiences[_report_id(instance)])
+    ])
+
+
+def record(instance, created=False):
+    record_changes([(instance, action_for(instance, created))])
+
+
+def latest_cursor():
+    return ChangeLog.objects.aggregate(cursor=Max('id'))['cursor'] or 0
+
+
+def is_expired(cursor):
+    """Whether changes after cursor may already have been purged by retention"""
+    oldest = ChangeLog.objects.order_by('id').values_list('id', flat=True).first()
+    return oldest is not None and cursor + 1 < oldest
+
+
+def changes_for(user, cursor, limit=PAGE_SIZE):
+    """
+    The changes user can see after cursor, the latest one per object, in
+    order. Returns (rows, next cursor, has_more); each row is a
+    (model, object_id, report_reference, action) tuple.
+    """
+    feed = None if user.role == 'admin' else user.pk
+    rows = list(
+        ChangeLog.objects.filter(user_id=feed, id__gt=cursor).order_by('id')
+        .values_list('id', 'model', 'object_id', 'report_reference', 'action')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest = {}
+    for _, model, object_id, report_reference, action in rows:
+        latest.pop((model, object_id), None)
+        latest[model, object_id] = (model, object_id, report_reference, action)
+    return list(latest.values()), rows[-1][0] if rows else cursor, has_more
+
+
+def _visible_reports(user):
+    """Filter for the reports user can see, as in the list views"""
+    if user.role in PROFESSIONAL_ROLES:
+        return (Q(pk__in=CaseAssignment.objects.filter(professional=user).values('report'))
+                | Q(pk__in=Appointment.objects.filter(professional=user).values('report')))
+    return Q(reporter=user)
+
+
+def _querysets(user):
+    """
+    What a user may be sent of each model now, by the rules of the list
+    views: being in their feed only says they could see it when it changed
+    """
+    querysets = {
+        'report': GBVReport.objects.select_related('reporter', 'assigned_to'),
+        'appointment': Appointment.objects.select_related('report', 'professional'),
+        'note': CaseNote.objects.select_related('report', 'created_by'),
+        'document': Document.objects.select_related('report', 'uploaded_by'),
+        'assignment': CaseAssignment.all_objects.filter(is_active=True)
+        .select_related('report', 'professional', 'assigned_by'),
+    }
+    if user.role == 'admin':
+        return querysets
+    reports = GBVReport.objects.filter(_visible_reports(user)).values('pk')
+    if user.role in PROFESSIONAL_ROLES:
+        appointments = querysets['appointment'].filter(professional=user)
+        notes = querysets['note'].filter(report__in=reports)
+    else:
+        appointments = querysets['appointment'].filter(report__reporter=user)
+        notes = querysets['note'].filter(report__reporter=user, is_confidential=False)
+    return {
+        'report': querysets['report'].filter(_visible_reports(user)),
+        'appointment': appointments,
+        'note': notes,
+        'document': querysets['document'].filter(report__in=reports),
+        'assignment': querysets['assignment'].filter(professional=user, report__is_deleted=False),
+    }
+
+
+def load_objects(user, rows):
+    """
+    {(model, object_id): instance} for the rows that are not deletions and
+    that user can still see; the caller sends the rest as deletions
+    """
+    wanted = defaultdict(list)
+    for model, object_id, _, action in rows:
+        if action != 'deleted':
+            wanted[model].append(object_id)
+    querysets = _querysets(user)
+    return {
+        (model, str(pk)): instance
+        for model, object_ids in wanted.items()
+        for pk, instance in querysets[model].in_bulk(object_ids).items()
+    }
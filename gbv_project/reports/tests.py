@@ -1,3 +1,1102 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, connection
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from gbv_project import metrics, profiling
+
+from accounts import directory
+from accounts.models import User
+from . import archiving, audit, auto_assign, availability, bulk, events, heatmap, lifecycle, locations, parallel, reminders, rollups, triage, webhooks
+from .brokers import InProcessBroker
+from .models import (
+    AccessLog, Appointment, AppointmentReminder, ArchivedAppointment, ArchivedCaseNote, ArchivedDocument, ArchivedGBVReport, CaseAssignment, CaseNote, ChangeLog, Document, GBVReport, HeatmapCell, IdempotencyRecord, Location, LocationAlias, ReportRollup,
+    ReportStatusChange, TriageEntry, UnmatchedLocation, WebhookDelivery, WebhookEndpoint,
+)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class GBVTestCase(TestCase):
+    """Users and a clean cache for every test; the gazetteer index lives in the cache"""
+
+    def setUp(self):
+        cache.clear()
+        locations._local_index.update(version=None, index=None)
+        directory._local_snapshot.update(version=None, etag=None, rows=())
+        webhooks._local_subscriptions.update(version=None, endpoints={})
+        # Keep test requests out of the workers' metrics files
+        for name, value in (('registry', metrics.Registry()), ('METRICS_DIR', None)):
+            patcher = mock.patch.object(metrics, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.admin = User.objects.create_user('admin@example.com', 'pass', role='admin', is_staff=True)
+        self.survivor = User.objects.create_user('survivor@example.com', 'pass', role='survivor')
+        self.doctor = User.objects.create_user('doctor@example.com', 'pass', role='doctor')
+        self.lawyer = User.objects.create_user('lawyer@example.com', 'pass', role='lawyer')
+
+    def tearDown(self):
+        # Write buffered access logs while the test database still exists
+        audit.flush()
+
+    def create_report(self, **fields):
+        defaults = {
+            'reporter': self.survivor,
+            'incident_location': 'Nairobi',
+            'incident_type': 'physical',
+            'description': 'Test incident',
+        }
+        return GBVReport.objects.create(**{**defaults, **fields})
+
+    def authenticate(self, user):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(user).access_token}'
+
+
+class LocationResolutionTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        self.nairobi = Location.objects.create(name='Nairobi', key='nairobi')
+        LocationAlias.objects.create(location=self.nairobi, key='nbi')
+
+    def test_known_spellings_resolve(self):
+        self.assertEqual(self.create_report(incident_location='NAIROBI ').location_id, self.nairobi.pk)
+        self.assertEqual(self.create_report(incident_location='nbi').location_id, self.nairobi.pk)
+        self.assertEqual(self.create_report(incident_location='Nairobbi').location_id, self.nairobi.pk)
+
+    def test_unknown_place_is_not_added_to_the_gazetteer(self):
+        report = self.create_report(incident_location='Behind the blue house on Mama Ngina St')
+        self.assertIsNone(report.location_id)
+        self.assertEqual(Location.objects.count(), 1)
+        self.assertEqual(LocationAlias.objects.count(), 1)
+        self.assertTrue(UnmatchedLocation.objects.filter(key='behind the blue house on mama ngina st').exists())
+
+    def test_close_spelling_is_not_saved_as_an_alias(self):
+        self.create_report(incident_location='Nairobbi')
+        self.assertFalse(LocationAlias.objects.filter(key='nairobbi').exists())
+        self.assertFalse(UnmatchedLocation.objects.exists())
+
+    def test_repeated_unmatched_spelling_is_recorded_once(self):
+        self.create_report(incident_location='Kibera Drive 7')
+        self.create_report(incident_location='kibera drive 7')
+        self.assertEqual(UnmatchedLocation.objects.count(), 1)
+
+    def test_location_is_resolved_again_only_when_it_changes(self):
+        report = self.create_report(incident_location='Somewhere unlisted')
+        with mock.patch.object(locations, 'resolve', wraps=locations.resolve) as resolve:
+            report.status = 'under_review'
+            report.save()
+            resolve.assert_not_called()
+            report.incident_location = 'nbi'
+            report.save(update_fields=['incident_location'])
+        resolve.assert_called_once_with('nbi', record_unmatched=True)
+        report.refresh_from_db()
+        self.assertEqual(report.location_id, self.nairobi.pk)
+
+    def test_autocomplete_only_offers_reviewed_locations(self):
+        Location.objects.create(name='Nakuru', key='nakuru', is_reviewed=False)
+        response = self.client.get('/api/locations/autocomplete/', {'q': 'na'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['name'] for entry in response.json()], ['Nairobi'])
+
+
+@mock.patch.object(heatmap, 'MIN_CELL_COUNT', 3)
+class HeatmapTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        Location.objects.create(name='Nairobi', key='nairobi', latitude='-1.29', longitude='36.82')
+        Location.objects.create(name='Lagos', key='lagos', latitude='6.52', longitude='3.38')
+        for _ in range(3):
+            self.create_report(incident_type='physical')
+        self.create_report(incident_type='sexual')
+        self.create_report(incident_location='Lagos', incident_type='online')
+
+    def counts(self, user):
+        self.authenticate(user)
+        response = self.client.get('/api/heatmap/0/0/0/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [dict(zip(data['types'], cell[2:])) for cell in data['cells']]
+
+    def test_small_counts_are_suppressed_per_incident_type(self):
+        [nairobi] = self.counts(self.doctor)
+        # Three physical reports do not reveal the single sexual one
+        self.assertEqual((nairobi['physical'], nairobi['sexual']), (3, 0))
+
+    def test_admins_see_every_count(self):
+        cells = self.counts(self.admin)
+        self.assertEqual(len(cells), 2)
+        self.assertIn(1, [cell['sexual'] for cell in cells])
+        self.assertIn(1, [cell['online'] for cell in cells])
+
+
+class SparseFieldsTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        User.objects.filter(pk=self.survivor.pk).update(first_name='Amina', last_name='Otieno')
+        self.create_report(), self.create_report()
+        self.authenticate(self.admin)
+
+    def list_reports(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/reports/', params)
+        self.assertEqual(response.status_code, 200)
+        [report_query] = [query['sql'] for query in queries if 'reports_gbvreport' in query['sql']]
+        return response.json(), report_query
+
+    def test_fields_narrow_the_query(self):
+        reports, sql = self.list_reports(fields='reference_code,full_name')
+        self.assertEqual([set(report) for report in reports], [{'reference_code', 'full_name'}] * 2)
+        self.assertEqual(reports[0]['full_name'], 'Amina Otieno')
+        # get_full_name's columns come in through the join, and nothing else
+        self.assertIn('"accounts_user"."first_name"', sql)
+        self.assertNotIn('description', sql)
+        self.assertNotIn('"accounts_user"."password"', sql)
+
+    def test_expand_nests_the_related_object(self):
+        reports, sql = self.list_reports(fields='reference_code', expand='reporter')
+        self.assertEqual(set(reports[0]), {'reference_code', 'reporter'})
+        self.assertEqual(reports[0]['reporter']['email'], self.survivor.email)
+        self.assertEqual(reports[0]['reporter']['first_name'], 'Amina')
+        self.assertIn('JOIN "accounts_user"', sql)
+        self.assertNotIn('incident_location', sql)
+
+
+class ArchivingTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        self.nairobi = Location.objects.create(name='Nairobi', key='nairobi', latitude='-1.29', longitude='36.82')
+        self.report = self.create_report()
+        self.report.status = 'resolved'
+        self.report.save()
+        self.change = ReportStatusChange.objects.create(
+            report=self.report, old_status='pending', new_status='resolved', changed_by=self.lawyer)
+        self.report.is_deleted = True
+        self.report.save()
+
+    def test_archive_keeps_location_resolution_and_history(self):
+        self.assertEqual(list(archiving.archive_deleted_reports()), [1])
+        archived = ArchivedGBVReport.objects.get(pk=self.report.pk)
+        self.assertEqual(archived.location_id, self.nairobi.pk)
+        self.assertEqual(archived.resolved_at, self.report.resolved_at)
+        self.assertEqual(archived.status_changes.get().changed_by, self.lawyer)
+        self.assertFalse(GBVReport.all_objects.filter(pk=self.report.pk).exists())
+
+    def test_restore_brings_everything_back(self):
+        list(archiving.archive_deleted_reports())
+        report = archiving.restore_report(self.report.pk)
+        self.assertEqual(report.location_id, self.nairobi.pk)
+        self.assertEqual(report.resolved_at, self.report.resolved_at)
+        change = report.status_changes.get()
+        self.assertEqual((change.pk, change.changed_at), (self.change.pk, self.change.changed_at))
+        self.assertFalse(ArchivedGBVReport.objects.exists())
+
+        rollup = ReportRollup.objects.get(report_count=1)
+        self.assertEqual((rollup.status, rollup.timed_count), ('resolved', 1))
+        self.assertTrue(HeatmapCell.objects.filter(report_count=1).exists())
+
+    def test_restored_appointment_does_not_repeat_its_reminders(self):
+        now = timezone.now()
+        report = self.create_report()
+        appointment = Appointment.objects.create(
+            report=report, professional=self.doctor, appointment_type='medical',
+            scheduled_date=now + timedelta(minutes=30),
+        )
+        self.assertEqual(reminders.run_once(now), 1)
+        report.is_deleted = True
+        report.save()
+        list(archiving.archive_deleted_reports())
+        self.assertFalse(AppointmentReminder.objects.exists())
+        self.assertEqual(ArchivedAppointment.objects.get().reminders.count(), 2)
+
+        archiving.restore_report(report.pk)
+        self.assertEqual(appointment.reminders.filter(sent_at__isnull=False).count(), 2)
+        mail.outbox = []
+        self.assertEqual(reminders.run_once(now), 0)
+        self.assertEqual(mail.outbox, [])
+
+
+class ReminderTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.appointment = Appointment.objects.create(
+            report=self.create_report(), professional=self.doctor, appointment_type='medical',
+            scheduled_date=self.now + timedelta(minutes=30),
+        )
+        mail.outbox = []
+
+    def test_failed_email_is_released_for_the_next_run(self):
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=SMTPException):
+            self.assertEqual(reminders.run_once(self.now), 0)
+        # The day-ahead reminder was superseded by the hour-ahead one, which failed
+        self.assertEqual(list(AppointmentReminder.objects.values_list('offset_minutes', flat=True)), [24 * 60])
+
+        self.assertEqual(reminders.run_once(self.now), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIsNotNone(AppointmentReminder.objects.get(offset_minutes=60).sent_at)
+        self.assertEqual(reminders.run_once(self.now), 0)
+
+    def test_moving_an_appointment_resets_its_reminders(self):
+        reminders.run_once(self.now)
+        self.appointment.scheduled_date = self.now + timedelta(days=3)
+        self.appointment.save()
+        self.assertFalse(AppointmentReminder.objects.exists())
+
+        self.assertEqual(reminders.run_once(self.now), 0)
+        self.assertEqual(reminders.run_once(self.appointment.scheduled_date - timedelta(minutes=59)), 1)
+
+    def test_claim_for_an_appointment_moved_later_is_released(self):
+        Appointment.objects.filter(pk=self.appointment.pk).update(scheduled_date=self.now + timedelta(days=3))
+        self.assertEqual(reminders.send_reminders([(self.appointment.pk, 60)], self.now), 0)
+        self.assertFalse(AppointmentReminder.objects.exists())
+        self.assertEqual(mail.outbox, [])
+
+
+class SyncTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        self.report = self.create_report()
+        CaseAssignment.objects.create(report=self.report, professional=self.doctor, assigned_by=self.admin)
+
+    def poll(self, user, cursor):
+        self.authenticate(user)
+        response = self.client.get('/api/sync/', {'since': cursor})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_returns_each_change_once(self):
+        self.authenticate(self.survivor)
+        cursor = self.client.get('/api/sync/').json()['cursor']
+        note = CaseNote.objects.create(report=self.report, created_by=self.doctor, note_type='general', content='Seen')
+        body = self.poll(self.survivor, cursor)
+        self.assertEqual([(change['model'], change['id'], change['action']) for change in body['changes']],
+                         [('note', str(note.pk), 'created')])
+        self.assertEqual(body['changes'][0]['data']['content'], 'Seen')
+        self.assertEqual(self.poll(self.survivor, body['cursor'])['changes'], [])
+
+    def test_report_no_longer_visible_is_sent_as_deleted(self):
+        self.authenticate(self.doctor)
+        cursor = self.client.get('/api/sync/').json()['cursor']
+        self.report.description = 'Updated'
+        self.report.save()
+        # Taken off the case without going through the change log
+        CaseAssignment.all_objects.filter(report=self.report).update(is_active=False)
+        [change] = self.poll(self.doctor, cursor)['changes']
+        self.assertEqual((change['model'], change['action']), ('report', 'deleted'))
+        self.assertNotIn('data', change)
+
+    def test_note_made_confidential_is_sent_to_the_reporter_as_deleted(self):
+        self.authenticate(self.survivor)
+        cursor = self.client.get('/api/sync/').json()['cursor']
+        CaseNote.objects.create(report=self.report, created_by=self.doctor, note_type='general', content='Secret')
+        CaseNote.objects.update(is_confidential=True)
+        [change] = self.poll(self.survivor, cursor)['changes']
+        self.assertEqual((change['model'], change['action']), ('note', 'deleted'))
+        self.assertNotIn('data', change)
+
+
+    def test_assigned_professional_gets_the_case_and_loses_it_when_unassigned(self):
+        note = CaseNote.objects.create(report=self.report, created_by=self.doctor, note_type='general', content='Earlier')
+        Appointment.objects.create(report=self.report, professional=self.doctor, appointment_type='medical',
+                                   scheduled_date=timezone.now() + timedelta(days=1))
+        self.authenticate(self.lawyer)
+        cursor = self.client.get('/api/sync/').json()['cursor']
+        assignment = CaseAssignment.objects.create(report=self.report, professional=self.lawyer, assigned_by=self.admin)
+        body = self.poll(self.lawyer, cursor)
+        self.assertEqual(
+            sorted((change['model'], change['id'], change['action']) for change in body['changes']),
+            [('assignment', str(assignment.pk), 'created'), ('note', str(note.pk), 'created'),
+             ('report', self.report.pk, 'created')],
+        )
+        assignment.is_active = False
+        assignment.save()
+        self.assertEqual(
+            sorted((change['model'], change['action']) for change in self.poll(self.lawyer, body['cursor'])['changes']),
+            [('assignment', 'deleted'), ('note', 'deleted'), ('report', 'deleted')],
+        )
+
+class ProfilingMiddlewareTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        for name, value in (('TOKEN', 'secret'), ('PROFILE_DIR', self.directory)):
+            patcher = mock.patch.object(profiling, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_requested_profile_is_saved_and_named_in_the_response(self):
+        response = self.client.get('/api/locations/autocomplete/', {'q': 'na'}, HTTP_X_GBV_PROFILE='secret')
+        self.assertEqual(response.status_code, 200)
+        [profile] = profiling.collected(self.directory)
+        self.assertEqual(response[profiling.HEADER], profile.path.name)
+        self.assertEqual((profile.view, profile.action), ('reports.views.location_autocomplete', 'get'))
+
+    def test_unprofiled_request_is_untouched(self):
+        response = self.client.get('/api/locations/autocomplete/', {'q': 'na'}, HTTP_X_GBV_PROFILE='wrong')
+        self.assertNotIn(profiling.HEADER, response)
+        self.assertEqual(profiling.collected(self.directory), [])
+
+    def test_view_errors_propagate_and_stop_the_profiler(self):
+        with mock.patch.object(locations, 'autocomplete', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                self.client.get('/api/locations/autocomplete/', {'q': 'na'}, HTTP_X_GBV_PROFILE='secret')
+        self.assertIsNone(sys.getprofile())
+
+
+class MetricsMiddlewareTests(GBVTestCase):
+    LABELS = (('view', 'reports.views.location_autocomplete'), ('action', 'get'), ('status', '2xx'))
+
+    def requests_counted(self):
+        series = metrics.registry.histograms.get(('gbv_http_request_duration_seconds', self.LABELS))
+        return sum(series[:-1]) if series else 0
+
+    def test_requests_are_timed_by_view(self):
+        self.client.get('/api/locations/autocomplete/', {'q': 'na'})
+        self.assertEqual(self.requests_counted(), 1)
+        self.assertIn('gbv_http_request_duration_seconds_count{view="reports.views.location_autocomplete",'
+                      'action="get",status="2xx"}', metrics.render())
+
+    async def test_requests_are_timed_under_asgi(self):
+        response = await self.async_client.get('/api/locations/autocomplete/', {'q': 'na'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.requests_counted(), 1)
+
+    def queries_counted(self):
+        series = metrics.registry.histograms.get(
+            ('gbv_http_request_db_queries', (('view', 'reports.views.case_summary'), ('action', 'get')))
+        )
+        return series[-1] if series else 0
+
+    def summary_path(self):
+        report = self.create_report()
+        CaseNote.objects.create(report=report, created_by=self.doctor, note_type='general', content='Seen')
+        self.authenticate(self.admin)
+        return f'/api/cases/{report.pk}/summary/'
+
+    def test_queries_are_counted_per_request(self):
+        self.client.get(self.summary_path())
+        self.assertGreaterEqual(self.queries_counted(), 5)
+
+    async def test_queries_are_counted_under_asgi(self):
+        path = await sync_to_async(self.summary_path)()
+        headers = {'Authorization': self.client.defaults['HTTP_AUTHORIZATION']}
+        await sync_to_async(self.client.get)(path)
+        sync_count = self.queries_counted()
+        response = await self.async_client.get(path, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.queries_counted(), 2 * sync_count)
+
+    def test_endpoint_requires_the_token(self):
+        with mock.patch.object(metrics, 'TOKEN', 'secret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE gbv_reports gauge', response.content.decode())
+
+
+class IdempotencyTests(GBVTestCase):
+    REPORT = {
+        'reporter_email': 'anon@example.com',
+        'reporter_first_name': 'Anon',
+        'reporter_last_name': 'Reporter',
+        'reporter_phone': '0700000000',
+        'incident_location': 'Nairobi',
+        'incident_type': 'physical',
+        'description': 'Test incident',
+    }
+
+    def post(self, key, ip='198.51.100.1', **changes):
+        return self.client.post('/api/reports/', {**self.REPORT, **changes}, content_type='application/json',
+                                HTTP_IDEMPOTENCY_KEY=key, REMOTE_ADDR=ip)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.post('key-1')
+        self.assertEqual(first.status_code, 201)
+        retry = self.post('key-1')
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(GBVReport.objects.count(), 1)
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.authenticate(self.survivor)
+        self.post('key-1')
+        self.assertEqual(self.post('key-1', description='Something else').status_code, 422)
+        self.assertEqual(GBVReport.objects.count(), 1)
+
+    def test_anonymous_clients_do_not_share_keys(self):
+        self.post('key-1')
+        other = self.post('key-1', ip='203.0.113.9')
+        self.assertEqual(other.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', other)
+        self.assertEqual(self.post('key-1', description='Something else').status_code, 422)
+        self.assertEqual(GBVReport.objects.count(), 2)
+
+    def test_keys_are_scoped_to_the_user_not_the_token(self):
+        self.authenticate(self.survivor)
+        first = self.post('key-1')
+        # A fresh token for the same user, as after a refresh
+        self.authenticate(self.survivor)
+        self.assertEqual(self.post('key-1')['Idempotent-Replayed'], 'true')
+        self.authenticate(self.lawyer)
+        other = self.post('key-1')
+        self.assertNotIn('Idempotent-Replayed', other)
+        self.assertNotEqual(other.json()['reference_code'], first.json()['reference_code'])
+
+    def test_invalid_token_does_not_claim_the_key(self):
+        self.client.defaults['HTTP_AUTHORIZATION'] = 'Bearer not-a-token'
+        self.assertEqual(self.post('key-1').status_code, 401)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+    async def test_retry_replays_under_asgi(self):
+        post = self.async_client.post
+        first = await post('/api/reports/', self.REPORT, content_type='application/json',
+                           headers={'Idempotency-Key': 'key-1'})
+        retry = await post('/api/reports/', self.REPORT, content_type='application/json',
+                           headers={'Idempotency-Key': 'key-1'})
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+
+
+class AssignmentRetentionTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        self.report = self.create_report()
+        self.assignment = CaseAssignment.objects.create(report=self.report, professional=self.doctor)
+        # Assigned long ago
+        CaseAssignment.all_objects.filter(pk=self.assignment.pk).update(
+            assigned_date=timezone.now() - timedelta(days=1000))
+        self.assignment.refresh_from_db()
+
+    def purge(self, now):
+        return sum(lifecycle.run_policy('inactive_assignments', now=now))
+
+    def test_retention_runs_from_when_the_assignment_ended(self):
+        self.assignment.is_active = False
+        self.assignment.save()
+        self.assertIsNotNone(self.assignment.deactivated_at)
+        self.assertEqual(self.purge(timezone.now()), 0)
+        self.assertEqual(self.purge(self.assignment.deactivated_at + timedelta(days=181)), 1)
+
+    def test_reactivation_clears_the_end_date(self):
+        self.assignment.is_active = False
+        self.assignment.save()
+        results = bulk.assign([(self.report.pk, self.doctor.pk)], self.admin)
+        self.assertEqual(list(results.values()), ['reactivated'])
+        self.assignment.refresh_from_db()
+        self.assertIsNone(self.assignment.deactivated_at)
+        self.assertEqual(self.purge(timezone.now() + timedelta(days=1000)), 0)
+
+
+@mock.patch.dict(lifecycle.RETENTION_DAYS, resolved_reports=30)
+class AnonymiseTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.live, self.archived = self.resolved_case('live'), self.resolved_case('archived')
+        GBVReport.all_objects.filter(pk=self.archived.pk).update(is_deleted=True)
+        list(archiving.archive_deleted_reports())
+
+    def resolved_case(self, name):
+        report = self.create_report(incident_location='Kibera Drive 7')
+        CaseNote.objects.create(report=report, created_by=self.doctor, note_type='medical', content='Bruising')
+        Document.objects.create(report=report, uploaded_by=self.doctor, document_type='evidence',
+                                file=ContentFile(b'statement', name=f'{name}.txt'))
+        report.status = 'resolved'
+        report.save()
+        GBVReport.all_objects.filter(pk=report.pk).update(resolved_at=timezone.now() - timedelta(days=31))
+        return report
+
+    def test_live_and_archived_cases_are_redacted(self):
+        files = [Document.objects.get().file.name, ArchivedDocument.objects.get().file.name]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(list(lifecycle.run_policy('resolved_reports')), [1, 1])
+
+        for model in (GBVReport, ArchivedGBVReport):
+            self.assertEqual(list(model.objects.values_list('description', 'incident_location')),
+                             [(lifecycle.REDACTED, lifecycle.REDACTED)])
+        self.assertEqual({note.content for note in CaseNote.objects.all()}, {lifecycle.REDACTED})
+        self.assertEqual({note.content for note in ArchivedCaseNote.objects.all()}, {lifecycle.REDACTED})
+        self.assertFalse(Document.objects.exists() or ArchivedDocument.objects.exists())
+        self.assertFalse(any(default_storage.exists(name) for name in files))
+        self.assertTrue(ChangeLog.objects.filter(model='document', action='deleted',
+                                                 user=self.survivor).exists())
+        self.assertEqual(list(lifecycle.run_policy('resolved_reports')), [])
+
+
+class RollupTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        self.nairobi = Location.objects.create(name='Nairobi', key='nairobi')
+        LocationAlias.objects.create(location=self.nairobi, key='nbi')
+        self.create_report()
+        self.create_report(incident_location='Somewhere unlisted')
+
+    def counts_by_location(self):
+        return {row['location']: row['count'] for row in rollups.summarize(group_by=['location'])}
+
+    def assert_matches_rebuild(self):
+        stored = self.counts_by_location()
+        rollups.rebuild()
+        self.assertEqual(stored, self.counts_by_location())
+
+    def test_unmatched_reports_are_counted_together(self):
+        self.create_report(incident_location='Another unlisted place')
+        self.assertEqual(self.counts_by_location(), {'Nairobi': 1, None: 2})
+        self.assert_matches_rebuild()
+
+    def test_renaming_a_location_keeps_its_counts(self):
+        self.nairobi.name = 'Nairobi City'
+        self.nairobi.save()
+        self.assertEqual(self.counts_by_location(), {'Nairobi City': 1, None: 1})
+        self.create_report(incident_location='nbi')
+        self.assertEqual(ReportRollup.objects.filter(location=self.nairobi).count(), 1)
+        self.assert_matches_rebuild()
+
+    def test_deleting_a_location_moves_its_counts_to_unmatched(self):
+        self.nairobi.delete()
+        self.assertEqual(self.counts_by_location(), {None: 2})
+        self.assert_matches_rebuild()
+
+    def test_analytics_filter_resolves_the_location(self):
+        self.authenticate(self.admin)
+        response = self.client.get('/api/analytics/', {'location': 'nbi'})
+        self.assertEqual(response.json()['results'][0]['count'], 1)
+        response = self.client.get('/api/analytics/', {'location': 'Atlantis'})
+        self.assertEqual(response.json()['results'][0]['count'], 0)
+
+
+class BulkStatusTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first, self.second = self.create_report(), self.create_report()
+        mail.outbox = []
+
+    def change(self, status='under_review'):
+        return bulk.change_status(GBVReport.objects.all(), [self.first.pk, self.second.pk], status, self.admin)
+
+    def test_statuses_change_with_history_and_emails(self):
+        self.assertEqual(self.change(), {self.first.pk: 'updated', self.second.pk: 'updated'})
+        self.assertEqual(ReportStatusChange.objects.count(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(self.change('pending')[self.first.pk], 'updated')
+        self.assertEqual(self.change('pending')[self.first.pk], 'unchanged')
+
+    def test_report_changed_meanwhile_is_left_alone(self):
+        stale = GBVReport.objects.in_bulk([self.first.pk, self.second.pk])
+        GBVReport.objects.filter(pk=self.first.pk).update(status='resolved')
+        with mock.patch.object(QuerySet, 'in_bulk', return_value=stale):
+            results = self.change()
+        self.assertEqual(results, {self.first.pk: 'conflict', self.second.pk: 'updated'})
+        self.assertEqual(GBVReport.objects.get(pk=self.first.pk).status, 'resolved')
+        self.assertEqual(list(ReportStatusChange.objects.values_list('report_id', flat=True)), [self.second.pk])
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class AssignmentViewTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        self.report = self.create_report()
+        self.authenticate(self.admin)
+        mail.outbox = []
+
+    def assert_assigned_with_history(self):
+        self.report.refresh_from_db()
+        self.assertEqual((self.report.status, self.report.assigned_to), ('under_review', self.doctor))
+        change = ReportStatusChange.objects.get(report=self.report)
+        self.assertEqual((change.old_status, change.new_status, change.changed_by),
+                         ('pending', 'under_review', self.admin))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_create_records_the_status_change(self):
+        response = self.client.post('/api/assignments/', {
+            'report': self.report.pk, 'professional': self.doctor.pk, 'notes': 'Urgent',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['notes'], 'Urgent')
+        self.assert_assigned_with_history()
+
+    def test_quick_assign_records_the_status_change_once(self):
+        url = f'/api/assignments/assign/{self.report.pk}/{self.doctor.pk}/'
+        self.assertEqual(self.client.post(url).status_code, 200)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['professional'], self.doctor.pk)
+        self.assert_assigned_with_history()
+
+
+class BulkAssignTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first, self.second = self.create_report(), self.create_report()
+        CaseAssignment.objects.create(report=self.second, professional=self.lawyer)
+        self.authenticate(self.admin)
+        mail.outbox = []
+
+    def test_mixed_valid_and_invalid_ids(self):
+        response = self.client.post('/api/assignments/bulk_assign/', {'assignments': [
+            {'report': self.first.pk, 'professional': self.doctor.pk},
+            {'report': self.first.pk, 'professional': self.doctor.pk},
+            {'report': 'GBV-MISSING', 'professional': self.doctor.pk},
+            {'report': self.first.pk, 'professional': self.survivor.pk},
+            {'report': self.second.pk, 'professional': self.lawyer.pk},
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['assigned'], 1)
+        self.assertEqual([item['result'] for item in response.json()['results']], [
+            'assigned', 'report_not_found', 'professional_not_found', 'already_assigned',
+        ])
+        self.assertEqual(list(CaseAssignment.objects.filter(report=self.first).values_list('professional', flat=True)),
+                         [self.doctor.pk])
+        self.assertEqual(list(ReportStatusChange.objects.values_list('report_id', flat=True)), [self.first.pk])
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_malformed_item_rejects_the_whole_request(self):
+        response = self.client.post('/api/assignments/bulk_assign/', {'assignments': [
+            {'report': self.first.pk, 'professional': self.doctor.pk},
+            {'report': self.first.pk, 'professional': 'doctor'},
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CaseAssignment.objects.filter(report=self.first).exists())
+
+
+class TriageClaimTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_admin = User.objects.create_user('admin2@example.com', 'pass', role='admin', is_staff=True)
+        self.urgent = self.create_report(immediate_danger=True)
+        self.routine = self.create_report()
+
+    def claim(self, user, report):
+        self.authenticate(user)
+        return self.client.post(f'/api/triage/{report.pk}/claim/')
+
+    def test_claim_is_exclusive_until_it_expires(self):
+        self.assertEqual(self.claim(self.admin, self.urgent).status_code, 200)
+        self.assertEqual(self.claim(self.other_admin, self.urgent).status_code, 409)
+        TriageEntry.objects.filter(pk=self.urgent.pk).update(
+            claimed_at=timezone.now() - triage.CLAIM_TTL - timedelta(minutes=1))
+        response = self.claim(self.other_admin, self.urgent)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(TriageEntry.objects.get(pk=self.urgent.pk).claimed_by, self.other_admin)
+
+    def test_claim_next_moves_on_when_another_admin_wins(self):
+        claim = triage.claim
+
+        def lose_first_race(report_id, user):
+            if report_id == self.urgent.pk:
+                claim(report_id, self.other_admin)
+            return claim(report_id, user)
+
+        with mock.patch.object(triage, 'claim', side_effect=lose_first_race):
+            entry = triage.claim_next(self.admin)
+        self.assertEqual(entry.report_id, self.routine.pk)
+        self.assertEqual(TriageEntry.objects.get(pk=self.urgent.pk).claimed_by, self.other_admin)
+        self.assertIsNone(triage.claim_next(self.admin))
+
+    def test_release_by_holder_or_forced(self):
+        self.claim(self.admin, self.urgent)
+        self.authenticate(self.other_admin)
+        url = f'/api/triage/{self.urgent.pk}/release/'
+        self.assertEqual(self.client.post(url).status_code, 409)
+        self.assertEqual(self.client.post(f'{url}?force=1').status_code, 200)
+        self.assertIsNone(TriageEntry.objects.get(pk=self.urgent.pk).claimed_by)
+
+        self.claim(self.admin, self.urgent)
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertIsNone(TriageEntry.objects.get(pk=self.urgent.pk).claimed_by)
+        self.assertEqual(self.claim(self.other_admin, self.urgent).status_code, 200)
+
+
+class CaseSummaryTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        self.report = self.create_report()
+        CaseNote.objects.create(report=self.report, created_by=self.doctor, note_type='general', content='Visible')
+        CaseNote.objects.create(report=self.report, created_by=self.doctor, note_type='medical',
+                                content='Hidden', is_confidential=True)
+
+    def summary(self, user):
+        self.authenticate(user)
+        return self.client.get(f'/api/cases/{self.report.pk}/summary/')
+
+    def test_only_people_on_the_case_see_the_summary(self):
+        self.assertEqual(self.summary(self.doctor).status_code, 403)
+        CaseAssignment.objects.create(report=self.report, professional=self.doctor, assigned_by=self.admin)
+        self.assertEqual(len(self.summary(self.doctor).json()['notes']), 2)
+        self.client.defaults.pop('HTTP_AUTHORIZATION')
+        self.assertEqual(self.client.get(f'/api/cases/{self.report.pk}/summary/').status_code, 401)
+
+    def test_survivor_summary_hides_confidential_notes_and_is_audited(self):
+        response = self.summary(self.survivor)
+        self.assertEqual([note['content'] for note in response.json()['notes']], ['Visible'])
+        audit.flush()
+        self.assertEqual(
+            sorted(AccessLog.objects.filter(user=self.survivor).values_list('action', flat=True)),
+            ['view_note', 'view_summary'],
+        )
+
+    def test_parallel_sub_queries_run_in_the_pool_in_order(self):
+        with mock.patch.object(parallel, 'ENABLED', True):
+            results = parallel.gather((pow, 2, 3), (threading.current_thread,), (pow, 3, 2))
+        self.assertEqual(results[0::2], [8, 9])
+        self.assertNotEqual(results[1], threading.current_thread())
+
+    def test_dashboard_by_role(self):
+        self.authenticate(self.admin)
+        self.assertEqual(self.client.get('/api/dashboard/').json()['total_reports'], 1)
+        self.authenticate(self.survivor)
+        self.assertEqual(self.client.get('/api/dashboard/').json()['my_reports']['total'], 1)
+
+
+class EventStreamTests(GBVTestCase):
+    def open_stream(self, **params):
+        response = self.client.get('/api/events/', params, HTTP_ACCEPT='text/event-stream')
+        self.addCleanup(response.close)
+        return response
+
+    def ticket(self, user):
+        self.authenticate(user)
+        response = self.client.post('/api/events/ticket/')
+        self.client.defaults.pop('HTTP_AUTHORIZATION')
+        return response.json()['ticket']
+
+    def test_ticket_opens_the_stream(self):
+        response = self.open_stream(ticket=self.ticket(self.survivor))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+    def test_authorization_header_opens_the_stream(self):
+        self.authenticate(self.doctor)
+        self.assertEqual(self.open_stream().status_code, 200)
+
+    def test_stream_refuses_anonymous_tokens_and_expired_tickets(self):
+        self.assertEqual(self.client.post('/api/events/ticket/').status_code, 401)
+        self.assertEqual(self.open_stream().status_code, 401)
+        access_token = str(RefreshToken.for_user(self.survivor).access_token)
+        self.assertEqual(self.open_stream(token=access_token).status_code, 401)
+        self.assertEqual(self.open_stream(ticket=access_token).status_code, 401)
+        ticket = self.ticket(self.survivor)
+        with mock.patch.object(events, 'STREAM_TICKET_SECONDS', -1):
+            response = self.open_stream(ticket=ticket)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(json.loads(response.content)['detail'], 'Invalid or expired stream ticket')
+
+
+class EventVisibilityTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        self.report = self.create_report()
+        self.assignment = CaseAssignment.objects.create(report=self.report, professional=self.doctor)
+
+    def note_event(self, is_confidential):
+        note = CaseNote.objects.create(report=self.report, created_by=self.doctor, note_type='medical',
+                                       content='Examined', is_confidential=is_confidential)
+        return events.build_event(note, True)
+
+    def streamed(self, user, published):
+        """The first event the stream sends user after published goes out"""
+        broker = InProcessBroker()
+
+        async def first_event():
+            lines = events.stream(user)
+            await anext(lines)
+            for event in published:
+                broker.publish(event)
+            try:
+                return await anext(lines)
+            finally:
+                await lines.aclose()
+
+        with mock.patch.object(events, 'get_broker', return_value=broker), \
+                mock.patch.object(events, 'SSE_HEARTBEAT_SECONDS', 0.1):
+            return asyncio.run(first_event())
+
+    def test_confidential_note_is_not_pushed_to_the_survivor(self):
+        confidential, shared = self.note_event(True), self.note_event(False)
+        self.assertIn(f'id: {shared["id"]}\n', self.streamed(self.survivor, [confidential, shared]))
+        self.assertIn(f'id: {confidential["id"]}\n', self.streamed(self.doctor, [confidential, shared]))
+
+    def test_audience_is_the_assigned_professionals(self):
+        event = self.note_event(False)
+        self.assertEqual(event['professional_ids'], {self.doctor.pk})
+        self.assertEqual(self.streamed(self.lawyer, [event]), ': keep-alive\n\n')
+        self.assertTrue(events.visible_to(event, self.admin))
+
+        self.assignment.is_active = False
+        self.assignment.save()
+        self.assertFalse(events.visible_to(self.note_event(False), self.doctor))
+
+
+class AvailabilityTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        # A Monday, inside working hours
+        self.opens = timezone.make_aware(datetime(2031, 3, 3, 8))
+        self.report = self.create_report()
+        Appointment.objects.create(report=self.report, professional=self.doctor, appointment_type='medical',
+                                   scheduled_date=self.opens, duration_minutes=60)
+
+    def test_interval_index_merges_and_finds_overlaps(self):
+        index = availability.IntervalIndex([(5, 7), (1, 3), (2, 4), (4, 5), (9, 10)])
+        self.assertEqual(index.intervals, [[1, 7], [9, 10]])
+        self.assertEqual(index.first_overlap(6, 8), [1, 7])
+        self.assertEqual(index.first_overlap(8, 10), [9, 10])
+        self.assertIsNone(index.first_overlap(7, 9))
+
+    def test_earliest_free_slots_across_professionals(self):
+        slots = availability.earliest_free_slots({'doctor', 'lawyer'}, 60, self.opens, self.opens + timedelta(hours=3), 3)
+        self.assertEqual(
+            [(slot['professional'], slot['start'].hour) for slot in slots],
+            [(self.lawyer.pk, 8), (self.doctor.pk, 9), (self.lawyer.pk, 9)],
+        )
+
+    def book(self, start):
+        self.authenticate(self.admin)
+        return self.client.post('/api/appointments/', {
+            'report': self.report.pk, 'professional': self.doctor.pk, 'appointment_type': 'medical',
+            'scheduled_date': start.isoformat(), 'duration_minutes': 60,
+        }, content_type='application/json')
+
+    def test_overlapping_booking_is_rejected(self):
+        response = self.book(self.opens + timedelta(minutes=30))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('already booked', str(response.json()['scheduled_date']))
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_booking_locks_the_professional_before_checking(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.book(self.opens + timedelta(hours=1)).status_code, 201)
+        statements = [query['sql'] for query in queries]
+        lock = next(i for i, sql in enumerate(statements) if sql.startswith(f'UPDATE "{User._meta.db_table}"'))
+        check = next(i for i, sql in enumerate(statements) if sql.startswith('SELECT') and '"scheduled_date" <' in sql)
+        insert = next(i for i, sql in enumerate(statements) if sql.startswith('INSERT INTO "reports_appointment"'))
+        self.assertLess(lock, check)
+        self.assertLess(check, insert)
+
+
+class AutoAssignTests(GBVTestCase):
+    def test_workload_queue_takes_the_least_loaded_professional(self):
+        queue = auto_assign.WorkloadQueue({
+            1: {'role': 'lawyer', 'load': 2}, 2: {'role': 'lawyer', 'load': 0.5}, 3: {'role': 'doctor', 'load': 0},
+        })
+        self.assertEqual([queue.take('lawyer') for _ in range(4)], [2, 2, 1, 2])
+        self.assertEqual(queue.take('doctor'), 3)
+        self.assertIsNone(queue.take('counselor'))
+
+    def test_batches_are_locked_balanced_and_recorded(self):
+        second_lawyer = User.objects.create_user('lawyer2@example.com', 'pass', role='lawyer')
+        CaseAssignment.objects.create(report=self.create_report(status='under_review'), professional=self.lawyer)
+        reports = [self.create_report() for _ in range(4)] + [self.create_report(needs_medical_attention=True)]
+        select_for_update = QuerySet.select_for_update
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True,
+                               side_effect=select_for_update) as locked:
+            assigned, unplaced = auto_assign.auto_assign(batch_size=2, assigned_by=self.admin)
+        self.assertEqual(locked.call_count, 3)
+        self.assertEqual((len(assigned), unplaced), (5, []))
+        self.assertEqual(
+            {professional: CaseAssignment.objects.filter(notes='Auto-assigned', professional=professional).count()
+             for professional in (self.lawyer, second_lawyer, self.doctor)},
+            {self.lawyer: 2, second_lawyer: 2, self.doctor: 1},
+        )
+        self.assertEqual(set(GBVReport.objects.filter(pk__in=[r.pk for r in reports]).values_list('status', flat=True)),
+                         {'under_review'})
+        self.assertEqual(ReportStatusChange.objects.filter(new_status='under_review').count(), 5)
+
+    def test_inactive_assignment_is_reactivated(self):
+        report = self.create_report()
+        CaseAssignment.objects.create(report=report, professional=self.lawyer, is_active=False)
+        auto_assign.auto_assign(assigned_by=self.admin)
+        assignment = CaseAssignment.all_objects.get(report=report)
+        self.assertTrue(assignment.is_active)
+        self.assertEqual(ReportStatusChange.objects.get(report=report).changed_by, self.admin)
+
+
+class DocumentDownloadTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.document = Document.objects.create(
+            report=self.create_report(), uploaded_by=self.doctor, document_type='evidence',
+            file=ContentFile(b'statement', name='statement.txt'),
+        )
+
+    def test_download_is_audited(self):
+        self.authenticate(self.survivor)
+        [listed] = self.client.get('/api/documents/').json()
+        self.assertNotIn('file', listed)
+        response = self.client.get(listed['download_url'])
+        self.assertEqual(b''.join(response.streaming_content), b'statement')
+        self.assertIn('attachment', response['Content-Disposition'])
+        audit.flush()
+        self.assertTrue(AccessLog.objects.filter(user=self.survivor, action='download_document',
+                                                 object_id=str(self.document.pk)).exists())
+
+    def test_download_is_limited_to_the_case(self):
+        self.authenticate(self.lawyer)
+        self.assertEqual(self.client.get(f'/api/documents/{self.document.pk}/download/').status_code, 404)
+
+
+class AuditBufferTests(GBVTestCase):
+    def entries(self, count):
+        return [audit.entry(self.doctor, 'GBV-1', 'view_report') for _ in range(count)]
+
+    def buffer(self, **options):
+        buffer = audit.AuditBuffer(**options)
+        self.addCleanup(buffer.wakeup.set)
+        return buffer
+
+    def test_full_batch_is_written_at_once(self):
+        buffer = self.buffer(batch_size=2, flush_seconds=60)
+        buffer.add(self.entries(1))
+        self.assertFalse(AccessLog.objects.exists())
+        buffer.add(self.entries(1))
+        self.assertEqual(AccessLog.objects.count(), 2)
+
+    def test_background_thread_flushes(self):
+        written = threading.Event()
+        buffer = self.buffer(flush_seconds=0.01)
+        with mock.patch.object(AccessLog.objects, 'bulk_create', side_effect=lambda *args, **kwargs: written.set()):
+            buffer.add(self.entries(1))
+            self.assertTrue(written.wait(5))
+        self.assertEqual(buffer.thread.name, 'audit-log-flush')
+
+    def test_failed_write_is_kept_for_the_next_flush(self):
+        buffer = self.buffer(flush_seconds=60)
+        buffer.add(self.entries(2))
+        with mock.patch.object(AccessLog.objects, 'bulk_create', side_effect=DatabaseError), \
+                self.assertLogs('reports.audit', 'ERROR'):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(AccessLog.objects.count(), 2)
+
+    def test_buffered_entries_are_written_at_exit(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, 'audit.sqlite3')
+            script = '\n'.join([
+                'import django',
+                'from django.conf import settings',
+                f"settings.DATABASES['default']['NAME'] = {database!r}",
+                'django.setup()',
+                'from django.db import connection',
+                'from accounts.models import User',
+                'from reports import audit',
+                'from reports.models import AccessLog',
+                'with connection.schema_editor() as editor:',
+                '    editor.create_model(AccessLog)',
+                "audit.record(None, 'GBV-EXIT', 'view_report', user=User(pk=1))",
+            ])
+            subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, check=True,
+                           env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'gbv_project.settings'})
+            with closing(sqlite3.connect(database)) as db:
+                rows = db.execute('SELECT report_reference FROM reports_accesslog').fetchall()
+        self.assertEqual(rows, [('GBV-EXIT',)])
+
+
+class WebhookReceiver(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.received.append((self.headers[webhooks.SIGNATURE_HEADER], body))
+        self.send_response(self.server.status_code)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class WebhookTests(GBVTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = HTTPServer(('127.0.0.1', 0), WebhookReceiver)
+        self.server.received, self.server.status_code = [], 200
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.endpoint = WebhookEndpoint.objects.create(
+            name='Partner', url=f'http://127.0.0.1:{self.server.server_port}/hook', events=['report.status_changed'],
+        )
+        self.report = self.create_report()
+
+    def change_status(self, status):
+        self.report.status = status
+        self.report.save()
+
+    def dispatch(self):
+        # Due now, whatever the backoff picked
+        WebhookDelivery.objects.filter(status='pending').update(next_attempt_at=timezone.now())
+        return webhooks.dispatch()
+
+    def test_only_subscribed_events_are_queued_from_the_cached_list(self):
+        self.assertFalse(WebhookDelivery.objects.exists())
+        with self.assertNumQueries(0):
+            self.assertEqual(webhooks.subscribers('report.status_changed'), [self.endpoint.pk])
+        self.change_status('under_review')
+        self.assertEqual(list(WebhookDelivery.objects.values_list('event_type', flat=True)), ['report.status_changed'])
+
+        self.endpoint.is_active = False
+        self.endpoint.save()
+        self.assertEqual(webhooks.subscribers('report.status_changed'), [])
+
+    def test_batches_are_signed(self):
+        self.change_status('under_review')
+        self.assertEqual(self.dispatch(), 1)
+        [(signature, body)] = self.server.received
+        self.assertTrue(webhooks.verify_signature(self.endpoint.secret, signature, body))
+        self.assertFalse(webhooks.verify_signature('another secret', signature, body))
+        self.assertEqual(json.loads(body)['deliveries'][0]['data']['new_status'], 'under_review')
+        self.assertEqual(WebhookDelivery.objects.get().status, 'delivered')
+
+    def test_failures_back_off_and_open_the_circuit(self):
+        self.server.status_code = 500
+        self.change_status('under_review')
+        before = timezone.now()
+        self.assertEqual(webhooks.dispatch(), 0)
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual((delivery.status, delivery.attempts, delivery.last_status_code), ('pending', 1, 500))
+        self.assertLessEqual(delivery.next_attempt_at, before + timedelta(seconds=webhooks.BACKOFF_SECONDS + 5))
+
+        with self.assertLogs('reports.webhooks', 'WARNING'):
+            for _ in range(webhooks.BREAKER_THRESHOLD - 1):
+                self.dispatch()
+        self.endpoint.refresh_from_db()
+        self.assertGreater(self.endpoint.circuit_open_until, timezone.now())
+        self.assertEqual(self.dispatch(), 0)
+        self.assertEqual(len(self.server.received), webhooks.BREAKER_THRESHOLD)
+
+        # After the cooldown one trial batch goes through and closes the circuit
+        self.server.status_code = 200
+        WebhookEndpoint.objects.update(circuit_open_until=timezone.now())
+        self.assertEqual(self.dispatch(), 1)
+        self.endpoint.refresh_from_db()
+        self.assertEqual(self.endpoint.consecutive_failures, 0)
@@ -0,0 +1,76 @@
+"""
+Maintenance of the triage queue (TriageEntry).
+
+A report has an entry while it is pending and not deleted. The urgency
+score weights immediate danger over medical attention; ties are broken by
+age, oldest first. Claims expire after TRIAGE_CLAIM_MINUTES so abandoned
+cases return to the queue.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import TriageEntry
+
+CLAIM_TTL = timedelta(minutes=getattr(settings, 'TRIAGE_CLAIM_MINUTES', 30))
+
+
+def urgency_score(report):
+    return 2 * bool(report.immediate_danger) + bool(report.needs_medical_attention)
+
+
+def in_queue(report):
+    return report.status == 'pending' and not report.is_deleted
+
+
+def sync_report(report):
+    """Add, update or remove the triage entry for a report"""
+    if in_queue(report):
+        TriageEntry.objects.update_or_create(
+            report_id=report.pk,
+            defaults={'urgency': urgency_score(report), 'date_reported': report.date_reported},
+        )
+    else:
+        remove([report.pk])
+
+
+def remove(report_ids):
+    """Drop reports from the queue, e.g. after bulk status changes"""
+    TriageEntry.objects.filter(report_id__in=list(report_ids)).delete()
+
+
+def available_to(user, now=None):
+    """Entries that are unclaimed, whose claim expired, or that user holds"""
+    now = now or timezone.now()
+    return TriageEntry.objects.filter(
+        Q(claimed_by__isnull=True) | Q(claimed_at__lt=now - CLAIM_TTL) | Q(claimed_by=user)
+    )
+
+
+def claim(report_id, user):
+    """Atomically claim an entry; returns False if someone else holds it"""
+    now = timezone.now()
+    return available_to(user, now).filter(report_id=report_id).update(
+        claimed_by=user, claimed_at=now
+    ) == 1
+
+
+def claim_next(user, attempts=5):
+    """Claim the most urgent available entry, retrying if another admin wins the race"""
+    for _ in range(attempts):
+        entry = available_to(user).exclude(claimed_by=user).first()
+        if entry is None:
+            return None
+        if claim(entry.report_id, user):
+            return TriageEntry.objects.select_related('report').get(pk=entry.pk)
+    return None
+
+
+def release(report_id, user):
+    """Release a claim held by user; admins may force-release with user=None"""
+    entries = TriageEntry.objects.filter(report_id=report_id, claimed_by__isnull=False)
+    if user is not None:
+        entries = entries.filter(claimed_by=user)
+    return entries.update(claimed_by=None, claimed_at=None) == 1
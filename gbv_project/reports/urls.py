@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 from reports.views import (
     ReportApiView, CaseAssignmentViewSet, AppointmentViewSet,
     CaseNoteViewSet, DocumentViewSet, case_summary, DashBoardView,
-    get_proffesionals,
+    get_proffesionals, report_analytics, location_autocomplete, heatmap_tile, sync_changes, ArchivedReportViewSet, TriageViewSet, AccessLogViewSet, WebhookEndpointViewSet,
+    event_stream, event_stream_ticket,
 )
 
 router = DefaultRouter()
@@ -12,11 +13,20 @@ router.register('assignments', CaseAssignmentViewSet, basename='assignment')
 router.register('appointments', AppointmentViewSet, basename='appointment')
 router.register('notes', CaseNoteViewSet, basename='note')
 router.register('documents', DocumentViewSet, basename='document')
-
+router.register('archive', ArchivedReportViewSet, basename='archive')
+router.register('triage', TriageViewSet, basename='triage')
+router.register('audit', AccessLogViewSet, basename='audit')
+router.register('webhooks', WebhookEndpointViewSet, basename='webhook')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('dashboard/', DashBoardView.as_view(), name='dashboard'),
     path('cases/<str:report_id>/summary/', case_summary, name='case-summary'),
     path('professionals/', get_proffesionals, name='get-professionals'),
+    path('analytics/', report_analytics, name='report-analytics'),
+    path('locations/autocomplete/', location_autocomplete, name='location-autocomplete'),
+    path('heatmap/<int:z>/<int:x>/<int:y>/', heatmap_tile, name='heatmap-tile'),
+    path('sync/', sync_changes, name='sync-changes'),
+    path('events/', event_stream, name='event-stream'),
+    path('events/ticket/', event_stream_ticket, name='event-stream-ticket'),
 ]
@@ -1,3 +1,4 @@
+import os
 from reports.serializers import GBVReportSerializer
 from rest_framework.response import Response
 from reports.send_mails import GBVEmailService
@@ -5,35 +6,63 @@ from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from reports.permissions import IsAdminOrLawEnforcement
+from reports.mixins import SparseFieldsViewMixin
 from rest_framework.decorators import action
 from .models import GBVReport
 from rest_framework import serializers, status
 from django.contrib.auth import get_user_model
-from rest_framework.decorators import action, permission_classes, api_view
-from django.db.models import Q
+from accounts import directory as professionals_directory
+from rest_framework.decorators import action, authentication_classes, permission_classes, api_view, renderer_classes
+from rest_framework.settings import api_settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from collections import defaultdict
+from datetime import timedelta
+from operator import attrgetter
+from reports import audit, availability, auto_assign, bulk, events, heatmap, locations, parallel, rollups, sync, triage, webhooks
 from .serializers import (
     AppointmentSerializer, CaseNoteSerializer, 
-    DocumentSerializer, CaseAssignmentSerializer
+    DocumentSerializer, CaseAssignmentSerializer, ArchivedGBVReportSerializer,
+    TriageEntrySerializer, AccessLogSerializer, WebhookEndpointSerializer, WebhookDeliverySerializer,
 )
-from .models import Appointment, CaseNote, Document, GBVReport, CaseAssignment
+from .models import Appointment, CaseNote, Document, GBVReport, CaseAssignment, ArchivedGBVReport, TriageEntry, AccessLog, ReportStatusChange, WebhookEndpoint, generate_webhook_secret
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from .archiving import restore_report
+from rest_framework.viewsets import ReadOnlyModelViewSet
+from gbv_project.renderers import EventStreamRenderer, FastJSONRenderer
+from gbv_project.throttling import TokenBucketThrottle
 
 User = get_user_model()
 
-class ReportApiView(ModelViewSet):
+class ReportApiView(audit.AuditAccessMixin, SparseFieldsViewMixin, ModelViewSet):
     serializer_class = GBVReportSerializer
     queryset = GBVReport.objects.all()
     permission_classes = [AllowAny]
+    audit_action = 'view_report'
+    audit_actions = ('retrieve',)
+    sparse_always_fields = ()
+    
+    def audit_report_reference(self, obj):
+        return obj.pk
     
     def get_permissions(self):
         """
         Customize permissions per action.
         """
-        if self.action in ["update", "partial_update"]:
+        if self.action in ["update", "partial_update", "bulk_status"]:
             return [IsAdminOrLawEnforcement()]
         elif self.action in ["destroy", "list", "get_reporter", "retrieve"]:
             return [IsAuthenticated()]
         return super().get_permissions()
     
+    def get_throttles(self):
+        if self.action == "create":
+            return [TokenBucketThrottle('report_create')]
+        return super().get_throttles()
+    
     def get_queryset(self):
         user = self.request.user
         if user.role == 'admin':
@@ -59,16 +88,22 @@ class ReportApiView(ModelViewSet):
             reports = self.get_queryset().filter(assigned_to=request.user)
         else:
             reports = self.get_queryset().none()
-        serializer = self.get_serializer(reports, many=True)
+        serializer = self.get_serializer(self.project_queryset(reports), many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
     def perform_update(self, serializer):
         """Override to send status update notifications"""
-        old_status = self.get_object().status
+        old_status = serializer.instance.status
         instance = serializer.save()
         
         # Send notification if status changed
         if old_status != instance.status:
+            ReportStatusChange.objects.create(
+                report=instance,
+                old_status=old_status,
+                new_status=instance.status,
+                changed_by=self.request.user
+            )
             GBVEmailService.send_status_update_notification(
                 report=instance,
                 old_status=old_status,
@@ -76,8 +111,33 @@ class ReportApiView(ModelViewSet):
             )
         
         return instance
+    
+    @action(detail=False, methods=['post'], url_path='bulk_status')
+    def bulk_status(self, request):
+        """
+        Change the status of many reports at once.
+        Body: {"reports": ["GBV...", ...], "status": "resolved", "notes": ""}
+        """
+        refs = request.data.get('reports')
+        new_status = request.data.get('status')
+        if not isinstance(refs, list) or not refs or not all(isinstance(ref, str) for ref in refs):
+            return Response({'error': 'reports must be a non-empty list of reference codes'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(refs) > bulk.MAX_ITEMS:
+            return Response({'error': f'At most {bulk.MAX_ITEMS} reports per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if new_status not in dict(GBVReport.REPORT_STATUSES):
+            return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+
+        visible = GBVReport.objects.filter(pk__in=self.get_queryset().values('pk'))
+        results = bulk.change_status(visible, refs, new_status, request.user, notes=request.data.get('notes') or '')
+        return Response({
+            'status': new_status,
+            'updated': sum(result == 'updated' for result in results.values()),
+            'results': [{'report': ref, 'result': result} for ref, result in results.items()],
+        })
 
-class BaseGBVViewSet(ModelViewSet):
+class BaseGBVViewSet(SparseFieldsViewMixin, ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_user_assigned_reports(self, user):
@@ -116,6 +176,12 @@ class BaseGBVViewSet(ModelViewSet):
         except GBVReport.DoesNotExist:
             raise serializers.ValidationError("Report not found")
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # Recorded first, while the case it belonged to can still be looked up
+        sync.record_changes([(instance, 'deleted')])
+        instance.delete()
+
 class AppointmentViewSet(BaseGBVViewSet):
     serializer_class = AppointmentSerializer
     
@@ -133,18 +199,86 @@ class AppointmentViewSet(BaseGBVViewSet):
         else:
             return Appointment.objects.filter(report__reporter=user)
     
+    def check_availability(self, professional, scheduled_date, duration_minutes, exclude_id=None):
+        """
+        Reject bookings that overlap the professional's active appointments.
+        Call inside transaction.atomic() together with the save; the
+        professional's bookings stay locked until it commits.
+        """
+        if professional is None or scheduled_date is None:
+            return
+        availability.lock_bookings(professional.pk)
+        conflict = availability.find_conflict(
+            professional.pk, scheduled_date, duration_minutes, exclude_id=exclude_id
+        )
+        if conflict:
+            raise serializers.ValidationError({
+                'scheduled_date': f'Professional is already booked from {conflict[0].isoformat()} '
+                                  f'to {conflict[1].isoformat()}'
+            })
+
     def perform_create(self, serializer):
         user = self.request.user
         report_id = self.request.data.get('report')
         
         report = self.validate_report_access(report_id, user)
+        professional = user if user.role in ['doctor', 'lawyer', 'counselor'] else serializer.validated_data.get('professional')
         
-        if user.role in ['doctor', 'lawyer', 'counselor']:
-            serializer.save(professional=user, report=report)
-        else:
-            serializer.save(report=report)
+        with transaction.atomic():
+            self.check_availability(
+                professional,
+                serializer.validated_data.get('scheduled_date'),
+                serializer.validated_data.get('duration_minutes', 60),
+            )
+            if user.role in ['doctor', 'lawyer', 'counselor']:
+                serializer.save(professional=user, report=report)
+            else:
+                serializer.save(report=report)
         
         GBVEmailService.send_appointment_scheduled_notification(serializer.instance)
+
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        data = serializer.validated_data
+        with transaction.atomic():
+            if instance.status in availability.ACTIVE_STATUSES and (
+                {'professional', 'scheduled_date', 'duration_minutes'} & set(data)
+            ):
+                self.check_availability(
+                    data.get('professional', instance.professional),
+                    data.get('scheduled_date', instance.scheduled_date),
+                    data.get('duration_minutes', instance.duration_minutes),
+                    exclude_id=instance.pk,
+                )
+            serializer.save()
+
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        """
+        Earliest free slots across professionals.
+        ?role=doctor,lawyer,counselor&duration=60&start=<iso>&end=<iso>&limit=10
+        """
+        roles = set(filter(None, request.query_params.get('role', 'doctor,lawyer,counselor').split(',')))
+        try:
+            duration = int(request.query_params.get('duration', 60))
+            limit = min(int(request.query_params.get('limit', 10)), 100)
+        except ValueError:
+            return Response({'error': 'duration and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < duration <= availability.MAX_DURATION_MINUTES:
+            return Response({'error': 'Invalid duration'}, status=status.HTTP_400_BAD_REQUEST)
+
+        start = parse_datetime(request.query_params.get('start', '')) or timezone.now()
+        if timezone.is_naive(start):
+            start = timezone.make_aware(start)
+        end = parse_datetime(request.query_params.get('end', '')) or start + timedelta(days=14)
+        if timezone.is_naive(end):
+            end = timezone.make_aware(end)
+        if end <= start or end - start > timedelta(days=90):
+            return Response({'error': 'Window must be positive and at most 90 days'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        slots = availability.earliest_free_slots(roles, duration, start, end, limit=limit)
+        return Response(slots)
     
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
@@ -155,8 +289,15 @@ class AppointmentViewSet(BaseGBVViewSet):
             new_status = request.data.get('status')
             
             if new_status in dict(Appointment.STATUS_CHOICES):
-                appointment.status = new_status
-                appointment.save()
+                with transaction.atomic():
+                    if (new_status in availability.ACTIVE_STATUSES
+                            and old_status not in availability.ACTIVE_STATUSES):
+                        self.check_availability(
+                            appointment.professional, appointment.scheduled_date,
+                            appointment.duration_minutes, exclude_id=appointment.pk
+                        )
+                    appointment.status = new_status
+                    appointment.save()
                 
                 # Send notification if status changed
                 if old_status != new_status:
@@ -171,12 +312,13 @@ class AppointmentViewSet(BaseGBVViewSet):
     
     @action(detail=False, methods=['get'])
     def my_appointments(self, request):
-        queryset = self.get_queryset()
+        queryset = self.project_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
-class CaseNoteViewSet(BaseGBVViewSet):
+class CaseNoteViewSet(audit.AuditAccessMixin, BaseGBVViewSet):
     serializer_class = CaseNoteSerializer
+    audit_action = 'view_note'
     
     def get_queryset(self):
         user = self.request.user
@@ -203,8 +345,9 @@ class CaseNoteViewSet(BaseGBVViewSet):
         if not case_note.is_confidential:
             GBVEmailService.send_case_note_added_notification(case_note)
 
-class DocumentViewSet(BaseGBVViewSet):
+class DocumentViewSet(audit.AuditAccessMixin, BaseGBVViewSet):
     serializer_class = DocumentSerializer
+    audit_action = 'view_document'
     
     def get_queryset(self):
         user = self.request.user
@@ -221,7 +364,18 @@ class DocumentViewSet(BaseGBVViewSet):
         report = self.validate_report_access(report_id, self.request.user)
         serializer.save(uploaded_by=self.request.user)
 
-class CaseAssignmentViewSet(ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """The document's file, to the users who can see the document; recorded in the access log"""
+        document = self.get_object()
+        try:
+            file = document.file.open('rb')
+        except FileNotFoundError:
+            return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
+        audit.record_objects(request, [document], 'download_document')
+        return FileResponse(file, as_attachment=True, filename=os.path.basename(document.file.name))
+
+class CaseAssignmentViewSet(SparseFieldsViewMixin, ModelViewSet):
     serializer_class = CaseAssignmentSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
     
@@ -244,21 +398,13 @@ class CaseAssignmentViewSet(ModelViewSet):
             ).exists():
                 raise serializers.ValidationError("Professional already assigned to this case")
             
-            # Save the assignment
-            assignment = serializer.save(assigned_by=self.request.user)
-            
-            # Update report status
-            report.status = 'under_review'
-            report.assigned_to = professional
-            report.save()
-            
-            # Send email notification
-            GBVEmailService.send_report_assigned_notification(
-                report=report,
-                professional=professional,
-                assigned_by=self.request.user
+            # Through the bulk path, so the status history, triage queue,
+            # rollups, sync feed and webhooks follow the assignment
+            _, serializer.instance = bulk.assign_one(
+                report.pk, professional.pk, self.request.user,
+                notes=serializer.validated_data.get('notes') or '',
             )
-            
+
         except GBVReport.DoesNotExist:
             raise serializers.ValidationError("Report not found")
         except User.DoesNotExist:
@@ -278,27 +424,10 @@ class CaseAssignmentViewSet(ModelViewSet):
                 return Response({'error': 'Can only assign professionals'}, 
                                 status=status.HTTP_400_BAD_REQUEST)
             
-            assignment, created = CaseAssignment.objects.get_or_create(
-                report=report,
-                professional=professional,
-                defaults={'assigned_by': request.user, 'is_active': True}
-            )
-            
-            if not created and not assignment.is_active:
-                assignment.is_active = True
-                assignment.save()
-                
-            report.status = 'under_review'
-            report.assigned_to = professional
-            report.save()
-            
-            # Send email notification for quick assign as well
-            GBVEmailService.send_report_assigned_notification(
-                report=report,
-                professional=professional,
-                assigned_by=request.user
-            )
-            
+            result, assignment = bulk.assign_one(report.pk, professional.pk, request.user)
+            if result == 'already_assigned':
+                assignment = CaseAssignment.objects.get(report=report, professional=professional)
+
             return Response(self.get_serializer(assignment).data)
             
         except GBVReport.DoesNotExist:
@@ -308,6 +437,69 @@ class CaseAssignmentViewSet(ModelViewSet):
             return Response({'error': 'Professional not found'}, 
                             status=status.HTTP_404_NOT_FOUND)
     
+    @action(detail=False, methods=['post'], url_path='bulk_assign')
+    def bulk_assign(self, request):
+        """
+        Assign many professionals to many reports in one transaction.
+        Body: {"assignments": [{"report": "GBV...", "professional": 3}, ...], "notes": ""}
+        """
+        items = request.data.get('assignments')
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'assignments must be a non-empty list'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > bulk.MAX_ITEMS:
+            return Response({'error': f'At most {bulk.MAX_ITEMS} assignments per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            pairs = [(str(item['report']), int(item['professional'])) for item in items]
+        except (TypeError, KeyError, ValueError):
+            return Response({'error': 'Each assignment needs a report and a professional id'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = bulk.assign(pairs, request.user, notes=request.data.get('notes') or '')
+        return Response({
+            'assigned': sum(result in ('assigned', 'reactivated') for result in results.values()),
+            'results': [
+                {'report': ref, 'professional': professional_id, 'result': result}
+                for (ref, professional_id), result in results.items()
+            ],
+        })
+
+    @action(detail=False, methods=['get'])
+    def caseloads(self, request):
+        """Active assignments and upcoming appointments per professional"""
+        loads = sorted(auto_assign.get_caseloads().values(), key=lambda entry: (entry['role'], entry['load']))
+        return Response(loads)
+
+    @action(detail=False, methods=['post'], url_path='auto_assign')
+    def auto_assign(self, request):
+        """
+        Assign pending reports to the least-loaded professionals.
+        Body: {"batch_size": 100, "max_batches": null, "dry_run": false}
+        """
+        try:
+            batch_size = max(1, min(int(request.data.get('batch_size', 100)), 1000))
+            max_batches = request.data.get('max_batches')
+            max_batches = int(max_batches) if max_batches not in (None, '') else None
+        except (TypeError, ValueError):
+            return Response({'error': 'batch_size and max_batches must be integers'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+
+        assigned, unplaced = auto_assign.auto_assign(
+            batch_size=batch_size, max_batches=max_batches,
+            assigned_by=request.user, dry_run=dry_run,
+        )
+        return Response({
+            'dry_run': dry_run,
+            'assigned_count': len(assigned),
+            'assigned': [
+                {'report': report.reference_code, 'professional': professional_id}
+                for report, professional_id in assigned
+            ],
+            'unplaced': [report.reference_code for report in unplaced],
+        })
+
     @action(detail=False, methods=['delete'], url_path='unassign/(?P<report_id>[^/.]+)/(?P<professional_id>[^/.]+)')
     def quick_unassign(self, request, report_id=None, professional_id=None):
         try:
@@ -325,6 +517,140 @@ class CaseAssignmentViewSet(ModelViewSet):
             return Response({'error': 'Assignment not found'}, 
                         status=status.HTTP_404_NOT_FOUND)
 
+class ArchivedReportViewSet(ReadOnlyModelViewSet):
+    """Archived (soft-deleted) reports; admins can restore them to the live tables"""
+    serializer_class = ArchivedGBVReportSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    queryset = ArchivedGBVReport.objects.select_related('reporter')
+
+    @action(detail=True, methods=['post'])
+    def restore(self, request, pk=None):
+        report = restore_report(self.get_object().pk)
+        return Response(GBVReportSerializer(report, context={'request': request}).data)
+
+class TriagePagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+class TriageViewSet(ReadOnlyModelViewSet):
+    """
+    Pending reports ordered by urgency, then age. Admins claim a case
+    before handling it so the same case isn't picked up twice.
+    ?available=1 hides cases claimed by other admins.
+    """
+    serializer_class = TriageEntrySerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    pagination_class = TriagePagination
+
+    def get_queryset(self):
+        queryset = TriageEntry.objects.all()
+        if self.request.query_params.get('available') in ('1', 'true'):
+            queryset = triage.available_to(self.request.user)
+        return queryset.select_related('report__reporter', 'report__assigned_to', 'claimed_by')
+
+    @action(detail=True, methods=['post'])
+    def claim(self, request, pk=None):
+        entry = self.get_object()
+        if not triage.claim(entry.pk, request.user):
+            return Response({'error': 'Case is already claimed by another admin'},
+                            status=status.HTTP_409_CONFLICT)
+        entry.refresh_from_db()
+        return Response(self.get_serializer(entry).data)
+
+    @action(detail=True, methods=['post'])
+    def release(self, request, pk=None):
+        entry = self.get_object()
+        force = request.query_params.get('force') in ('1', 'true')
+        if not triage.release(entry.pk, None if force else request.user):
+            return Response({'error': 'You do not hold a claim on this case'},
+                            status=status.HTTP_409_CONFLICT)
+        entry.refresh_from_db()
+        return Response(self.get_serializer(entry).data)
+
+    @action(detail=False, methods=['post'])
+    def claim_next(self, request):
+        entry = triage.claim_next(request.user)
+        if entry is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(self.get_serializer(entry).data)
+
+class WebhookEndpointViewSet(ModelViewSet):
+    """Partner endpoints receiving case events, with their recent deliveries"""
+    serializer_class = WebhookEndpointSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    queryset = WebhookEndpoint.objects.order_by('pk')
+
+    @action(detail=True, methods=['get'])
+    def deliveries(self, request, pk=None):
+        endpoint = self.get_object()
+        queryset = endpoint.deliveries.order_by('-created_at')
+        if request.query_params.get('status'):
+            queryset = queryset.filter(status=request.query_params['status'])
+        return Response(WebhookDeliverySerializer(queryset[:100], many=True).data)
+
+    @action(detail=True, methods=['post'])
+    def rotate_secret(self, request, pk=None):
+        endpoint = self.get_object()
+        endpoint.secret = generate_webhook_secret()
+        endpoint.save(update_fields=['secret'])
+        return Response(self.get_serializer(endpoint).data)
+
+    @action(detail=True, methods=['post'])
+    def reset_circuit(self, request, pk=None):
+        """Close the circuit and retry pending deliveries now"""
+        endpoint = self.get_object()
+        WebhookEndpoint.objects.filter(pk=endpoint.pk).update(consecutive_failures=0, circuit_open_until=None)
+        endpoint.deliveries.filter(status='pending').update(next_attempt_at=timezone.now())
+        endpoint.refresh_from_db()
+        return Response(self.get_serializer(endpoint).data)
+
+    @action(detail=False, methods=['get'])
+    def metrics(self, request):
+        return Response(webhooks.endpoint_metrics())
+
+class AccessLogPagination(CursorPagination):
+    page_size = 50
+    ordering = '-accessed_at'
+
+class AccessLogViewSet(ReadOnlyModelViewSet):
+    """
+    Who read which case data, newest first. Filter with ?report=<reference>,
+    ?user=<id>, ?action=, and ?since= / ?until= (ISO 8601).
+    """
+    serializer_class = AccessLogSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    pagination_class = AccessLogPagination
+
+    def get_queryset(self):
+        # Include what this process has read but not yet written
+        audit.flush()
+        queryset = AccessLog.objects.select_related('user')
+        params = self.request.query_params
+        if params.get('report'):
+            queryset = queryset.filter(report_reference=params['report'])
+        if params.get('user'):
+            queryset = queryset.filter(user_id=params['user'])
+        if params.get('action'):
+            queryset = queryset.filter(action=params['action'])
+        for param, lookup in (('since', 'accessed_at__gte'), ('until', 'accessed_at__lt')):
+            if params.get(param):
+                moment = parse_datetime(params[param])
+                if moment is None:
+                    raise serializers.ValidationError({param: 'Expected an ISO 8601 datetime.'})
+                if timezone.is_naive(moment):
+                    moment = timezone.make_aware(moment)
+                queryset = queryset.filter(**{lookup: moment})
+        return queryset
+
+def _serialize(serializer_class, queryset):
+    return serializer_class(queryset, many=True).data
+
+def _serialize_audited(serializer_class, queryset, request, action):
+    objects = list(queryset)
+    audit.record_objects(request, objects, action)
+    return serializer_class(objects, many=True).data
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def case_summary(request, report_id):
@@ -343,20 +669,30 @@ def case_summary(request, report_id):
             return Response({'error': 'Permission denied'}, 
                           status=status.HTTP_403_FORBIDDEN)
         
-        appointments = Appointment.objects.filter(report=report)
-        notes = CaseNote.objects.filter(report=report)
-        documents = Document.objects.filter(report=report)
-        assignments = CaseAssignment.objects.filter(report=report, is_active=True)
+        appointments = Appointment.objects.filter(report=report).select_related('professional', 'report')
+        notes = CaseNote.objects.filter(report=report).select_related('created_by', 'report')
+        documents = Document.objects.filter(report=report).select_related('uploaded_by', 'report')
+        assignments = CaseAssignment.objects.filter(report=report, is_active=True).select_related(
+            'professional', 'assigned_by', 'report'
+        )
         
         if user.role == 'survivor':
             notes = notes.filter(is_confidential=False)
         
+        audit.record(request, report.reference_code, 'view_summary')
+        appointments, notes, documents, assignments = parallel.gather(
+            (_serialize, AppointmentSerializer, appointments),
+            (_serialize_audited, CaseNoteSerializer, notes, request, 'view_note'),
+            (_serialize_audited, DocumentSerializer, documents, request, 'view_document'),
+            (_serialize, CaseAssignmentSerializer, assignments),
+        )
+        
         data = {
             'report_reference': report.reference_code,
-            'appointments': AppointmentSerializer(appointments, many=True).data,
-            'notes': CaseNoteSerializer(notes, many=True).data,
-            'documents': DocumentSerializer(documents, many=True).data,
-            'assignments': CaseAssignmentSerializer(assignments, many=True).data,
+            'appointments': appointments,
+            'notes': notes,
+            'documents': documents,
+            'assignments': assignments,
         }
         
         return Response(data)
@@ -364,6 +700,20 @@ def case_summary(request, report_id):
     except GBVReport.DoesNotExist:
         return Response({'error': 'Report not found'}, 
                     status=status.HTTP_404_NOT_FOUND)
+
+def _report_status_counts():
+    return GBVReport.objects.aggregate(
+        total_reports=Count('pk'),
+        pending_reports=Count('pk', filter=Q(status='pending')),
+        under_review_reports=Count('pk', filter=Q(status='under_review')),
+        resolved_reports=Count('pk', filter=Q(status='resolved')),
+    )
+
+def _urgent_cases():
+    entries = TriageEntry.objects.filter(urgency__gt=0).select_related(
+        'report__reporter', 'report__assigned_to'
+    )[:5]
+    return GBVReportSerializer([entry.report for entry in entries], many=True).data
         
 class DashBoardView(APIView):
     permission_classes = [IsAuthenticated]
@@ -371,45 +721,188 @@ class DashBoardView(APIView):
     def get(self, request):
         dashboard_data = {}
         if request.user.role == 'admin':
-            reports = GBVReport.objects.prefetch_related('assigned_reports').all()
-
-            total_reports = reports.count()
-            pending_reports = reports.filter(status="pending").count()
-            under_review_reports = reports.filter(status="under_review").count()
-            resolved_reports = reports.filter(status="resolved").count()
-            urgent_cases = reports.filter(Q(status="pending") & Q(
-                Q(immediate_danger=True) | Q(needs_medical_attention=True)
-            )).order_by('-date_reported')[:5]
-            assigned_reports = CaseAssignment.objects.filter().count()
+            counts, assigned_reports, urgent_cases = parallel.gather(
+                (_report_status_counts,),
+                (CaseAssignment.objects.filter().count,),
+                (_urgent_cases,),
+            )
 
             dashboard_data = {
-                "total_reports": total_reports,
-                "pending_reports": pending_reports,
-                "under_review_reports": under_review_reports,
-                "resolved_reports": resolved_reports,
+                **counts,
                 "assigned_reports": assigned_reports,
-                "urgent_cases" : GBVReportSerializer(urgent_cases, many=True).data
+                "urgent_cases" : urgent_cases
             }
             
         if request.user.role == "survivor":
-            reports = GBVReport.objects.filter(reporter=request.user)
-            appointments = Appointment.objects.filter(report__reporter=request.user)
+            reports = GBVReport.objects.filter(reporter=request.user).select_related('reporter', 'assigned_to')
+            appointments = Appointment.objects.filter(report__reporter=request.user).select_related(
+                'professional', 'report'
+            )
+            reports, appointments = parallel.gather(
+                (_serialize, GBVReportSerializer, reports),
+                (_serialize, AppointmentSerializer, appointments),
+            )
             
             dashboard_data = {
                 "my_reports" : {
-                    "total" : reports.count(),
-                    "reports" : GBVReportSerializer(reports, many=True).data
+                    "total" : len(reports),
+                    "reports" : reports
                 },
-                "appoinntments" : AppointmentSerializer(appointments, many=True).data
+                "appoinntments" : appointments
             }
 
         return Response(dashboard_data)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def event_stream_ticket(request):
+    """Short-lived ticket for opening the event stream with ?ticket="""
+    return Response({'ticket': events.issue_ticket(request.user), 'expires_in': events.STREAM_TICKET_SECONDS})
+
+@api_view(['GET'])
+@authentication_classes([*api_settings.DEFAULT_AUTHENTICATION_CLASSES, events.StreamTicketAuthentication])
+@permission_classes([IsAuthenticated])
+@renderer_classes([EventStreamRenderer, FastJSONRenderer])
+def event_stream(request):
+    """
+    Server-sent events for case updates visible to the current user.
+    Authenticate with the usual Authorization header, or with ?ticket= from
+    event_stream_ticket where the client cannot set headers (EventSource).
+    Only useful when served through ASGI.
+    """
+    response = StreamingHttpResponse(events.stream(request.user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
     
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_proffesionals(request):
-    professionals = User.objects.filter(
-        role__in=['doctor', 'lawyer', 'counselor']
-    ).values('id', 'first_name', 'last_name', 'email', 'role')
-    
-    return Response(professionals)
\ No newline at end of file
+    """
+    Returns the professionals directory from the cached snapshot.
+    Supports ?role=doctor,lawyer and ?search=<name or email>, and
+    answers 304 when the client's If-None-Match is still current.
+    """
+    etag, rows = professionals_directory.get_snapshot()
+    if etag in request.headers.get('If-None-Match', ''):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        professionals = professionals_directory.search(
+            rows,
+            role=request.query_params.get('role'),
+            query=request.query_params.get('search'),
+        )
+        response = Response(professionals)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def report_analytics(request):
+    """
+    Report counts and average resolution time from the weekly rollups.
+    ?start= / ?end= (YYYY-MM-DD) bound the weeks, ?group_by= takes any of
+    week, incident_type, status, location, and those same names filter.
+    """
+    params = request.query_params
+    dates = {}
+    for param in ('start', 'end'):
+        if params.get(param):
+            dates[param] = parse_date(params[param])
+            if dates[param] is None:
+                return Response({'error': f'{param} must be a date (YYYY-MM-DD)'},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+    group_by = [name.strip() for name in params.get('group_by', '').split(',') if name.strip()]
+    unknown = set(group_by) - set(rollups.KEY_FIELDS)
+    if unknown:
+        return Response({'error': f'Cannot group by {", ".join(sorted(unknown))}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    filters = {name: params[name] for name in ('incident_type', 'status') if params.get(name)}
+    if params.get('location'):
+        location_id = locations.resolve(params['location'])
+        # An unknown place matches nothing rather than every unmatched report
+        filters['location__in'] = [location_id] if location_id else []
+
+    groups = rollups.summarize(dates.get('start'), dates.get('end'), group_by, filters)
+    return Response({'group_by': group_by, 'results': groups})
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def location_autocomplete(request):
+    """Gazetteer locations matching ?q= for the report form"""
+    try:
+        limit = min(int(request.query_params.get('limit', 10)), 50)
+    except ValueError:
+        return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(locations.autocomplete(request.query_params.get('q', ''), limit))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def heatmap_tile(request, z, x, y):
+    """
+    Report density for map tile z/x/y. Non-admin roles get coarser cells
+    and small counts suppressed per incident type; ?incident_type= takes a comma list.
+    """
+    if z > 30 or x >= 2 ** z or y >= 2 ** z:
+        return Response({'error': 'Tile out of range'}, status=status.HTTP_400_BAD_REQUEST)
+    incident_types = {t.strip() for t in request.query_params.get('incident_type', '').split(',') if t.strip()}
+    data = heatmap.tile(z, x, y, request.user.role, incident_types)
+    if data is None:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    response = Response(data)
+    response['Cache-Control'] = 'private, max-age=60'
+    return response
+
+SYNC_SERIALIZERS = {
+    'report': (GBVReportSerializer, 'view_report'),
+    'appointment': (AppointmentSerializer, None),
+    'note': (CaseNoteSerializer, 'view_note'),
+    'document': (DocumentSerializer, 'view_document'),
+    'assignment': (CaseAssignmentSerializer, None),
+}
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """
+    Reports, appointments, notes, documents and assignments changed since
+    ?since=<cursor>, as seen by the current user. Without since, returns the
+    cursor to start from: take it before fetching the full lists.
+    """
+    if 'since' not in request.query_params:
+        return Response({'cursor': sync.latest_cursor(), 'has_more': False, 'changes': []})
+    try:
+        since = int(request.query_params['since'])
+    except ValueError:
+        return Response({'error': 'since must be a cursor from an earlier response'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if sync.is_expired(since):
+        return Response({'error': 'Cursor has expired, fetch everything again', 'cursor': sync.latest_cursor()},
+                        status=status.HTTP_410_GONE)
+
+    rows, cursor, has_more = sync.changes_for(request.user, since)
+    objects = sync.load_objects(request.user, rows)
+    changes, served = [], defaultdict(list)
+    for model, object_id, report_reference, action in rows:
+        instance = objects.get((model, object_id))
+        change = {'model': model, 'id': object_id, 'report': report_reference}
+        if instance is None:
+            # Deleted, or no longer visible to this user
+            change['action'] = 'deleted'
+        else:
+            serializer_class, _ = SYNC_SERIALIZERS[model]
+            change['action'] = action
+            change['data'] = serializer_class(instance, context={'request': request}).data
+            served[model].append(instance)
+        changes.append(change)
+
+    for model, instances in served.items():
+        audit_action = SYNC_SERIALIZERS[model][1]
+        if audit_action == 'view_report':
+            audit.record_objects(request, instances, audit_action, report_reference=attrgetter('pk'))
+        elif audit_action:
+            audit.record_objects(request, instances, audit_action)
+    return Response({'cursor': cursor, 'has_more': has_more, 'changes': changes})
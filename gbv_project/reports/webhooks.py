@@ -0,0 +1,335 @@
+"""
+Outbound webhooks for partner systems.
+
+Case events are queued as WebhookDelivery rows, one per subscribed
+endpoint, in the same transaction as the change, so an event is sent only
+if the change commits. The dispatcher (manage.py send_webhooks) claims due
+deliveries, groups them into batches of up to BATCH_SIZE events per
+endpoint and POSTs the batches from a pool of WORKERS threads. The worker
+threads only make HTTP requests; every database write happens on the
+dispatching thread.
+
+Each request body is signed with the endpoint's secret: the
+X-GBV-Signature header is "t=<unix time>,v1=<hex HMAC-SHA256 of
+'<t>.<body>'>", checked with verify_signature. A failed batch is retried
+with exponential backoff and jitter until MAX_ATTEMPTS. After
+BREAKER_THRESHOLD consecutive failures an endpoint's circuit opens and it
+is skipped for BREAKER_COOLDOWN_SECONDS; then a single batch is let
+through, and its outcome closes the circuit or opens it again.
+
+Which endpoints take which event types is cached per process under a
+version in the shared cache, bumped whenever an endpoint changes, so
+publishing on every report save costs one cache read rather than a query.
+
+Payloads carry reference codes, statuses and dates, never the narrative or
+the reporter's details.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import random
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Avg, Count, F, Q
+from django.utils import timezone
+
+from .models import WebhookDelivery, WebhookEndpoint
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = [event_type for event_type, _ in WebhookEndpoint.EVENT_CHOICES]
+SIGNATURE_HEADER = 'X-GBV-Signature'
+BATCH_SIZE = getattr(settings, 'WEBHOOK_BATCH_SIZE', 50)
+WORKERS = getattr(settings, 'WEBHOOK_WORKERS', 8)
+TIMEOUT_SECONDS = getattr(settings, 'WEBHOOK_TIMEOUT_SECONDS', 10)
+MAX_ATTEMPTS = getattr(settings, 'WEBHOOK_MAX_ATTEMPTS', 8)
+BACKOFF_SECONDS = getattr(settings, 'WEBHOOK_BACKOFF_SECONDS', 30)
+MAX_BACKOFF_SECONDS = getattr(settings, 'WEBHOOK_MAX_BACKOFF_SECONDS', 6 * 60 * 60)
+BREAKER_THRESHOLD = getattr(settings, 'WEBHOOK_BREAKER_THRESHOLD', 5)
+BREAKER_COOLDOWN_SECONDS = getattr(settings, 'WEBHOOK_BREAKER_COOLDOWN_SECONDS', 300)
+# A claim this old belongs to a dispatcher that died mid-send
+STALE_CLAIM_SECONDS = TIMEOUT_SECONDS * 6
+SIGNATURE_TOLERANCE_SECONDS = 300
+
+# Counters for this process, reported by the dispatcher
+metrics = Counter()
+
+SUBSCRIPTIONS_VERSION_KEY = 'webhooks:subscriptions:version'
+# Per-process {event_type: [endpoint ids]} for one subscriptions version
+_local_subscriptions = {'version': None, 'endpoints': {}}
+
+
+# Subscriptions
+
+def invalidate_subscriptions():
+    try:
+        cache.incr(SUBSCRIPTIONS_VERSION_KEY)
+    except ValueError:
+        cache.set(SUBSCRIPTIONS_VERSION_KEY, 1, timeout=None)
+
+
+def subscribers(event_type):
+    """Ids of the active endpoints subscribed to event_type"""
+    version = cache.get(SUBSCRIPTIONS_VERSION_KEY)
+    if version is None:
+        cache.add(SUBSCRIPTIONS_VERSION_KEY, 1, timeout=None)
+        version = cache.get(SUBSCRIPTIONS_VERSION_KEY, 1)
+    if _local_subscriptions['version'] != version:
+        endpoints = defaultdict(list)
+        for pk, event_types in WebhookEndpoint.objects.filter(is_active=True).values_list('pk', 'events'):
+            for subscribed in event_types or EVENT_TYPES:
+                endpoints[subscribed].append(pk)
+        _local_subscriptions.update(version=version, endpoints=dict(endpoints))
+    return _local_subscriptions['endpoints'].get(event_type, [])
+
+
+# Events
+
+def report_data(report):
+    return {
+        'reference_code': report.pk,
+        'status': report.status,
+        'incident_type': report.incident_type,
+        'immediate_danger': report.immediate_danger,
+        'needs_medical_attention': report.needs_medical_attention,
+        'date_reported': report.date_reported,
+    }
+
+
+def status_changed_data(report, old_status):
+    return {'reference_code': report.pk, 'old_status': old_status, 'new_status': report.status}
+
+
+def assigned_data(assignment):
+    return {
+        'reference_code': assignment.report_id,
+        'professional': assignment.professional_id,
+        'assigned_date': assignment.assigned_date,
+    }
+
+
+def appointment_data(appointment):
+    return {
+        'id': appointment.pk,
+        'reference_code': appointment.report_id,
+        'appointment_type': appointment.appointment_type,
+        'scheduled_date': appointment.scheduled_date,
+        'duration_minutes': appointment.duration_minutes,
+        'is_virtual': appointment.is_virtual,
+        'professional': appointment.professional_id,
+    }
+
+
+def publish(event_type, items):
+    """Queue an event for every subscribed endpoint; items is a list of payload dicts"""
+    endpoint_ids = subscribers(event_type)
+    if not endpoint_ids:
+        return 0
+    # Round-trip through JSON so dates are stored as strings
+    payloads = [json.loads(json.dumps(data, cls=DjangoJSONEncoder)) for data in items]
+    deliveries = WebhookDelivery.objects.bulk_create([
+        WebhookDelivery(endpoint_id=endpoint_id, event_type=event_type, payload=payload)
+        for endpoint_id in endpoint_ids
+        for payload in payloads
+    ])
+    return len(deliveries)
+
+
+# Signing
+
+def sign(secret, body, timestamp=None):
+    timestamp = int(time.time() if timestamp is None else timestamp)
+    digest = hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={digest}'
+
+
+def verify_signature(secret, header, body, tolerance=SIGNATURE_TOLERANCE_SECONDS):
+    """Check a signature header against the raw request body"""
+    try:
+        parts = dict(part.split('=', 1) for part in header.split(','))
+        timestamp = int(parts['t'])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(sign(secret, body, timestamp), f"t={timestamp},v1={parts.get('v1', '')}")
+
+
+# Dispatching
+
+def backoff(attempts):
+    """Seconds before retry number attempts, with full jitter"""
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** (attempts - 1)))
+
+
+def _claim(now, limit):
+    """Claim due deliveries of active endpoints whose circuit is not open"""
+    claim_id = uuid.uuid4()
+    due = WebhookDelivery.objects.filter(
+        Q(claimed_by__isnull=True) | Q(claimed_at__lt=now - timedelta(seconds=STALE_CLAIM_SECONDS)),
+        status='pending',
+        next_attempt_at__lte=now,
+        endpoint__is_active=True,
+    ).exclude(endpoint__circuit_open_until__gt=now)
+    pks = list(due.order_by('next_attempt_at').values_list('pk', flat=True)[:limit])
+    # Re-checked in the UPDATE so two dispatchers never claim the same row
+    due.filter(pk__in=pks).update(claimed_by=claim_id, claimed_at=now)
+    return list(WebhookDelivery.objects.filter(claimed_by=claim_id).select_related('endpoint'))
+
+
+def _batches(deliveries):
+    """[(endpoint, deliveries)] in chunks of BATCH_SIZE; half-open endpoints get one trial batch"""
+    by_endpoint = defaultdict(list)
+    for delivery in deliveries:
+        by_endpoint[delivery.endpoint_id].append(delivery)
+    batches, released = [], []
+    for group in by_endpoint.values():
+        endpoint = group[0].endpoint
+        chunks = [group[start:start + BATCH_SIZE] for start in range(0, len(group), BATCH_SIZE)]
+        if endpoint.consecutive_failures >= BREAKER_THRESHOLD:
+            chunks, rest = chunks[:1], chunks[1:]
+            released.extend(delivery.pk for chunk in rest for delivery in chunk)
+        batches.extend((endpoint, chunk) for chunk in chunks)
+    if released:
+        WebhookDelivery.objects.filter(pk__in=released).update(claimed_by=None, claimed_at=None)
+    return batches
+
+
+def _body(deliveries):
+    return json.dumps({'deliveries': [
+        {
+            'id': str(delivery.event_id),
+            'type': delivery.event_type,
+            'created_at': delivery.created_at.isoformat(),
+            'attempt': delivery.attempts + 1,
+            'data': delivery.payload,
+        }
+        for delivery in deliveries
+    ]}, separators=(',', ':')).encode()
+
+
+def _post(endpoint, body):
+    """Send one batch; returns (ok, status_code, error, duration_ms). Runs on a worker thread."""
+    request = urllib.request.Request(endpoint.url, data=body, method='POST', headers={
+        'Content-Type': 'application/json',
+        'User-Agent': 'GBV-Webhooks/1.0',
+        SIGNATURE_HEADER: sign(endpoint.secret, body),
+    })
+    started = time.monotonic()
+    try:
+        with urllib.request.urlopen(request, timeout=TIMEOUT_SECONDS) as response:
+            status_code, error = response.status, ''
+    except urllib.error.HTTPError as exc:
+        status_code, error = exc.code, exc.reason or ''
+    except (urllib.error.URLError, OSError) as exc:
+        status_code, error = None, str(getattr(exc, 'reason', exc))
+    duration_ms = int((time.monotonic() - started) * 1000)
+    return status_code is not None and 200 <= status_code < 300, status_code, str(error)[:255], duration_ms
+
+
+def _record(endpoint, deliveries, outcome, now):
+    ok, status_code, error, duration_ms = outcome
+    for delivery in deliveries:
+        delivery.attempts += 1
+        delivery.last_status_code, delivery.last_error = status_code, error
+        delivery.duration_ms = duration_ms
+        delivery.claimed_by = delivery.claimed_at = None
+        if ok:
+            delivery.status, delivery.delivered_at = 'delivered', now
+        elif delivery.attempts >= MAX_ATTEMPTS:
+            delivery.status = 'failed'
+        else:
+            delivery.next_attempt_at = now + timedelta(seconds=backoff(delivery.attempts))
+    WebhookDelivery.objects.bulk_update(deliveries, [
+        'attempts', 'last_status_code', 'last_error', 'duration_ms', 'claimed_by', 'claimed_at',
+        'status', 'delivered_at', 'next_attempt_at',
+    ])
+
+    metrics['batches_sent'] += 1
+    metrics['request_ms_total'] += duration_ms
+    if ok:
+        metrics['events_delivered'] += len(deliveries)
+        WebhookEndpoint.objects.filter(pk=endpoint.pk).update(consecutive_failures=0, circuit_open_until=None)
+        return
+    metrics['batches_failed'] += 1
+    metrics['events_given_up'] += sum(delivery.status == 'failed' for delivery in deliveries)
+    WebhookEndpoint.objects.filter(pk=endpoint.pk).update(consecutive_failures=F('consecutive_failures') + 1)
+    if endpoint.consecutive_failures + 1 >= BREAKER_THRESHOLD:
+        metrics['circuits_opened'] += 1
+        WebhookEndpoint.objects.filter(pk=endpoint.pk).update(
+            circuit_open_until=now + timedelta(seconds=BREAKER_COOLDOWN_SECONDS)
+        )
+        logger.warning("Webhook endpoint %s failing (%s); pausing it for %ss",
+                       endpoint.name, status_code or error, BREAKER_COOLDOWN_SECONDS)
+
+
+def dispatch(limit=1000, executor=None):
+    """
+    Send up to limit due deliveries; returns the number of events sent
+    successfully. Pass an executor to reuse a worker pool across runs.
+    """
+    now = timezone.now()
+    batches = _batches(_claim(now, limit))
+    if not batches:
+        return 0
+    bodies = [_body(deliveries) for _, deliveries in batches]
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='webhook') as pool:
+            outcomes = list(pool.map(_post, [endpoint for endpoint, _ in batches], bodies))
+    else:
+        outcomes = list(executor.map(_post, [endpoint for endpoint, _ in batches], bodies))
+    finished = timezone.now()
+    for (endpoint, deliveries), outcome in zip(batches, outcomes):
+        _record(endpoint, deliveries, outcome, finished)
+    return sum(len(deliveries) for (_, deliveries), outcome in zip(batches, outcomes) if outcome[0])
+
+
+def seconds_until_next(now=None, cap=60):
+    """Time until the earliest pending delivery is due, at most cap"""
+    now = now or timezone.now()
+    next_attempt = WebhookDelivery.objects.filter(status='pending').order_by('next_attempt_at') \
+        .values_list('next_attempt_at', flat=True).first()
+    if next_attempt is None:
+        return cap
+    return max(0.0, min(cap, (next_attempt - now).total_seconds()))
+
+
+def endpoint_metrics(since=None):
+    """Delivery counts, latency and circuit state per endpoint"""
+    since = since or timezone.now() - timedelta(days=1)
+    counts = defaultdict(dict)
+    for row in WebhookDelivery.objects.values('endpoint_id', 'status').annotate(n=Count('pk')).order_by():
+        counts[row['endpoint_id']][row['status']] = row['n']
+    latency = dict(
+        WebhookDelivery.objects.filter(delivered_at__gte=since).values('endpoint_id')
+        .annotate(ms=Avg('duration_ms')).order_by().values_list('endpoint_id', 'ms')
+    )
+    now = timezone.now()
+    return [
+        {
+            'endpoint': endpoint.pk,
+            'name': endpoint.name,
+            'is_active': endpoint.is_active,
+            'pending': counts[endpoint.pk].get('pending', 0),
+            'delivered': counts[endpoint.pk].get('delivered', 0),
+            'failed': counts[endpoint.pk].get('failed', 0),
+            'avg_duration_ms': round(latency[endpoint.pk]) if latency.get(endpoint.pk) is not None else None,
+            'consecutive_failures': endpoint.consecutive_failures,
+            'circuit': (
+                'open' if endpoint.circuit_open_until and endpoint.circuit_open_until > now
+                else 'half_open' if endpoint.consecutive_failures >= BREAKER_THRESHOLD
+                else 'closed'
+            ),
+        }
+        for endpoint in WebhookEndpoint.objects.order_by('pk')
+    ]